@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Created by Roberto Preste
+import os
+import tempfile
+import numpy as np
+import prestools.bioinf as pb
+from .common import (mutated_pair, random_nt_sequence, random_counts,
+                     random_lengths)
+
+
+class DistanceSuite:
+    """Pairwise distance models on aligned sequences."""
+    params = [100, 1000, 10000]
+    param_names = ["length"]
+
+    def setup(self, length):
+        self.seq_1, self.seq_2 = mutated_pair(length)
+
+    def time_hamming_distance(self, length):
+        pb.hamming_distance(self.seq_1, self.seq_2)
+
+    def time_p_distance(self, length):
+        pb.p_distance(self.seq_1, self.seq_2)
+
+    def time_jukes_cantor_distance(self, length):
+        pb.jukes_cantor_distance(self.seq_1, self.seq_2)
+
+    def time_tajima_nei_distance(self, length):
+        pb.tajima_nei_distance(self.seq_1, self.seq_2)
+
+    def time_kimura_distance(self, length):
+        pb.kimura_distance(self.seq_1, self.seq_2)
+
+    def time_tamura_distance(self, length):
+        pb.tamura_distance(self.seq_1, self.seq_2)
+
+
+class SequenceSuite:
+    """Single-sequence transformations."""
+    params = [100, 1000, 10000]
+    param_names = ["length"]
+
+    def setup(self, length):
+        self.sequence = random_nt_sequence(length)
+
+    def time_reverse_complement(self, length):
+        pb.reverse_complement(self.sequence)
+
+    def time_shuffle_sequence(self, length):
+        pb.shuffle_sequence(self.sequence)
+
+
+class NormalizationSuite:
+    """Expression matrix normalizations."""
+    params = [100, 1000, 10000]
+    param_names = ["n_genes"]
+
+    def setup(self, n_genes):
+        self.counts = random_counts(n_genes)
+        self.lengths = random_lengths(n_genes)
+
+    def time_rpkm(self, n_genes):
+        pb.rpkm(self.counts, self.lengths)
+
+    def time_quantile_norm(self, n_genes):
+        pb.quantile_norm(self.counts)
+
+    def peakmem_quantile_norm(self, n_genes):
+        pb.quantile_norm(self.counts)
+
+
+class KmerSuite:
+    """k-mer counting on a single long sequence."""
+    params = [[10000, 1000000], [8, 21]]
+    param_names = ["length", "k"]
+
+    def setup(self, length, k):
+        self.sequence = random_nt_sequence(length)
+
+    def time_kmer_count(self, length, k):
+        pb.kmer_count(self.sequence, k)
+
+    def time_kmer_count_canonical(self, length, k):
+        pb.kmer_count(self.sequence, k, canonical=True)
+
+
+class AlignmentSuite:
+    """Batch pairwise alignment of short sequences."""
+    params = [[100, 1000], [None, 10]]
+    param_names = ["n_pairs", "band"]
+
+    def setup(self, n_pairs, band):
+        self.pairs = [mutated_pair(150, seed=seed) for seed in range(n_pairs)]
+
+    def time_align_batch(self, n_pairs, band):
+        pb.align_batch(self.pairs, band=band)
+
+    def time_align_batch_score_only(self, n_pairs, band):
+        pb.align_batch(self.pairs, band=band, score_only=True)
+
+
+class EditDistanceSuite:
+    """One-vs-many edit distance against short barcodes."""
+    params = [10000, 1000000]
+    param_names = ["n_targets"]
+
+    def setup(self, n_targets):
+        sequence = random_nt_sequence(16 * n_targets)
+        self.targets = pb.encode_batch([sequence[i:i + 16] for i
+                                        in range(0, len(sequence), 16)])
+        self.query = sequence[:16]
+
+    def time_edit_distance_batch(self, n_targets):
+        pb.edit_distance_batch(self.query, self.targets, max_distance=2)
+
+
+class BootstrapSuite:
+    """Bootstrap replicates of the pairwise distances of an alignment."""
+    params = [[20, 200], ["p_distance", "kimura_distance"]]
+    param_names = ["n_seqs", "model"]
+
+    def setup(self, n_seqs, model):
+        self.seqs = [mutated_pair(1000, seed=seed)[1]
+                     for seed in range(n_seqs)]
+
+    def time_bootstrap_distances(self, n_seqs, model):
+        pb.bootstrap_distances(self.seqs, model=model, replicates=100,
+                               seed=0)
+
+
+class MotifSuite:
+    """Multi-pattern IUPAC motif search over a random genome."""
+    params = [[0, 2], [100, 2000]]
+    param_names = ["mismatches", "n_motifs"]
+
+    def setup(self, mismatches, n_motifs):
+        self.sequence = random_nt_sequence(1000000)
+        self.motifs = [self.sequence[i:i + 20]
+                       for i in range(0, 400 * n_motifs, 400)]
+
+    def time_find_motifs(self, mismatches, n_motifs):
+        pb.find_motifs(self.sequence, self.motifs, mismatches=mismatches)
+
+
+class OrfSuite:
+    """Six-frame ORF search on random contigs."""
+    params = [100000, 10000000]
+    param_names = ["length"]
+
+    def setup(self, length):
+        self.sequence = random_nt_sequence(length)
+
+    def time_find_orfs(self, length):
+        pb.find_orfs(self.sequence, starts=["ATG", "GTG", "TTG"])
+
+
+class FaidxSuite:
+    """Random access to 1 kb regions of an indexed FASTA file."""
+    params = [1 << 16, 1 << 26]
+    param_names = ["cache_size"]
+
+    def setup(self, cache_size):
+        sequence = random_nt_sequence(5000000)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmpdir.name, "genome.fasta")
+        with open(path, "w") as f:
+            f.write(">chr1\n")
+            f.writelines([sequence[i:i + 60] + "\n"
+                          for i in range(0, len(sequence), 60)])
+        self.fasta = pb.faidx(path, cache_size=cache_size)
+        self.starts = np.random.RandomState(0).randint(0, 100000, size=1000)
+
+    def teardown(self, cache_size):
+        self.fasta.close()
+        self.tmpdir.cleanup()
+
+    def time_fetch(self, cache_size):
+        for start in self.starts.tolist():
+            self.fasta.fetch("chr1", start, start + 1000)
+
+
+class TwoBitSuite:
+    """Region access to a .2bit genome, as strings or 2-bit codes."""
+    params = [[1000, 1000000], [False, True]]
+    param_names = ["region_size", "encoded"]
+
+    def setup(self, region_size, encoded):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmpdir.name, "genome.2bit")
+        pb.write_2bit([("chr1", random_nt_sequence(5000000))], path)
+        self.genome = pb.read_2bit(path)
+        self.starts = np.random.RandomState(0).randint(
+            0, 5000000 - region_size, size=100)
+
+    def teardown(self, region_size, encoded):
+        self.genome.close()
+        self.tmpdir.cleanup()
+
+    def time_fetch(self, region_size, encoded):
+        for start in self.starts.tolist():
+            self.genome.fetch("chr1", start, start + region_size,
+                              encoded=encoded)
+
+
+class PairsWithinSuite:
+    """Near-duplicate search among random 16 bp barcodes."""
+    params = [[10000, 1000000], [1, 2]]
+    param_names = ["n_seqs", "max_distance"]
+
+    def setup(self, n_seqs, max_distance):
+        sequence = random_nt_sequence(16 * n_seqs)
+        self.sequences = [sequence[i:i + 16]
+                          for i in range(0, len(sequence), 16)]
+
+    def time_find_pairs_within(self, n_seqs, max_distance):
+        pb.find_pairs_within(self.sequences, max_distance)
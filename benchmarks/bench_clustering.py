@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Created by Roberto Preste
+import numpy as np
+import prestools.clustering as pc
+from .common import random_corr_df, random_nt_sequence
+
+
+class HierarchicalClusteringSuite:
+    """Hierarchical clustering of correlation dataframes."""
+    params = [[10, 100, 500], ["ward", "average"]]
+    param_names = ["n_features", "method"]
+
+    def setup(self, n_features, method):
+        self.df = random_corr_df(n_features)
+
+    def time_hierarchical_clustering(self, n_features, method):
+        pc.hierarchical_clustering(self.df, method=method)
+
+    def peakmem_hierarchical_clustering(self, n_features, method):
+        pc.hierarchical_clustering(self.df, method=method)
+
+
+class GreedyClusteringSuite:
+    """Greedy clustering of 250 bp reads sampled from 100 templates with
+    up to 10 substitutions."""
+    params = [[1000, 10000], [0.97, 0.9]]
+    param_names = ["n_seqs", "identity"]
+
+    def setup(self, n_seqs, identity):
+        rng = np.random.default_rng(0)
+        templates = random_nt_sequence(250 * 100)
+        self.sequences = []
+        for i in rng.integers(0, 100, n_seqs).tolist():
+            seq = list(templates[250 * i:250 * (i + 1)])
+            for pos in rng.integers(0, 250, rng.integers(0, 11)).tolist():
+                seq[pos] = "ACGT"[rng.integers(0, 4)]
+            self.sequences.append("".join(seq))
+
+    def time_greedy_clustering(self, n_seqs, identity):
+        pc.greedy_clustering(self.sequences, identity=identity)
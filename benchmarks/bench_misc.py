@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Created by Roberto Preste
+import prestools.misc as pm
+from .common import nested_list, random_text, random_df, square_df
+
+
+class FlattenSuite:
+    """Flattening of nested lists."""
+    params = [[1000, 100000], [False, True]]
+    param_names = ["n_elements", "drop_null"]
+
+    def setup(self, n_elements, drop_null):
+        self.nested = nested_list(n_elements)
+
+    def time_flatten(self, n_elements, drop_null):
+        pm.flatten(self.nested, drop_null=drop_null)
+
+
+class WordcountSuite:
+    """Word counting on synthetic texts."""
+    params = [[1000, 100000], [False, True]]
+    param_names = ["n_words", "ignore_case"]
+
+    def setup(self, n_words, ignore_case):
+        self.text = random_text(n_words)
+
+    def time_wordcount(self, n_words, ignore_case):
+        pm.wordcount(self.text, ignore_case=ignore_case)
+
+
+class ApplyParallelSuite:
+    """Parallel application of a function to a dataframe."""
+    params = [[10000, 1000000], [1, 2]]
+    param_names = ["n_rows", "cores"]
+    timeout = 120
+
+    def setup(self, n_rows, cores):
+        self.df = random_df(n_rows)
+
+    def time_apply_parallel(self, n_rows, cores):
+        pm.apply_parallel(self.df, square_df, cores=cores)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Created by Roberto Preste
+import numpy as np
+import pandas as pd
+from typing import List
+
+SEED = 42
+
+_WORDS = ["gene", "protein", "sequence", "read", "sample", "cluster",
+          "variant", "genome", "transcript", "Gene", "READ", "exon"]
+
+
+def random_nt_sequence(length: int, seed: int = SEED) -> str:
+    """Return a reproducible random nucleotide sequence."""
+    rng = np.random.RandomState(seed)
+    return "".join(rng.choice(list("ACGT"), size=length))
+
+
+def mutated_pair(length: int, rate: float = 0.1,
+                 seed: int = SEED) -> List[str]:
+    """Return two equal-length sequences differing at about `rate` sites.
+
+    Mismatches are introduced without gaps, so that every distance model
+    in prestools.bioinf can be computed on the pair.
+    """
+    rng = np.random.RandomState(seed)
+    seq_1 = rng.choice(list("ACGT"), size=length)
+    seq_2 = seq_1.copy()
+    sites = rng.rand(length) < rate
+    seq_2[sites] = rng.choice(list("ACGT"), size=sites.sum())
+    return ["".join(seq_1), "".join(seq_2)]
+
+
+def random_counts(n_genes: int, n_samples: int = 8,
+                  seed: int = SEED) -> np.ndarray:
+    """Return a reproducible gene expression count matrix."""
+    rng = np.random.RandomState(seed)
+    return rng.negative_binomial(5, 0.01, size=(n_genes, n_samples))
+
+
+def random_lengths(n_genes: int, seed: int = SEED) -> np.ndarray:
+    """Return reproducible gene lengths in base pairs."""
+    rng = np.random.RandomState(seed)
+    return rng.randint(200, 10000, size=n_genes)
+
+
+def random_corr_df(n_features: int, seed: int = SEED) -> pd.DataFrame:
+    """Return a correlation dataframe of n_features random features."""
+    rng = np.random.RandomState(seed)
+    data = rng.randn(max(n_features * 2, 10), n_features)
+    cols = ["feat_{}".format(i) for i in range(n_features)]
+    return pd.DataFrame(data, columns=cols).corr()
+
+
+def nested_list(n_elements: int, depth: int = 4, seed: int = SEED) -> list:
+    """Return a nested list holding n_elements values (some None)."""
+    rng = np.random.RandomState(seed)
+    values = [None if v < 0.1 else int(v * 100)
+              for v in rng.rand(n_elements)]
+    for _ in range(depth):
+        values = [values[i: i + 10] for i in range(0, len(values), 10)]
+    return values
+
+
+def random_text(n_words: int, seed: int = SEED) -> str:
+    """Return a reproducible text made of n_words words."""
+    rng = np.random.RandomState(seed)
+    return " ".join(rng.choice(_WORDS, size=n_words))
+
+
+def random_df(n_rows: int, seed: int = SEED) -> pd.DataFrame:
+    """Return a numeric dataframe with n_rows rows."""
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame(rng.rand(n_rows, 4), columns=list("abcd"))
+
+
+def square_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Function applied in parallel by apply_parallel benchmarks."""
+    return df ** 2
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Created by Roberto Preste
+"""Run the benchmark suite without asv.
+
+The suite follows the asv conventions (classes with `params`,
+`param_names`, `setup()` and `time_*`/`peakmem_*` methods), so it can be
+run with `asv run`; this script runs the same benchmarks offline using
+prestools.misc.run_benchmark(), saves the results to JSON and optionally
+compares them against a previous run, exiting with an error if any
+benchmark got slower than the given tolerance.
+
+Usage:
+    python -m benchmarks.run [-o results.json] [-c baseline.json]
+                             [-t 1.5] [-k pattern] [-r 5]
+"""
+import re
+import sys
+import json
+import argparse
+import importlib
+import itertools
+import pkgutil
+import prestools.misc as pm
+
+BENCH_PREFIXES = ("time_", "peakmem_")
+
+
+def _param_grid(cls) -> list:
+    params = getattr(cls, "params", None)
+    if params is None:
+        return [()]
+    if getattr(cls, "param_names", None) and len(cls.param_names) > 1:
+        return list(itertools.product(*params))
+    return [(p, ) for p in params]
+
+
+def discover() -> list:
+    """Return (module_name, class) tuples for every benchmark class."""
+    import benchmarks
+
+    found = []
+    for mod_info in pkgutil.iter_modules(benchmarks.__path__):
+        if not mod_info.name.startswith("bench_"):
+            continue
+        module = importlib.import_module(
+            "benchmarks.{}".format(mod_info.name))
+        for name in dir(module):
+            obj = getattr(module, name)
+            if isinstance(obj, type) and obj.__module__ == module.__name__ \
+                    and any(m.startswith(BENCH_PREFIXES) for m in dir(obj)):
+                found.append((mod_info.name, obj))
+
+    return found
+
+
+def run(pattern: str = "", repeat: int = 5, warmup: int = 1) -> list:
+    """Run all the benchmarks whose name matches the given pattern."""
+    results = []
+    for mod_name, cls in discover():
+        methods = [m for m in sorted(dir(cls))
+                   if m.startswith(BENCH_PREFIXES)]
+        for params in _param_grid(cls):
+            for method in methods:
+                name = "{}.{}.{}({})".format(
+                    mod_name, cls.__name__, method,
+                    ", ".join(repr(p) for p in params))
+                if not re.search(pattern, name):
+                    continue
+                inst = cls()
+                if hasattr(inst, "setup"):
+                    inst.setup(*params)
+                func = getattr(inst, method)
+                if method.startswith("peakmem_"):
+                    res = pm.run_benchmark(func, args=params, repeat=1,
+                                           warmup=0, memory=True, name=name)
+                else:
+                    res = pm.run_benchmark(func, args=params, repeat=repeat,
+                                           warmup=warmup, name=name)
+                if hasattr(inst, "teardown"):
+                    inst.teardown(*params)
+                print("{:<80} {:>14.0f} ns".format(name, res.median)
+                      if res.peak_memory is None else
+                      "{:<80} {:>14} B".format(name, res.peak_memory))
+                results.append(res)
+
+    return results
+
+
+def compare(results: list, baseline: str, tolerance: float) -> list:
+    """Return the benchmarks slower than baseline by more than tolerance."""
+    with open(baseline) as f:
+        previous = {el["name"]: el for el in json.load(f)["benchmarks"]}
+    regressions = []
+    for res in results:
+        old = previous.get(res.name)
+        if old is None or old["median_ns"] is None:
+            continue
+        if res.peak_memory is None:
+            ratio = res.median / old["median_ns"]
+        elif old["peak_memory_bytes"]:
+            ratio = res.peak_memory / old["peak_memory_bytes"]
+        else:
+            continue
+        if ratio > tolerance:
+            regressions.append((res.name, ratio))
+
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", default="bench_output.json",
+                        help="JSON file where results are saved")
+    parser.add_argument("-c", "--compare", default=None,
+                        help="JSON file of a previous run to compare with")
+    parser.add_argument("-t", "--tolerance", type=float, default=1.5,
+                        help="maximum allowed slowdown ratio (default: 1.5)")
+    parser.add_argument("-k", "--filter", default="",
+                        help="only run benchmarks matching this regex")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="number of measured runs (default: 5)")
+    args = parser.parse_args(argv)
+
+    results = run(args.filter, repeat=args.repeat)
+    pm.export_benchmarks(args.output, results)
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for name, ratio in regressions:
+            print("REGRESSION: {} is {:.2f}x slower".format(name, ratio))
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 # Created by Roberto Preste
+import os
 
 __author__ = """Roberto Preste"""
 __email__ = 'robertopreste@gmail.com'
 __version__ = '0.2.1'
+
+if os.environ.get("PRESTOOLS_PROFILE"):
+    from .profiling import _enable_from_env
+    _enable_from_env()
@@ -1,12 +1,24 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 # Created by Roberto Preste
+import os
+import gzip
 import random
+import shutil
+import string
+import struct
+import tempfile
 import numpy as np
+import scipy.sparse as sps
 from scipy import stats
+from scipy.special import comb
 from math import log, sqrt
-from itertools import combinations
-from typing import Union, Dict
+from collections import Counter, deque
+from multiprocessing import Pool
+from itertools import combinations, groupby
+from typing import Union, Dict, Iterator, Iterable, Tuple, List, Callable
+from .classes import (MinHashSketches, Alignment, BootstrapDistances,
+                      IndexedFasta, TwoBitFile)
 
 _NT_LIST = ["A", "C", "G", "T"]
 
@@ -40,6 +52,47 @@ _COMPLEM_DICT = {"A": "T", "C": "G", "G": "C", "T": "A", "U": "A", "R": "Y",
                  "Y": "R", "S": "W", "W": "S", "K": "M", "M": "K", "B": "A",
                  "D": "C", "H": "G", "V": "T"}
 
+# nucleotides matched by each IUPAC code
+_IUPAC_DICT = {code: "T" if code == "U" else desc.replace("/", "")
+               if "/" in desc else code
+               for code, desc in _NT_DICT.items() if len(code) == 1}
+
+# IUPAC code matching the complements of the nucleotides of each code
+_IUPAC_COMPLEMENT = {code: next(other for other, comp in _IUPAC_DICT.items()
+                                if sorted(comp) == sorted([_COMPLEM_DICT[nt]
+                                                           for nt in nts]))
+                     for code, nts in _IUPAC_DICT.items()}
+
+# uppercase conversion of ASCII letters only
+_ASCII_UPPER = str.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+
+# 2-bit codes of nucleotides (A=0, C=1, G=2, T/U=3), any other byte is 4
+_NT_CODES = np.full(256, 4, dtype=np.uint8)
+for _code, _nts in enumerate(["A", "C", "G", "TU"]):
+    for _nt in _nts:
+        _NT_CODES[ord(_nt)] = _NT_CODES[ord(_nt.lower())] = _code
+_COMPLEM_CODES = np.full(5, 4, dtype=np.uint8)
+for _nt in _NT_LIST:
+    _COMPLEM_CODES[_NT_CODES[ord(_nt)]] = _NT_CODES[ord(_COMPLEM_DICT[_nt])]
+del _code, _nts, _nt
+
+_KMER_MAX_K = 31
+_KMER_DENSE_MAX_K = 10
+_KMER_CHUNK_SIZE = 1 << 22
+_SKETCH_EMPTY = np.uint64(np.iinfo(np.uint64).max)
+
+_ALIGN_MODES = ["global", "local", "semiglobal"]
+_ALIGN_NEG = -(1 << 30)
+_ALIGN_MAX_CELLS = 1 << 26
+_MYERS_WORD = 64
+_MOTIF_MAX_EXPANSION = 1 << 16
+_MOTIF_CHUNK_SIZE = 1 << 16
+
+_STOP_CODONS = ["TAA", "TAG", "TGA"]
+_ORF_DTYPE = np.dtype([("start", np.int64), ("end", np.int64),
+                       ("strand", "U1"), ("frame", np.int8),
+                       ("length", np.int64)])
+
 
 def hamming_distance(seq_1: str, seq_2: str,
                      ignore_case: bool = False) -> int:
@@ -58,8 +111,8 @@ def hamming_distance(seq_1: str, seq_2: str,
                          "sequences with different lengths.")
 
     if ignore_case:
-        seq_1 = seq_1.casefold()
-        seq_2 = seq_2.casefold()
+        seq_1 = seq_1.translate(_ASCII_UPPER)
+        seq_2 = seq_2.translate(_ASCII_UPPER)
 
     distance = sum([1 for i in range(len(seq_1))
                     if seq_1[i] != seq_2[i]
@@ -217,18 +270,24 @@ def mutate_sequence(sequence: str,
     return sequence
 
 
-def nt_frequency(sequence: str) -> Dict[str, float]:
+def nt_frequency(sequence: Union[str, np.ndarray]) -> Dict[str, float]:
     """Calculate nucleotide frequencies.
 
     Return a dictionary with nucleotide frequencies from the given
     sequence.
 
     Args:
-        sequence: input nucleotide sequence
+        sequence: input nucleotide sequence, or array of 2-bit codes (see
+            encode_sequence())
 
     Returns:
         freqs: dictionary of nucleotide frequencies
     """
+    if isinstance(sequence, np.ndarray):
+        counts = np.bincount(sequence, minlength=5)
+        return {nt: counts[i] / sequence.shape[0]
+                for i, nt in enumerate(_NT_LIST)}
+
     sequence = sequence.upper()
     length = len(sequence)
 
@@ -456,3 +515,2219 @@ def quantile_norm(x: np.ndarray, to_log: bool = False) -> np.ndarray:
     xn = quantiles[rank_indices]
 
     return xn
+
+
+def read_fasta(path: str) -> Iterator[Tuple[str, str]]:
+    """Read a (optionally gzipped) FASTA file one record at a time.
+
+    Args:
+        path: path of the FASTA file
+
+    Returns:
+        records: iterator of (name, sequence) tuples
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    name = None
+    chunks = []
+    with opener(path, "rt") as f:
+        for line in f:
+            line = line.rstrip()
+            if line.startswith(">"):
+                if name is not None:
+                    yield name, "".join(chunks)
+                name = line[1:]
+                chunks = []
+            elif line:
+                chunks.append(line)
+    if name is not None:
+        yield name, "".join(chunks)
+
+
+def _fasta_lines(path: str) -> Iterator[Tuple[int, str, str]]:
+    """Read a (optionally gzipped) FASTA file one line at a time, without
+    joining the lines of each record.
+
+    Returns:
+        lines: iterator of (record index, name, sequence line) tuples
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    index, name = -1, None
+    with opener(path, "rt") as f:
+        for line in f:
+            line = line.rstrip()
+            if line.startswith(">"):
+                index += 1
+                name = line[1:]
+            elif line and name is not None:
+                yield index, name, line
+
+
+def encode_sequence(sequence: str) -> np.ndarray:
+    """Convert a nucleotide sequence to an array of 2-bit codes.
+
+    Nucleotides are encoded as A=0, C=1, G=2, T/U=3 (case insensitive);
+    any other character is encoded as 4.
+
+    Args:
+        sequence: input nucleotide sequence
+
+    Returns:
+        codes: array of codes, of shape (len(sequence), )
+    """
+    return _NT_CODES[np.frombuffer(sequence.encode("ascii"), dtype=np.uint8)]
+
+
+def kmer_encode(kmer: str) -> int:
+    """Convert a k-mer to its integer code.
+
+    Args:
+        kmer: k-mer of A, C, G, T nucleotides
+
+    Returns:
+        code: integer code of the k-mer
+    """
+    code = 0
+    for el in encode_sequence(kmer).tolist():
+        if el == 4:
+            raise ValueError("Invalid nucleotide in k-mer.")
+        code = (code << 2) | el
+
+    return code
+
+
+def kmer_decode(code: int, k: int) -> str:
+    """Convert an integer code to the corresponding k-mer.
+
+    Args:
+        code: integer code of the k-mer
+        k: length of the k-mer
+
+    Returns:
+        kmer: k-mer of A, C, G, T nucleotides
+    """
+    return "".join([_NT_LIST[(code >> 2 * (k - i - 1)) & 3]
+                    for i in range(k)])
+
+
+def _rolling_codes(codes: np.ndarray, k: int) -> np.ndarray:
+    """Return the integer codes of all the k-mers of an array of 2-bit
+    codes, as uint64 values."""
+    n = codes.shape[0] - k + 1
+    kmers = np.zeros(n, dtype=np.uint64)
+    for i in range(k):
+        kmers <<= np.uint64(2)
+        kmers |= codes[i:i + n]
+
+    return kmers
+
+
+def kmer_codes(sequence: Union[str, np.ndarray],
+               k: int,
+               canonical: bool = False) -> np.ndarray:
+    """Calculate the integer codes of the k-mers of a nucleotide sequence.
+
+    Each k-mer is packed in an integer using 2 bits per nucleotide (see
+    encode_sequence()); k-mers containing other characters (e.g. N) are
+    skipped. Canonical k-mers are the smallest between each k-mer and its
+    reverse complement.
+
+    Args:
+        sequence: input nucleotide sequence, or array of 2-bit codes
+        k: length of the k-mers, between 1 and 31
+        canonical: use canonical k-mers (default: False)
+
+    Returns:
+        kmers: array of k-mer codes in order of position, of dtype uint64
+    """
+    if not 1 <= k <= _KMER_MAX_K:
+        raise ValueError("Invalid k option.")
+    codes = encode_sequence(sequence) if isinstance(sequence, str) \
+        else sequence
+    if codes.shape[0] < k:
+        return np.zeros(0, dtype=np.uint64)
+    invalid = np.concatenate(([0], np.cumsum(codes == 4)))
+    valid = invalid[k:] == invalid[:-k]
+    kmers = _rolling_codes(codes & 3, k)
+    if canonical:
+        rev_kmers = _rolling_codes(_COMPLEM_CODES[codes[::-1]] & 3, k)[::-1]
+        np.minimum(kmers, rev_kmers, out=kmers)
+
+    return kmers[valid]
+
+
+def kmer_count(sequence: Union[str, np.ndarray],
+               k: int,
+               canonical: bool = False,
+               dense: Union[bool, None] = None) -> Union[np.ndarray,
+                                                         Dict[int, int]]:
+    """Count the k-mers of a nucleotide sequence.
+
+    Counts are returned as an array indexed by k-mer code (see
+    kmer_codes()) when dense=True, or as a dictionary of k-mer code: count
+    otherwise. Long sequences are processed in chunks, so that memory use
+    does not grow with the sequence length.
+
+    Examples:
+        >>> counts = kmer_count("ACGTAC", 2)
+        >>> counts[kmer_encode("AC")]
+        2
+
+    Args:
+        sequence: input nucleotide sequence, or array of 2-bit codes
+        k: length of the k-mers, between 1 and 31
+        canonical: use canonical k-mers (default: False)
+        dense: return an array of shape (4 ** k, ) instead of a dictionary
+            (default: True for k <= 10)
+
+    Returns:
+        counts: array or dictionary of k-mer counts
+    """
+    if dense is None:
+        dense = k <= _KMER_DENSE_MAX_K
+    codes = encode_sequence(sequence) if isinstance(sequence, str) \
+        else sequence
+    chunks = (kmer_codes(codes[start:start + _KMER_CHUNK_SIZE + k - 1], k,
+                         canonical=canonical)
+              for start in range(0, max(codes.shape[0] - k + 1, 1),
+                                 _KMER_CHUNK_SIZE))
+    if dense:
+        counts = np.zeros(4 ** k, dtype=np.int64)
+        for kmers in chunks:
+            counts += np.bincount(kmers.astype(np.intp), minlength=4 ** k)
+        return counts
+
+    kmers = np.zeros(0, dtype=np.uint64)
+    counts = np.zeros(0, dtype=np.int64)
+    for chunk in chunks:
+        new, new_counts = np.unique(chunk, return_counts=True)
+        pos = np.searchsorted(kmers, new)
+        found = pos < kmers.shape[0]
+        found[found] = kmers[pos[found]] == new[found]
+        counts[pos[found]] += new_counts[found]
+        kmers = np.insert(kmers, pos[~found], new[~found])
+        counts = np.insert(counts, pos[~found], new_counts[~found])
+
+    return dict(zip(kmers.tolist(), counts.tolist()))
+
+
+def _kmer_count_record(args: tuple) -> Tuple[str, Union[np.ndarray,
+                                                        Dict[int, int]]]:
+    """Count the k-mers of a single (name, sequence) record."""
+    (name, sequence), k, canonical, dense = args
+    return name, kmer_count(sequence, k, canonical=canonical, dense=dense)
+
+
+def iter_kmer_counts(records: Union[str, Iterable[Tuple[str, str]]],
+                     k: int,
+                     canonical: bool = False,
+                     dense: Union[bool, None] = None,
+                     cores: int = 1) -> Iterator[Tuple[str, Union[
+                         np.ndarray, Dict[int, int]]]]:
+    """Count the k-mers of each record of a FASTA file.
+
+    Records are read lazily and, when cores > 1, counted in parallel
+    while preserving their order.
+
+    Args:
+        records: path of a FASTA file, or iterable of (name, sequence)
+            tuples
+        k: length of the k-mers, between 1 and 31
+        canonical: use canonical k-mers (default: False)
+        dense: return arrays of shape (4 ** k, ) instead of dictionaries
+            (default: True for k <= 10)
+        cores: number of processes to use (default: 1)
+
+    Returns:
+        counts: iterator of (name, k-mer counts) tuples
+    """
+    if not 1 <= k <= _KMER_MAX_K:
+        raise ValueError("Invalid k option.")
+    if isinstance(records, str):
+        records = read_fasta(records)
+    jobs = ((record, k, canonical, dense) for record in records)
+    if cores == 1:
+        yield from map(_kmer_count_record, jobs)
+        return
+
+    with Pool(cores) as pool:
+        yield from pool.imap(_kmer_count_record, jobs)
+
+
+def kmer_count_fasta(records: Union[str, Iterable[Tuple[str, str]]],
+                     k: int,
+                     canonical: bool = False,
+                     dense: Union[bool, None] = None,
+                     cores: int = 1) -> Union[np.ndarray, Dict[int, int]]:
+    """Count the k-mers of all the records of a FASTA file.
+
+    Args:
+        records: path of a FASTA file, or iterable of (name, sequence)
+            tuples
+        k: length of the k-mers, between 1 and 31
+        canonical: use canonical k-mers (default: False)
+        dense: return an array of shape (4 ** k, ) instead of a dictionary
+            (default: True for k <= 10)
+        cores: number of processes to use (default: 1)
+
+    Returns:
+        counts: array or dictionary of total k-mer counts
+    """
+    if dense is None:
+        dense = k <= _KMER_DENSE_MAX_K
+    total = np.zeros(4 ** k, dtype=np.int64) if dense else Counter()
+    for _, counts in iter_kmer_counts(records, k, canonical=canonical,
+                                      dense=dense, cores=cores):
+        total += counts if dense else Counter(counts)
+
+    return total if dense else dict(total)
+
+
+def kmer_spectrum(counts: Union[np.ndarray, Dict[int, int]]) -> np.ndarray:
+    """Calculate the k-mer spectrum from k-mer counts.
+
+    Args:
+        counts: array or dictionary of k-mer counts
+
+    Returns:
+        spectrum: array where the i-th element is the number of distinct
+            k-mers occurring i times
+    """
+    if isinstance(counts, dict):
+        counts = np.fromiter(counts.values(), dtype=np.int64,
+                             count=len(counts))
+    spectrum = np.bincount(counts)
+    spectrum[0] = 0
+
+    return spectrum
+
+
+def _kmer_profiles(sequences: Iterable[str],
+                   k: int,
+                   canonical: bool = False,
+                   cores: int = 1) -> sps.csr_matrix:
+    """Return the k-mer counts of each sequence as the rows of a sparse
+    matrix, with one column for each k-mer found in any sequence."""
+    records = ((str(i), seq) for i, seq in enumerate(sequences))
+    kmers, counts, indptr = [], [], [0]
+    for _, el in iter_kmer_counts(records, k, canonical=canonical,
+                                  dense=False, cores=cores):
+        kmers.append(np.fromiter(el.keys(), dtype=np.uint64, count=len(el)))
+        counts.append(np.fromiter(el.values(), dtype=np.int64,
+                                  count=len(el)))
+        indptr.append(indptr[-1] + len(el))
+    if indptr[-1] == 0:
+        return sps.csr_matrix((len(indptr) - 1, 0), dtype=np.int64)
+    _, columns = np.unique(np.concatenate(kmers), return_inverse=True)
+
+    return sps.csr_matrix((np.concatenate(counts), columns.ravel(), indptr))
+
+
+def kmer_distance_matrix(sequences: Iterable[str],
+                         k: int = 5,
+                         metric: str = "cosine",
+                         canonical: bool = False,
+                         cores: int = 1) -> np.ndarray:
+    """Calculate alignment-free distances between k-mer profiles.
+
+    Sequences do not need to be aligned nor to have the same length. The
+    k-mer counts of all sequences are stored in a sparse matrix and all
+    pairwise distances are computed with a single matrix product.
+
+    Args:
+        sequences: input nucleotide sequences
+        k: length of the k-mers, between 1 and 31 (default: 5)
+        metric: distance between k-mer profiles ('cosine', 'euclidean'
+            between k-mer frequencies, 'jaccard' between k-mer sets)
+            (default: 'cosine')
+        canonical: use canonical k-mers (default: False)
+        cores: number of processes used to count k-mers (default: 1)
+
+    Returns:
+        distances: array of pairwise distances, of shape (N_seqs, N_seqs)
+    """
+    if metric not in ["cosine", "euclidean", "jaccard"]:
+        raise ValueError("Invalid metric option.")
+
+    x = _kmer_profiles(sequences, k, canonical=canonical,
+                       cores=cores).astype(float)
+    if metric == "jaccard":
+        x.data[:] = 1
+        sizes = np.asarray(x.sum(axis=1)).ravel()
+        shared = (x @ x.T).toarray()
+        union = sizes[:, np.newaxis] + sizes[np.newaxis, :] - shared
+        with np.errstate(invalid="ignore", divide="ignore"):
+            distances = np.where(union > 0, 1 - shared / union, 0.0)
+    else:
+        norm = "l2" if metric == "cosine" else "l1"
+        totals = np.asarray(abs(x).sum(axis=1)).ravel() if norm == "l1" \
+            else np.sqrt(np.asarray(x.multiply(x).sum(axis=1)).ravel())
+        totals[totals == 0] = 1
+        x = sps.diags(1 / totals) @ x
+        dot = (x @ x.T).toarray()
+        if metric == "cosine":
+            distances = 1 - dot
+        else:
+            sq = np.diag(dot)
+            distances = np.sqrt(np.maximum(sq[:, np.newaxis]
+                                           + sq[np.newaxis, :] - 2 * dot, 0))
+    np.fill_diagonal(distances, 0)
+
+    return np.maximum(distances, 0)
+
+
+def kmer_distance(seq_1: str, seq_2: str,
+                  k: int = 5,
+                  metric: str = "cosine",
+                  canonical: bool = False) -> float:
+    """Calculate the alignment-free distance between two sequences.
+
+    See kmer_distance_matrix() for details.
+
+    Args:
+        seq_1: first sequence to compare
+        seq_2: second sequence to compare
+        k: length of the k-mers, between 1 and 31 (default: 5)
+        metric: distance between k-mer profiles ('cosine', 'euclidean',
+            'jaccard') (default: 'cosine')
+        canonical: use canonical k-mers (default: False)
+
+    Returns:
+        distance: k-mer distance
+    """
+    distances = kmer_distance_matrix([seq_1, seq_2], k=k, metric=metric,
+                                     canonical=canonical)
+
+    return float(distances[0, 1])
+
+
+def _hash_kmers(kmers: np.ndarray, seed: int) -> np.ndarray:
+    """Hash k-mer codes with the splitmix64 finalizer."""
+    x = kmers + np.uint64((seed * 0x9E3779B97F4A7C15) % (1 << 64))
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+
+    return x
+
+
+def minhash_sketch(sequence: str,
+                   k: int = 21,
+                   size: int = 1000,
+                   canonical: bool = True,
+                   seed: int = 42) -> np.ndarray:
+    """Calculate the MinHash (bottom-s) sketch of a nucleotide sequence.
+
+    Args:
+        sequence: input nucleotide sequence
+        k: length of the k-mers, between 1 and 31 (default: 21)
+        size: maximum number of hashes in the sketch (default: 1000)
+        canonical: use canonical k-mers (default: True)
+        seed: seed of the hash function (default: 42)
+
+    Returns:
+        sketch: sorted array of the smallest k-mer hashes, of dtype uint64
+    """
+    codes = encode_sequence(sequence)
+    sketch = np.zeros(0, dtype=np.uint64)
+    for start in range(0, max(codes.shape[0] - k + 1, 1), _KMER_CHUNK_SIZE):
+        kmers = kmer_codes(codes[start:start + _KMER_CHUNK_SIZE + k - 1], k,
+                           canonical=canonical)
+        hashes = np.unique(_hash_kmers(kmers, seed))[:size]
+        sketch = np.unique(np.concatenate((sketch, hashes)))[:size]
+
+    return sketch
+
+
+def _sketch_record(args: tuple) -> np.ndarray:
+    """Sketch a single (name, sequence) record."""
+    (_, sequence), k, size, canonical, seed = args
+    sketch = np.full(size, _SKETCH_EMPTY, dtype=np.uint64)
+    hashes = minhash_sketch(sequence, k=k, size=size, canonical=canonical,
+                            seed=seed)
+    sketch[:hashes.shape[0]] = hashes
+
+    return sketch
+
+
+def sketch_sequences(records: Union[str, Iterable[Tuple[str, str]]],
+                     k: int = 21,
+                     size: int = 1000,
+                     canonical: bool = True,
+                     seed: int = 42,
+                     cores: int = 1) -> MinHashSketches:
+    """Calculate the MinHash sketches of a collection of sequences.
+
+    Args:
+        records: path of a FASTA file, or iterable of (name, sequence)
+            tuples
+        k: length of the k-mers, between 1 and 31 (default: 21)
+        size: maximum number of hashes in each sketch (default: 1000)
+        canonical: use canonical k-mers (default: True)
+        seed: seed of the hash function (default: 42)
+        cores: number of processes to use (default: 1)
+
+    Returns:
+        sketches: MinHashSketches object
+    """
+    if not 1 <= k <= _KMER_MAX_K:
+        raise ValueError("Invalid k option.")
+    if isinstance(records, str):
+        records = read_fasta(records)
+    names = []
+
+    def jobs():
+        for record in records:
+            names.append(record[0])
+            yield record, k, size, canonical, seed
+
+    if cores == 1:
+        hashes = list(map(_sketch_record, jobs()))
+    else:
+        with Pool(cores) as pool:
+            hashes = pool.map(_sketch_record, jobs())
+    hashes = np.array(hashes, dtype=np.uint64).reshape(-1, size)
+
+    return MinHashSketches(hashes=hashes, names=names, k=k, size=size,
+                           canonical=canonical, seed=seed)
+
+
+def _sketch_jaccard(hashes_1: np.ndarray, hashes_2: np.ndarray) -> np.ndarray:
+    """Estimate the Jaccard index of paired rows of two sketch arrays,
+    from the hashes shared within the bottom-s sketch of their union."""
+    size = hashes_1.shape[1]
+    merged = np.sort(np.concatenate((hashes_1, hashes_2), axis=1), axis=1)
+    valid = merged != _SKETCH_EMPTY
+    dup = (merged[:, 1:] == merged[:, :-1]) & valid[:, 1:]
+    distinct = valid.copy()
+    distinct[:, 1:] &= ~dup
+    rank = np.cumsum(distinct, axis=1)
+    shared = np.sum(dup & (rank[:, 1:] <= size), axis=1)
+    union = np.minimum(rank[:, -1], size)
+
+    return np.divide(shared, union, out=np.zeros(shared.shape[0]),
+                     where=union > 0)
+
+
+def _mash_from_jaccard(jaccard: np.ndarray, k: int) -> np.ndarray:
+    """Convert Jaccard indices to Mash distances."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distances = np.log((1 + jaccard) / (2 * jaccard)) / k
+
+    return np.minimum(distances, 1.0)
+
+
+def mash_distance(seq_1: str, seq_2: str,
+                  k: int = 21,
+                  size: int = 1000,
+                  canonical: bool = True,
+                  seed: int = 42) -> float:
+    """Calculate the Mash distance between two sequences.
+
+    Return the Mash distance between seq_1 and seq_2, an estimate of their
+    mutation rate calculated as distance = -1/k log(2j / (1 + j)), where j
+    is the Jaccard index of their k-mer sets estimated from their MinHash
+    sketches. Sequences do not need to be aligned.
+
+    Args:
+        seq_1: first sequence to compare
+        seq_2: second sequence to compare
+        k: length of the k-mers, between 1 and 31 (default: 21)
+        size: maximum number of hashes in each sketch (default: 1000)
+        canonical: use canonical k-mers (default: True)
+        seed: seed of the hash function (default: 42)
+
+    Returns:
+        distance: Mash distance
+    """
+    sketches = sketch_sequences([("1", seq_1), ("2", seq_2)], k=k,
+                                size=size, canonical=canonical, seed=seed)
+    jaccard = _sketch_jaccard(sketches.hashes[:1], sketches.hashes[1:])
+
+    return float(_mash_from_jaccard(jaccard, k)[0])
+
+
+def mash_candidates(sketches: MinHashSketches,
+                    max_distance: float = 0.1,
+                    block_size: int = 10000) -> Tuple[np.ndarray, np.ndarray,
+                                                      np.ndarray]:
+    """Find the pairs of sketches within a maximum Mash distance.
+
+    Pairs sharing no hash are never compared: the sketches are stored as a
+    sparse sequence-by-hash matrix, and pairs sharing hashes are found with
+    its (block-wise) product with itself. Pairs whose number of shared
+    hashes cannot reach max_distance are discarded before estimating the
+    Mash distance of the remaining ones in vectorized batches. The result
+    can be used to select candidate pairs for exact (alignment-based)
+    distances.
+
+    Args:
+        sketches: MinHashSketches object
+        max_distance: maximum Mash distance of the returned pairs
+            (default: 0.1)
+        block_size: number of sketches compared at once (default: 10000)
+
+    Returns:
+        rows: indices of the first sketch of each pair
+        cols: indices of the second sketch of each pair (rows < cols)
+        distances: Mash distances of the pairs
+    """
+    hashes = sketches.hashes
+    n = hashes.shape[0]
+    valid = hashes != _SKETCH_EMPTY
+    lengths = valid.sum(axis=1)
+    _, columns = np.unique(hashes[valid], return_inverse=True)
+    indicator = sps.csr_matrix((np.ones(columns.shape[0], dtype=np.int32),
+                                columns.ravel(),
+                                np.concatenate(([0], np.cumsum(lengths)))),
+                               shape=(n, columns.shape[0] and
+                                      columns.max() + 1))
+    indicator_t = indicator.T.tocsr()
+    min_jaccard = np.exp(-max_distance * sketches.k)
+    min_jaccard /= 2 - min_jaccard
+
+    rows, cols, distances = [], [], []
+    for start in range(0, n, block_size):
+        shared = sps.triu(indicator[start:start + block_size] @ indicator_t,
+                          k=start + 1).tocoo()
+        i = shared.row + start
+        j = shared.col
+        bound = shared.data / np.minimum(np.maximum(lengths[i], lengths[j]),
+                                         sketches.size)
+        keep = bound >= min_jaccard
+        i, j = i[keep], j[keep]
+        for pos in range(0, i.shape[0], block_size):
+            pi, pj = i[pos:pos + block_size], j[pos:pos + block_size]
+            dist = _mash_from_jaccard(_sketch_jaccard(hashes[pi], hashes[pj]),
+                                      sketches.k)
+            keep = dist <= max_distance
+            rows.append(pi[keep])
+            cols.append(pj[keep])
+            distances.append(dist[keep])
+    if not rows:
+        return (np.zeros(0, dtype=int), np.zeros(0, dtype=int),
+                np.zeros(0))
+
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(distances)
+
+
+def mash_distance_matrix(sketches: MinHashSketches) -> np.ndarray:
+    """Calculate all pairwise Mash distances between sketches.
+
+    Pairs of sketches sharing no hash have distance 1.
+
+    Args:
+        sketches: MinHashSketches object
+
+    Returns:
+        distances: array of pairwise distances, of shape (N_seqs, N_seqs)
+    """
+    n = len(sketches)
+    distances = np.ones((n, n))
+    rows, cols, dist = mash_candidates(sketches, max_distance=1.0)
+    distances[rows, cols] = dist
+    distances[cols, rows] = dist
+    np.fill_diagonal(distances, 0)
+
+    return distances
+
+
+def encode_batch(sequences: List[str],
+                 ignore_case: bool = False,
+                 pad: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert a list of sequences to a 2D array of byte codes.
+
+    Each row holds the ASCII codes of a sequence, padded with the given
+    value up to the length of the longest sequence.
+
+    Args:
+        sequences: input sequences
+        ignore_case: convert (ASCII) letters to uppercase (default: False)
+        pad: code used for padding (default: 0)
+
+    Returns:
+        codes: array of codes, of shape (N_seqs, max_length)
+        lengths: array of sequence lengths, of shape (N_seqs, )
+    """
+    lengths = np.fromiter(map(len, sequences), dtype=np.intp,
+                          count=len(sequences))
+    data = "".join(sequences).encode("ascii")
+    if ignore_case:
+        data = data.upper()
+    width = max(int(lengths.max(initial=0)), 1)
+    codes = np.full((lengths.shape[0], width), pad, dtype=np.uint8)
+    codes[np.arange(width) < lengths[:, np.newaxis]] = \
+        np.frombuffer(data, dtype=np.uint8)
+
+    return codes, lengths
+
+
+def _align_dp(seqs_1: List[str], seqs_2: List[str], mode: str, match: int,
+              mismatch: int, gap_open: int, gap_extend: int,
+              band: Union[int, None], traceback: bool) -> tuple:
+    """Fill the affine-gap (Gotoh) dynamic programming matrices of many
+    pairs of sequences at once.
+
+    Cells are computed one anti-diagonal at a time, since all the cells of
+    an anti-diagonal only depend on the two previous ones: each step is a
+    handful of vectorized operations over all the pairs and all the cells
+    of the anti-diagonal, and only three anti-diagonals are kept in memory.
+    When traceback is True, the source of each cell is stored as a bit
+    field (bits 0-1: source of H, i.e. diagonal, E, F or start; bit 2: E
+    extends a gap; bit 3: F extends a gap) for each anti-diagonal.
+
+    Returns:
+        scores: alignment score of each pair
+        ends_1: end position of the alignment in each seq_1
+        ends_2: end position of the alignment in each seq_2
+        pointers: list of bit-field arrays for each anti-diagonal
+        starts: first row stored in each anti-diagonal of pointers
+    """
+    codes_1, len_1 = encode_batch(seqs_1, ignore_case=True, pad=254)
+    codes_2, len_2 = encode_batch(seqs_2, ignore_case=True, pad=255)
+    rev_2 = codes_2[:, ::-1]
+    n_pairs, n_max = codes_1.shape
+    m_max = codes_2.shape[1]
+    rows = np.arange(n_pairs)
+    pair_bands = None
+    if band is None:
+        band = n_max + m_max
+    elif mode == "global":
+        pair_bands = np.maximum(band, np.abs(len_1 - len_2))
+        band = int(pair_bands.max())
+        if (pair_bands == band).all():
+            pair_bands = None
+    local = mode == "local"
+    neg = _ALIGN_NEG
+
+    h_prev2, h_prev, h_cur = [np.full((n_pairs, n_max + 3), neg,
+                                      dtype=np.int32) for _ in range(3)]
+    e_prev, e_cur, f_prev, f_cur = [np.full((n_pairs, n_max + 3), neg,
+                                            dtype=np.int32) for _ in range(4)]
+    h_prev[:, 1] = 0
+    pointers, starts = [np.full((n_pairs, 1), 3, dtype=np.uint8)], [0]
+    scores = np.zeros(n_pairs, dtype=np.int64)
+    ends_1 = np.zeros(n_pairs, dtype=np.intp)
+    ends_2 = np.zeros(n_pairs, dtype=np.intp)
+    if mode == "global":
+        ends_1, ends_2 = len_1.copy(), len_2.copy()
+        totals = len_1 + len_2
+        order = np.argsort(totals, kind="stable")
+        bounds = np.searchsorted(totals[order],
+                                 np.arange(n_max + m_max + 2))
+    elif mode == "semiglobal":
+        scores[(len_1 > 0) & (len_2 > 0)] = neg
+
+    for d in range(1, n_max + m_max + 1):
+        lo = max(0, d - m_max, (d - band + 1) // 2)
+        hi = min(n_max, d, (d + band) // 2)
+        if lo > hi:
+            for arr in (h_cur, e_cur, f_cur):
+                arr.fill(neg)
+            pointers.append(np.zeros((n_pairs, 0), dtype=np.uint8))
+            starts.append(lo)
+            h_prev2, h_prev, h_cur = h_prev, h_cur, h_prev2
+            e_prev, e_cur = e_cur, e_prev
+            f_prev, f_cur = f_cur, f_prev
+            continue
+        pointer = np.zeros((n_pairs, hi - lo + 1), dtype=np.uint8) \
+            if traceback else None
+        first, last = max(lo, 1), min(hi, d - 1)
+        if first <= last:
+            cur = slice(first + 1, last + 2)
+            up = slice(first, last + 1)
+            diag = h_prev2[:, up] + np.where(
+                codes_1[:, first - 1:last]
+                == rev_2[:, m_max - d + first:m_max - d + last + 1],
+                match, mismatch)
+            e_ext = e_prev[:, cur] + gap_extend
+            e_open = h_prev[:, cur] + gap_open
+            f_ext = f_prev[:, up] + gap_extend
+            f_open = h_prev[:, up] + gap_open
+            e = np.maximum(e_ext, e_open)
+            f = np.maximum(f_ext, f_open)
+            h = np.maximum(np.maximum(diag, e), f)
+            if local:
+                np.maximum(h, 0, out=h)
+            if pair_bands is not None:
+                outside = np.abs(2 * np.arange(first, last + 1) - d) \
+                    > pair_bands[:, np.newaxis]
+                e[outside] = f[outside] = h[outside] = neg
+            e_cur[:, cur] = e
+            f_cur[:, cur] = f
+            h_cur[:, cur] = h
+            if traceback:
+                source = np.where(h == diag, 0, np.where(h == e, 1, 2))
+                if local:
+                    source[h == 0] = 3
+                source |= (e_ext >= e_open) << 2
+                source |= (f_ext >= f_open) << 3
+                pointer[:, first - lo:last - lo + 1] = source
+        for i, gap, gap_flag in ((0, e_cur, 1), (d, f_cur, 2)):
+            if not lo <= i <= hi:
+                continue
+            e_cur[:, i + 1] = f_cur[:, i + 1] = neg
+            if mode == "global":
+                h_cur[:, i + 1] = gap[:, i + 1] = \
+                    gap_open + (d - 1) * gap_extend
+                if pair_bands is not None:
+                    h_cur[pair_bands < d, i + 1] = neg
+                    gap[pair_bands < d, i + 1] = neg
+                if traceback:
+                    pointer[:, i - lo] = gap_flag | \
+                        ((gap_flag << 2) if d > 1 else 0)
+            else:
+                h_cur[:, i + 1] = 0
+                if traceback:
+                    pointer[:, i - lo] = 3
+        for arr in (h_cur, e_cur, f_cur):
+            arr[:, lo] = arr[:, hi + 2] = neg
+
+        if mode == "global":
+            done = order[bounds[d]:bounds[d + 1]]
+            scores[done] = h_cur[done, len_1[done] + 1]
+        elif mode == "semiglobal":
+            for i in (len_1, d - len_2):
+                valid = (i >= lo) & (i <= hi) & (i <= len_1) \
+                    & (d - i <= len_2)
+                values = h_cur[rows, np.clip(i, lo, hi) + 1]
+                better = valid & (values > scores)
+                scores[better] = values[better]
+                ends_1[better] = i[better]
+                ends_2[better] = d - i[better]
+        else:
+            i = np.arange(lo, hi + 1)
+            valid = (i <= len_1[:, np.newaxis]) \
+                & (d - i <= len_2[:, np.newaxis])
+            values = np.where(valid, h_cur[:, lo + 1:hi + 2], neg)
+            pos = values.argmax(axis=1)
+            values = values[rows, pos]
+            better = values > scores
+            scores[better] = values[better]
+            ends_1[better] = pos[better] + lo
+            ends_2[better] = d - ends_1[better]
+
+        if traceback:
+            pointers.append(pointer)
+            starts.append(lo)
+        h_prev2, h_prev, h_cur = h_prev, h_cur, h_prev2
+        e_prev, e_cur = e_cur, e_prev
+        f_prev, f_cur = f_cur, f_prev
+
+    return scores, ends_1, ends_2, pointers, starts
+
+
+def _traceback(seq_1: str, seq_2: str, pointers: List[np.ndarray],
+               starts: List[int], row: int, i: int,
+               j: int) -> Tuple[str, str, int, int]:
+    """Follow the pointers of a pair from cell (i, j) back to the start of
+    the alignment, returning the aligned sequences and the start cell."""
+    out_1, out_2 = [], []
+    state = 0
+    while i > 0 or j > 0:
+        pointer = pointers[i + j][row, i - starts[i + j]]
+        if state == 0:
+            state = pointer & 3
+            if state == 3:
+                break
+            if state == 0:
+                out_1.append(seq_1[i - 1])
+                out_2.append(seq_2[j - 1])
+                i -= 1
+                j -= 1
+                continue
+        if state == 1:
+            out_1.append("-")
+            out_2.append(seq_2[j - 1])
+            j -= 1
+            state = 1 if pointer & 4 else 0
+        else:
+            out_1.append(seq_1[i - 1])
+            out_2.append("-")
+            i -= 1
+            state = 2 if pointer & 8 else 0
+
+    return "".join(reversed(out_1)), "".join(reversed(out_2)), i, j
+
+
+def _align_chunk(args: tuple) -> list:
+    """Align a chunk of pairs of sequences."""
+    pairs, mode, match, mismatch, gap_open, gap_extend, band, \
+        score_only = args
+    seqs_1 = [el[0] for el in pairs]
+    seqs_2 = [el[1] for el in pairs]
+    scores, ends_1, ends_2, pointers, starts = _align_dp(
+        seqs_1, seqs_2, mode, match, mismatch, gap_open, gap_extend, band,
+        traceback=not score_only)
+    if score_only:
+        return scores.tolist()
+
+    alignments = []
+    for row, (seq_1, seq_2) in enumerate(pairs):
+        end_1, end_2 = int(ends_1[row]), int(ends_2[row])
+        aligned_1, aligned_2, start_1, start_2 = _traceback(
+            seq_1, seq_2, pointers, starts, row, end_1, end_2)
+        if mode == "semiglobal":
+            aligned_1 = seq_1[:start_1] + "-" * start_2 + aligned_1 \
+                + seq_1[end_1:] + "-" * (len(seq_2) - end_2)
+            aligned_2 = "-" * start_1 + seq_2[:start_2] + aligned_2 \
+                + "-" * (len(seq_1) - end_1) + seq_2[end_2:]
+        alignments.append(Alignment(aligned_1, aligned_2,
+                                    score=int(scores[row]), mode=mode,
+                                    start_1=start_1, end_1=end_1,
+                                    start_2=start_2, end_2=end_2))
+
+    return alignments
+
+
+def align_batch(pairs: Iterable[Tuple[str, str]],
+                mode: str = "global",
+                match: int = 1,
+                mismatch: int = -1,
+                gap_open: int = -3,
+                gap_extend: int = -1,
+                band: Union[int, None] = None,
+                score_only: bool = False,
+                batch_size: int = 256,
+                cores: int = 1) -> Union[List[Alignment], np.ndarray]:
+    """Align many pairs of sequences.
+
+    Pairs are sorted by length and aligned in batches, each batch being
+    computed at once by the vectorized dynamic programming of align().
+    The number of pairs of a batch is also limited so that the traceback
+    pointers fit in about 64 MB.
+
+    Args:
+        pairs: iterable of (seq_1, seq_2) tuples
+        mode: type of alignment ('global', 'local', 'semiglobal')
+            (default: 'global')
+        match: score of identical characters (default: 1)
+        mismatch: score of different characters (default: -1)
+        gap_open: score of the first position of a gap (default: -3)
+        gap_extend: score of each further position of a gap (default: -1)
+        band: maximum distance from the main diagonal of the alignment
+            matrix (default: None)
+        score_only: only compute the alignment scores (default: False)
+        batch_size: maximum number of pairs aligned at once (default: 256)
+        cores: number of processes to use (default: 1)
+
+    Returns:
+        alignments: list of Alignment objects, or array of alignment
+            scores if score_only is True
+    """
+    if mode not in _ALIGN_MODES:
+        raise ValueError("Invalid mode option.")
+    pairs = list(pairs)
+    order = sorted(range(len(pairs)),
+                   key=lambda x: (len(pairs[x][0]), len(pairs[x][1])))
+    chunks, chunk = [], []
+    max_1 = max_2 = 0
+    for idx in order:
+        len_1, len_2 = len(pairs[idx][0]) + 1, len(pairs[idx][1]) + 1
+        cells = (len(chunk) + 1) * max(max_1, len_1) * max(max_2, len_2) \
+            if band is None else (len(chunk) + 1) * (len_1 + len_2) \
+            * (2 * band + 1)
+        if chunk and (len(chunk) == batch_size or
+                      (not score_only and cells > _ALIGN_MAX_CELLS)):
+            chunks.append(chunk)
+            chunk, max_1, max_2 = [], 0, 0
+        chunk.append(idx)
+        max_1, max_2 = max(max_1, len_1), max(max_2, len_2)
+    if chunk:
+        chunks.append(chunk)
+
+    jobs = (([pairs[idx] for idx in chunk], mode, match, mismatch,
+             gap_open, gap_extend, band, score_only) for chunk in chunks)
+    if cores == 1:
+        results = map(_align_chunk, jobs)
+    else:
+        pool = Pool(cores)
+        results = pool.imap(_align_chunk, jobs)
+    output = [None] * len(pairs)
+    for chunk, result in zip(chunks, results):
+        for idx, el in zip(chunk, result):
+            output[idx] = el
+    if cores != 1:
+        pool.close()
+        pool.join()
+
+    return np.array(output, dtype=np.int64) if score_only else output
+
+
+def align(seq_1: str, seq_2: str,
+          mode: str = "global",
+          match: int = 1,
+          mismatch: int = -1,
+          gap_open: int = -3,
+          gap_extend: int = -1,
+          band: Union[int, None] = None,
+          score_only: bool = False) -> Union[Alignment, int]:
+    """Align two sequences with affine gap penalties.
+
+    Compute the optimal global (Needleman-Wunsch), local (Smith-Waterman)
+    or semiglobal (end gaps are not penalized) alignment of seq_1 and
+    seq_2, where a gap of length n scores gap_open + (n - 1) * gap_extend.
+    Sequences are compared ignoring case.
+
+    The dynamic programming matrix is filled one anti-diagonal at a time
+    with vectorized NumPy operations. If band is given, only cells within
+    band positions from the main diagonal are computed, which is much
+    faster for long, similar sequences (for global alignments the band is
+    widened to the length difference of the sequences, if needed). With
+    score_only=True, no traceback is stored and memory use is linear in
+    the sequence length.
+
+    Args:
+        seq_1: first sequence to align
+        seq_2: second sequence to align
+        mode: type of alignment ('global', 'local', 'semiglobal')
+            (default: 'global')
+        match: score of identical characters (default: 1)
+        mismatch: score of different characters (default: -1)
+        gap_open: score of the first position of a gap (default: -3)
+        gap_extend: score of each further position of a gap (default: -1)
+        band: maximum distance from the main diagonal of the alignment
+            matrix (default: None)
+        score_only: only compute the alignment score (default: False)
+
+    Returns:
+        alignment: Alignment object, or alignment score if score_only
+            is True
+    """
+    result = align_batch([(seq_1, seq_2)], mode=mode, match=match,
+                         mismatch=mismatch, gap_open=gap_open,
+                         gap_extend=gap_extend, band=band,
+                         score_only=score_only)
+
+    return int(result[0]) if score_only else result[0]
+
+
+def _distance_model(model: str) -> Callable[[str, str], float]:
+    """Return the distance function of the given name."""
+    models = {"hamming_distance": hamming_distance,
+              "p_distance": p_distance,
+              "jukes_cantor_distance": jukes_cantor_distance,
+              "tajima_nei_distance": tajima_nei_distance,
+              "kimura_distance": kimura_distance,
+              "tamura_distance": tamura_distance}
+    if model not in models:
+        raise ValueError("Invalid model option.")
+
+    return models[model]
+
+
+def alignment_distances(pairs: Iterable[Tuple[str, str]],
+                        model: str = "p_distance",
+                        mode: str = "global",
+                        match: int = 1,
+                        mismatch: int = -1,
+                        gap_open: int = -3,
+                        gap_extend: int = -1,
+                        band: Union[int, None] = None,
+                        batch_size: int = 256,
+                        cores: int = 1) -> np.ndarray:
+    """Calculate distances between unaligned pairs of sequences.
+
+    Each pair is aligned with align_batch() and its distance is computed
+    on the aligned sequences with one of the distance models of this
+    module. Pairs whose distance cannot be calculated (e.g. too divergent
+    sequences) get a NaN distance.
+
+    Args:
+        pairs: iterable of (seq_1, seq_2) tuples
+        model: distance model to use ('hamming_distance', 'p_distance',
+            'jukes_cantor_distance', 'tajima_nei_distance',
+            'kimura_distance', 'tamura_distance') (default: 'p_distance')
+        mode: type of alignment ('global', 'local', 'semiglobal')
+            (default: 'global')
+        match: score of identical characters (default: 1)
+        mismatch: score of different characters (default: -1)
+        gap_open: score of the first position of a gap (default: -3)
+        gap_extend: score of each further position of a gap (default: -1)
+        band: maximum distance from the main diagonal of the alignment
+            matrix (default: None)
+        batch_size: maximum number of pairs aligned at once (default: 256)
+        cores: number of processes to use (default: 1)
+
+    Returns:
+        distances: array of distances, of shape (N_pairs, )
+    """
+    model = _distance_model(model)
+    alignments = align_batch(pairs, mode=mode, match=match,
+                             mismatch=mismatch, gap_open=gap_open,
+                             gap_extend=gap_extend, band=band,
+                             batch_size=batch_size, cores=cores)
+    distances = np.full(len(alignments), np.nan)
+    for idx, el in enumerate(alignments):
+        try:
+            distances[idx] = model(el.aligned_1, el.aligned_2)
+        except (ValueError, ZeroDivisionError):
+            continue
+
+    return distances
+
+
+def edit_distance(seq_1: str, seq_2: str,
+                  max_distance: Union[int, None] = None,
+                  ignore_case: bool = False) -> int:
+    """Calculate the edit (Levenshtein) distance between two sequences.
+
+    Return the minimum number of substitutions, insertions and deletions
+    turning seq_1 into seq_2, which can have different lengths. The
+    distance is computed with Myers' bit-parallel algorithm, processing
+    one character of the longer sequence per step. If max_distance is
+    given, the computation stops as soon as the distance is known to
+    exceed it, and max_distance + 1 is returned.
+
+    Args:
+        seq_1: first sequence to compare
+        seq_2: second sequence to compare
+        max_distance: maximum distance of interest (default: None)
+        ignore_case: ignore (ASCII) case when comparing sequences
+            (default: False)
+
+    Returns:
+        distance: edit distance
+    """
+    if ignore_case:
+        seq_1 = seq_1.translate(_ASCII_UPPER)
+        seq_2 = seq_2.translate(_ASCII_UPPER)
+    if len(seq_1) > len(seq_2):
+        seq_1, seq_2 = seq_2, seq_1
+    limit = len(seq_2) if max_distance is None else max_distance
+    if len(seq_2) - len(seq_1) > limit:
+        return limit + 1
+    if not seq_1:
+        return len(seq_2)
+
+    peq = {}
+    for i, char in enumerate(seq_1):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    mask = (1 << len(seq_1)) - 1
+    high = 1 << (len(seq_1) - 1)
+    pv, mv, score = mask, 0, len(seq_1)
+    remaining = len(seq_2)
+    for char in seq_2:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        remaining -= 1
+        if score - remaining > limit:
+            return limit + 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+
+    return score
+
+
+def _myers_columns(bits: np.ndarray, lengths: np.ndarray,
+                   text: np.ndarray, limit: int) -> np.ndarray:
+    """Run Myers' algorithm for many patterns of at most 64 characters
+    against the same text. bits holds the pattern bit masks of each symbol,
+    of shape (N_symbols, N_patterns), and text the symbol indices of the
+    text. Rows whose distance exceeds limit are dropped along the way and
+    get limit + 1."""
+    n = lengths.shape[0]
+    one = np.uint64(1)
+    mask = np.where(lengths >= _MYERS_WORD, np.uint64(-1 % (1 << 64)),
+                    (one << lengths.astype(np.uint64)) - one)
+    high = one << np.maximum(lengths - 1, 0).astype(np.uint64)
+    pv, mv = mask.copy(), np.zeros(n, dtype=np.uint64)
+    score = lengths.astype(np.int64)
+    active = np.arange(n)
+    distances = np.full(n, limit + 1, dtype=np.int64)
+    for t in range(text.shape[0]):
+        eq = bits[text[t]]
+        if active.shape[0] < n:
+            eq = eq[active]
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        score += (ph & high) != 0
+        score -= (mh & high) != 0
+        ph = (ph << one) | one
+        mh = mh << one
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+        alive = score - (text.shape[0] - t - 1) <= limit
+        if not alive.all():
+            active, score, pv, mv, mask, high = (
+                el[alive] for el in (active, score, pv, mv, mask, high))
+            if active.shape[0] == 0:
+                break
+    keep = score <= limit
+    distances[active[keep]] = score[keep]
+
+    return distances
+
+
+def edit_distance_batch(query: str,
+                        targets: Union[List[str], Tuple[np.ndarray,
+                                                        np.ndarray]],
+                        max_distance: Union[int, None] = None,
+                        ignore_case: bool = False) -> np.ndarray:
+    """Calculate the edit distances between a query and many targets.
+
+    Targets of at most 64 characters (e.g. barcodes, primers or short
+    reads) are compared at once: each target is stored as the bit masks
+    of Myers' algorithm in a 64-bit integer, and the query is processed
+    one character at a time with vectorized operations over all targets.
+    Targets exceeding max_distance are discarded as soon as possible and
+    get a distance of max_distance + 1. Longer targets are compared one
+    at a time with edit_distance().
+
+    Examples:
+        >>> codes = encode_batch(barcodes)
+        >>> for read in reads:
+        ...     distances = edit_distance_batch(read, codes, max_distance=2)
+
+    Args:
+        query: query sequence
+        targets: list of target sequences, or (codes, lengths) tuple
+            returned by encode_batch()
+        max_distance: maximum distance of interest (default: None)
+        ignore_case: ignore (ASCII) case when comparing sequences
+            (default: False)
+
+    Returns:
+        distances: array of edit distances, of shape (N_targets, )
+    """
+    if ignore_case:
+        query = query.translate(_ASCII_UPPER)
+    if isinstance(targets, tuple):
+        codes, lengths = targets
+        if ignore_case:
+            upper = np.arange(256, dtype=np.uint8)
+            upper[ord("a"):ord("z") + 1] -= 32
+            codes = upper[codes]
+    else:
+        codes, lengths = encode_batch(targets, ignore_case=ignore_case)
+    text = np.frombuffer(query.encode("ascii"), dtype=np.uint8)
+    limit = max(len(query), int(lengths.max(initial=0))) \
+        if max_distance is None else max_distance
+    distances = np.full(lengths.shape[0], limit + 1, dtype=np.int64)
+
+    close = np.abs(lengths - text.shape[0]) <= limit
+    short = close & (lengths <= _MYERS_WORD)
+    for idx in np.flatnonzero(close & ~short):
+        target = codes[idx, :lengths[idx]].tobytes().decode("ascii")
+        distances[idx] = edit_distance(query, target, max_distance=limit)
+    short = np.flatnonzero(short)
+    if short.shape[0] == 0:
+        return distances
+    if text.shape[0] == 0:
+        distances[short] = lengths[short]
+        return distances
+
+    width = min(codes.shape[1], _MYERS_WORD)
+    n_bytes = -(-width // 8)
+    sub_codes = np.zeros((short.shape[0], 8 * n_bytes), dtype=np.uint8)
+    sub_codes[:, :width] = codes[short, :width]
+    sub_lengths = lengths[short]
+    valid = np.arange(8 * n_bytes) < sub_lengths[:, np.newaxis]
+    symbols, text = np.unique(text, return_inverse=True)
+    bits = np.zeros((symbols.shape[0], short.shape[0], 8), dtype=np.uint8)
+    for k, symbol in enumerate(symbols):
+        # rows span whole bytes, so packing the flat array packs each row
+        bits[k, :, :n_bytes] = np.packbits(
+            ((sub_codes == symbol) & valid).ravel(),
+            bitorder="little").reshape(-1, n_bytes)
+    bits = bits.view("<u8")[:, :, 0].astype(np.uint64)
+    distances[short] = _myers_columns(bits, sub_lengths, text.ravel(),
+                                      limit)
+    empty = sub_lengths == 0
+    distances[short[empty]] = np.where(text.shape[0] <= limit,
+                                       text.shape[0], limit + 1)
+
+    return distances
+
+
+def _row_distances(args: tuple) -> np.ndarray:
+    """Distances between a sequence and a list of sequences."""
+    sequence, others, model = args
+    model = _distance_model(model)
+    distances = np.full(len(others), np.nan)
+    for k, seq in enumerate(others):
+        try:
+            distances[k] = model(sequence, seq)
+        except (ValueError, ZeroDivisionError):
+            continue
+
+    return distances
+
+
+def pairwise_distances(sequences: List[str],
+                       model: str = "p_distance",
+                       cores: int = 1) -> np.ndarray:
+    """Calculate a distance model between all pairs of aligned sequences.
+
+    The result is a condensed distance vector, in the same order as
+    scipy.spatial.distance.pdist, which can be used to build trees with
+    prestools.clustering.neighbor_joining() or upgma(). Pairs whose
+    distance cannot be calculated get a NaN distance.
+
+    Args:
+        sequences: aligned sequences, all of the same length
+        model: distance model to use ('hamming_distance', 'p_distance',
+            'jukes_cantor_distance', 'tajima_nei_distance',
+            'kimura_distance', 'tamura_distance') (default: 'p_distance')
+        cores: number of processes to use (default: 1)
+
+    Returns:
+        distances: condensed distance vector, of shape
+            (N_seqs * (N_seqs - 1) / 2, )
+    """
+    _distance_model(model)
+    sequences = list(sequences)
+    jobs = ((sequences[i], sequences[i + 1:], model)
+            for i in range(len(sequences) - 1))
+    if cores == 1:
+        rows = list(map(_row_distances, jobs))
+    else:
+        with Pool(cores) as pool:
+            rows = pool.map(_row_distances, jobs)
+    if not rows:
+        return np.zeros(0)
+
+    return np.concatenate(rows)
+
+
+def _encode_alignment(sequences: List[str]) -> np.ndarray:
+    """Return aligned sequences as a (N_seqs, length) array of bytes."""
+    if len({len(seq) for seq in sequences}) > 1:
+        raise ValueError("Cannot bootstrap sequences with different "
+                         "lengths.")
+    if not sequences or not sequences[0]:
+        raise ValueError("Cannot bootstrap empty sequences.")
+    codes = np.frombuffer("".join(sequences).encode("ascii", "replace"),
+                          dtype=np.uint8)
+
+    return codes.reshape(len(sequences), -1)
+
+
+def _weighted_distances(codes: np.ndarray, weights: np.ndarray,
+                        model: str) -> np.ndarray:
+    """Distances between all pairs of aligned sequences, given the weight
+    (number of occurrences) of each alignment column in each replicate.
+
+    Every distance model only depends on per-column counts (mismatches,
+    transitions, nucleotides, ...), so the counts of all replicates are
+    obtained at once as products between the weights and the column
+    indicators of each pair. Results match those of the scalar models
+    with unit weights, with NaN where they would raise an error.
+    """
+    n, length = codes.shape
+    weights = weights.astype(float)
+    fold = np.where((codes >= 65) & (codes <= 90), codes + 32, codes)
+    gap = codes == ord("-")
+    purine = (codes == ord("A")) | (codes == ord("G"))
+    pyrimidine = (codes == ord("C")) | (codes == ord("T"))
+    if model in ["tamura_distance", "tajima_nei_distance"]:
+        nts = {nt: weights @ (fold == ord(nt.lower())).T / length
+               for nt in _NT_LIST}
+    distances = np.empty((weights.shape[0], n * (n - 1) // 2))
+    start = 0
+    with np.errstate(all="ignore"):
+        for i in range(n - 1):
+            js = slice(i + 1, n)
+            valid = ~gap[i] & ~gap[js]
+            if model == "hamming_distance":
+                # the only case-sensitive model
+                p = weights @ ((codes[i] != codes[js]) & valid).T
+            else:
+                p = weights @ ((fold[i] != fold[js]) & valid).T / length
+            if model == "jukes_cantor_distance":
+                p = -0.75 * np.log(1 - p / 0.75)
+            elif model in ["kimura_distance", "tamura_distance"]:
+                pairs = weights @ valid.T
+                ts = weights @ (((purine[i] & purine[js])
+                                 | (pyrimidine[i] & pyrimidine[js]))
+                                & (codes[i] != codes[js])).T / pairs
+                tv = weights @ ((purine[i] & pyrimidine[js])
+                                | (pyrimidine[i] & purine[js])).T / pairs
+                if model == "kimura_distance":
+                    p = -0.5 * np.log((1 - 2 * ts - tv) * np.sqrt(1 - 2 * tv))
+                else:
+                    gc_i = nts["C"][:, i:i + 1] + nts["G"][:, i:i + 1]
+                    gc_j = nts["C"][:, js] + nts["G"][:, js]
+                    c = gc_i + gc_j - 2 * gc_i * gc_j
+                    p = -c * np.log(1 - ts / c - tv) \
+                        - 0.5 * (1 - c) * np.log(1 - 2 * tv)
+            elif model == "tajima_nei_distance":
+                pairs = weights @ valid.T
+                g = {nt: (nts[nt][:, i:i + 1] + nts[nt][:, js]) / 2
+                     for nt in _NT_LIST}
+                h = 0
+                for nt_1, nt_2 in combinations(_NT_LIST, 2):
+                    a, b = ord(nt_1), ord(nt_2)
+                    x = weights @ (((codes[i] == a) & (codes[js] == b))
+                                   | ((codes[i] == b)
+                                      & (codes[js] == a))).T / pairs
+                    h = h + 0.5 * x ** 2 / (g[nt_1] * g[nt_2])
+                b = 0.5 * (1 - sum([g[nt] ** 2 for nt in _NT_LIST])
+                           + p ** 2 / h)
+                p = -b * np.log(1 - p / b)
+            distances[:, start:start + n - i - 1] = p
+            start += n - i - 1
+    distances[~np.isfinite(distances)] = np.nan
+
+    return distances
+
+
+def _bootstrap_chunk(args: tuple) -> np.ndarray:
+    """Distances of a chunk of bootstrap replicates, drawn from their own
+    random stream."""
+    codes, model, seed, replicates = args
+    rng = np.random.default_rng(seed)
+    length = codes.shape[1]
+    columns = rng.integers(0, length, size=(replicates, length))
+    columns += np.arange(replicates)[:, np.newaxis] * length
+    weights = np.bincount(columns.ravel(), minlength=replicates * length)
+
+    return _weighted_distances(codes, weights.reshape(replicates, length),
+                               model)
+
+
+def bootstrap_distances(sequences: List[str],
+                        model: str = "p_distance",
+                        replicates: int = 100,
+                        seed: Union[int, None] = None,
+                        batch_size: int = 50,
+                        cores: int = 1) -> BootstrapDistances:
+    """Calculate pairwise distances on bootstrap replicates of an alignment.
+
+    Each replicate resamples the alignment columns with replacement. The
+    columns are never copied: a replicate is a vector holding the number
+    of times each column was drawn, and the distances of a batch of
+    replicates are computed together from the weighted column counts.
+    Batches are processed in parallel, each with its own random stream
+    spawned from seed, so that results only depend on seed and batch_size
+    and not on the number of cores used.
+
+    Examples:
+        >>> boot = bootstrap_distances(seqs, "kimura_distance", seed=42)
+        >>> boot.variance  # per-pair variance of the distances
+
+    Args:
+        sequences: aligned sequences, all of the same length
+        model: distance model to use ('hamming_distance', 'p_distance',
+            'jukes_cantor_distance', 'tajima_nei_distance',
+            'kimura_distance', 'tamura_distance') (default: 'p_distance')
+        replicates: number of bootstrap replicates (default: 100)
+        seed: seed of the random streams (default: None, random seed)
+        batch_size: number of replicates processed together (default: 50)
+        cores: number of processes to use (default: 1)
+
+    Returns:
+        boot: instance of prestools.classes.BootstrapDistances(), whose
+            distances are condensed vectors in the same order as
+            scipy.spatial.distance.pdist
+    """
+    _distance_model(model)
+    codes = _encode_alignment(list(sequences))
+    distances = _weighted_distances(codes, np.ones((1, codes.shape[1])),
+                                    model)[0]
+    seed_seq = np.random.SeedSequence(seed)
+    n_batches = -(-replicates // batch_size)
+    jobs = [(codes, model, child,
+             min(batch_size, replicates - k * batch_size))
+            for k, child in enumerate(seed_seq.spawn(n_batches))]
+    if cores == 1:
+        chunks = list(map(_bootstrap_chunk, jobs))
+    else:
+        with Pool(cores) as pool:
+            chunks = pool.map(_bootstrap_chunk, jobs)
+    reps = np.concatenate(chunks) if chunks \
+        else np.zeros((0, distances.shape[0]))
+
+    return BootstrapDistances(distances=distances, replicates=reps,
+                              model=model, seed=seed_seq.entropy)
+
+
+def _expand_iupac(motif: str) -> List[str]:
+    """Return all the A/C/G/T sequences matched by an IUPAC motif."""
+    size = 1
+    for nt in motif:
+        if nt not in _IUPAC_DICT:
+            raise ValueError("Invalid nucleotide in motif.")
+        size *= len(_IUPAC_DICT[nt])
+    if size > _MOTIF_MAX_EXPANSION:
+        raise ValueError("Too many degenerate positions in motif.")
+    expanded = [""]
+    for nt in motif:
+        expanded = [el + base for el in expanded for base in _IUPAC_DICT[nt]]
+
+    return expanded
+
+
+def _motif_matcher(motifs: Union[List[str], Dict[str, str]],
+                   mismatches: int,
+                   both_strands: bool) -> dict:
+    """Build the Aho-Corasick automaton searching a set of IUPAC motifs.
+
+    Each motif (and its reverse complement) is split in mismatches + 1
+    pieces, at least one of which must match exactly in any occurrence
+    with up to mismatches mismatches; the automaton searches all the
+    expansions of the degenerate positions of each piece. Its goto and
+    failure functions are merged in a single transition table, indexed by
+    5 * state + nucleotide code, so that the scan does one lookup per
+    character.
+
+    Returns:
+        matcher: dictionary holding the transition table, the pieces
+            ending at each state (as (motif index, end of the piece in the
+            motif) pairs stored in CSR format), the bitmask of the
+            nucleotides allowed at each position of each motif and the
+            (name, motif, strand) of each oriented motif
+    """
+    if isinstance(motifs, dict):
+        items = list(motifs.items())
+    else:
+        items = [(motif, motif) for motif in motifs]
+    oriented = []
+    for name, motif in items:
+        motif = motif.upper()
+        if len(motif) <= mismatches:
+            raise ValueError("Motifs must be longer than the number of "
+                             "mismatches.")
+        oriented.append((name, motif, "+"))
+        if both_strands:
+            oriented.append((name, "".join([_IUPAC_COMPLEMENT.get(nt, nt)
+                                            for nt in motif])[::-1], "-"))
+
+    goto, outputs = [{}], [[]]
+    for idx, (_, motif, _) in enumerate(oriented):
+        bounds = [len(motif) * i // (mismatches + 1)
+                  for i in range(mismatches + 2)]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            for piece in _expand_iupac(motif[start:end]):
+                state = 0
+                for code in encode_sequence(piece).tolist():
+                    if code not in goto[state]:
+                        goto[state][code] = len(goto)
+                        goto.append({})
+                        outputs.append([])
+                    state = goto[state][code]
+                outputs[state].append((idx, end))
+
+    transitions = [0] * (5 * len(goto))
+    fail = [0] * len(goto)
+    queue = deque()
+    for code, state in goto[0].items():
+        transitions[code] = 5 * state
+        queue.append(state)
+    while queue:
+        state = queue.popleft()
+        outputs[state] += outputs[fail[state]]
+        for code in range(4):
+            target = transitions[5 * fail[state] + code]
+            if code in goto[state]:
+                child = goto[state][code]
+                fail[child] = target // 5 if state else 0
+                transitions[5 * state + code] = 5 * child
+                queue.append(child)
+            else:
+                transitions[5 * state + code] = target
+
+    # bit 1 << code for each nucleotide allowed at each motif position;
+    # positions past the end of a motif also allow non-nucleotides (16)
+    lengths = np.array([len(motif) for _, motif, _ in oriented],
+                       dtype=np.intp)
+    masks = np.full((len(oriented), max(lengths, default=0)), 31,
+                    dtype=np.uint8)
+    for idx, (_, motif, _) in enumerate(oriented):
+        masks[idx, :len(motif)] = [sum([1 << int(_NT_CODES[ord(base)])
+                                        for base in _IUPAC_DICT[nt]])
+                                   for nt in motif]
+    pieces = [piece for out in outputs for piece in out]
+    has_output = [False] * (5 * len(goto))
+    for state, out in enumerate(outputs):
+        has_output[5 * state] = bool(out)
+
+    return {"transitions": transitions, "has_output": has_output,
+            "out_ptr": np.cumsum([0] + [len(out) for out in outputs]),
+            "out_motif": np.array([el[0] for el in pieces], dtype=np.intp),
+            "out_end": np.array([el[1] for el in pieces], dtype=np.intp),
+            "lengths": lengths, "masks": masks, "oriented": oriented}
+
+
+def _scan_motifs(matcher: dict, chunks: Iterable[str],
+                 mismatches: int) -> Iterator[Tuple[int, int, int, int]]:
+    """Scan a sequence, given as consecutive chunks, for the motifs of a
+    matcher built by _motif_matcher().
+
+    Only the automaton transitions are run character by character: the
+    candidate occurrences implied by the pieces found in each chunk are
+    expanded and verified with array operations once the chunk has been
+    scanned. Only the end of the sequence needed to verify pending
+    candidates is kept in memory.
+
+    Returns:
+        hits: iterator of (start, end, oriented motif index, mismatches)
+            tuples, sorted by end position
+    """
+    transitions, has_output = matcher["transitions"], matcher["has_output"]
+    lengths, masks = matcher["lengths"], matcher["masks"]
+    max_length = masks.shape[1]
+    table = _NT_CODES.tobytes()
+    state, pos, offset = 0, 0, 0
+    bits = np.zeros(0, dtype=np.uint8)
+    pending = np.zeros((2, 0), dtype=np.intp)
+    for chunk in chunks:
+        codes = chunk.encode("ascii", "replace").translate(table)
+        found_pos, found_state = [], []
+        for k, code in enumerate(codes):
+            state = transitions[state + code]
+            if has_output[state]:
+                found_pos.append(k)
+                found_state.append(state)
+        found_state = np.array(found_state, dtype=np.intp) // 5
+        ptr = matcher["out_ptr"]
+        counts = ptr[found_state + 1] - ptr[found_state]
+        rows = np.repeat(ptr[found_state] - np.cumsum(counts) + counts,
+                         counts) + np.arange(counts.sum())
+        idx = matcher["out_motif"][rows]
+        starts = np.repeat(np.array(found_pos, dtype=np.intp) + pos + 1,
+                           counts) - matcher["out_end"][rows]
+        keep = starts >= 0
+        candidates = np.unique(np.concatenate(
+            (pending, np.stack((starts[keep], idx[keep]))), axis=1), axis=1)
+        bits = np.concatenate((bits, np.left_shift(
+            1, np.frombuffer(codes, dtype=np.uint8)).astype(np.uint8)))
+        pos += len(chunk)
+
+        ends = candidates[0] + lengths[candidates[1]]
+        due = ends <= pos
+        hits, pending = candidates[:, due], candidates[:, ~due]
+        ends = ends[due]
+        window = np.concatenate((bits, np.full(max_length, 16,
+                                               dtype=np.uint8)))
+        found = np.zeros(hits.shape[1], dtype=np.intp)
+        step = max(1, (1 << 20) // max(max_length, 1))
+        for i in range(0, hits.shape[1] if mismatches else 0, step):
+            sub = hits[:, i:i + step]
+            text = window[sub[0, :, np.newaxis] - offset
+                          + np.arange(max_length)]
+            found[i:i + step] = ((text & masks[sub[1]]) == 0).sum(axis=1)
+        ok = found <= mismatches
+        order = np.lexsort((hits[1, ok], hits[0, ok], ends[ok]))
+        yield from zip(hits[0, ok][order].tolist(), ends[ok][order].tolist(),
+                       hits[1, ok][order].tolist(),
+                       found[ok][order].tolist())
+
+        new_offset = min(int(pending[0].min()) if pending.shape[1] else pos,
+                         pos - max_length)
+        if new_offset > offset:
+            bits = bits[new_offset - offset:]
+            offset = new_offset
+
+
+def _join_lines(lines: Iterable[str],
+                size: int = _MOTIF_CHUNK_SIZE) -> Iterator[str]:
+    """Join consecutive lines in chunks of at least size characters."""
+    chunk, length = [], 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield "".join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def find_motifs(sequence: str,
+                motifs: Union[List[str], Dict[str, str]],
+                mismatches: int = 0,
+                both_strands: bool = True) -> List[Tuple[int, int, str,
+                                                         str, int]]:
+    """Find all the occurrences of a set of IUPAC motifs in a sequence.
+
+    Motifs are searched at once with an Aho-Corasick automaton, built from
+    all the sequences matched by their degenerate positions (e.g. R matches
+    A and G, N any nucleotide). Occurrences with up to the given number of
+    mismatches are found by searching exact pieces of the motifs and
+    verifying the surrounding sequence. Any character of the sequence
+    other than A, C, G, T/U (case insensitive) is a mismatch.
+
+    Examples:
+        >>> find_motifs("AACGTTAGG", {"site": "ACGT", "tag": "TRG"})
+        [(1, 5, 'site', '+', 0), (1, 5, 'site', '-', 0), (5, 8, 'tag', '+', 0)]
+
+    Args:
+        sequence: sequence to search
+        motifs: IUPAC motifs to search, as a list or as a dictionary of
+            name: motif
+        mismatches: maximum number of mismatches of each occurrence
+            (default: 0)
+        both_strands: also search the reverse complement of the motifs
+            (default: True)
+
+    Returns:
+        hits: list of (start, end, motif name, strand, mismatches) tuples,
+            with 0-based, end-exclusive coordinates on the given sequence,
+            sorted by end position
+    """
+    matcher = _motif_matcher(motifs, mismatches, both_strands)
+    oriented = matcher["oriented"]
+    chunks = (sequence[i:i + _MOTIF_CHUNK_SIZE]
+              for i in range(0, len(sequence), _MOTIF_CHUNK_SIZE))
+
+    return [(start, end, oriented[idx][0], oriented[idx][2], found)
+            for start, end, idx, found
+            in _scan_motifs(matcher, chunks, mismatches)]
+
+
+def find_motifs_fasta(records: Union[str, Iterable[Tuple[str, str]]],
+                      motifs: Union[List[str], Dict[str, str]],
+                      mismatches: int = 0,
+                      both_strands: bool = True) -> Iterator[
+                          Tuple[str, int, int, str, str, int]]:
+    """Find all the occurrences of a set of IUPAC motifs in FASTA records.
+
+    The automaton is built once and each record is scanned as a stream:
+    when reading from a FASTA file, records are never loaded in memory as
+    a whole, so that whole genomes can be searched line by line. See
+    find_motifs() for details.
+
+    Args:
+        records: path of a (optionally gzipped) FASTA file, or iterable of
+            (name, sequence) tuples
+        motifs: IUPAC motifs to search, as a list or as a dictionary of
+            name: motif
+        mismatches: maximum number of mismatches of each occurrence
+            (default: 0)
+        both_strands: also search the reverse complement of the motifs
+            (default: True)
+
+    Returns:
+        hits: iterator of (record name, start, end, motif name, strand,
+            mismatches) tuples
+    """
+    matcher = _motif_matcher(motifs, mismatches, both_strands)
+    oriented = matcher["oriented"]
+    if isinstance(records, str):
+        grouped = ((name, _join_lines(el[2] for el in lines))
+                   for (_, name), lines
+                   in groupby(_fasta_lines(records), key=lambda el: el[:2]))
+    else:
+        grouped = ((name, (seq[i:i + _MOTIF_CHUNK_SIZE] for i
+                           in range(0, len(seq), _MOTIF_CHUNK_SIZE)))
+                   for name, seq in records)
+    for name, chunks in grouped:
+        for start, end, idx, found in _scan_motifs(matcher, chunks,
+                                                   mismatches):
+            yield name, start, end, oriented[idx][0], oriented[idx][2], found
+
+
+def _codon_codes(codes: np.ndarray) -> np.ndarray:
+    """Return the 6-bit code of the codon starting at each position of an
+    array of 2-bit codes, or 64 for codons with other characters."""
+    if codes.shape[0] < 3:
+        return np.zeros(0, dtype=np.uint8)
+    codons = (codes[:-2] & 3) * 16 + (codes[1:-1] & 3) * 4 + (codes[2:] & 3)
+    codons[(codes[:-2] == 4) | (codes[1:-1] == 4) | (codes[2:] == 4)] = 64
+
+    return codons
+
+
+def _strand_orfs(codons: np.ndarray, is_start: np.ndarray,
+                 is_stop: np.ndarray,
+                 min_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the start and end positions of the ORFs of one strand.
+
+    Start and stop codons of the three frames are sorted by (frame,
+    position), so that the next stop codon of every start codon in its
+    frame is found with a single binary search; each stop codon then
+    closes the ORF of its most upstream start codon.
+    """
+    size = codons.shape[0] + 3
+    stops = np.flatnonzero(is_stop[codons])
+    starts = np.flatnonzero(is_start[codons])
+    stop_keys = np.sort(stops % 3 * size + stops)
+    start_keys = np.sort(starts % 3 * size + starts)
+    idx = np.searchsorted(stop_keys, start_keys)
+    closed = idx < stop_keys.shape[0]
+    start_keys, idx = start_keys[closed], idx[closed]
+    in_frame = stop_keys[idx] // size == start_keys // size
+    start_keys, idx = start_keys[in_frame], idx[in_frame]
+    first = np.ones(idx.shape[0], dtype=bool)
+    first[1:] = idx[1:] != idx[:-1]
+    orf_starts = start_keys[first] % size
+    orf_ends = stop_keys[idx[first]] % size + 3
+    long = orf_ends - orf_starts >= min_length
+
+    return orf_starts[long], orf_ends[long]
+
+
+def find_orfs(sequence: str,
+              min_length: int = 75,
+              starts: Iterable[str] = ("ATG", )) -> np.ndarray:
+    """Find the open reading frames of a nucleotide sequence.
+
+    Codons are encoded at every position at once, covering the three
+    frames of each strand, and the reverse strand is obtained by
+    complementing the encoded sequence. Each ORF goes from the most
+    upstream start codon following the previous in-frame stop codon to
+    the next stop codon (TAA, TAG, TGA), which is included; ORFs lacking a
+    stop codon are not reported. Codons with characters other than A, C,
+    G, T/U (case insensitive) are neither start nor stop codons.
+
+    Examples:
+        >>> orfs = find_orfs(contig, min_length=300, starts=["ATG", "GTG"])
+        >>> pd.DataFrame(orfs)  # to get a dataframe of ORFs
+
+    Args:
+        sequence: input nucleotide sequence
+        min_length: minimum length of the ORFs in nucleotides, including
+            the stop codon (default: 75)
+        starts: start codons (default: ('ATG', ))
+
+    Returns:
+        orfs: structured array with fields start, end (0-based,
+            end-exclusive coordinates on the given sequence), strand ('+',
+            '-'), frame (0, 1, 2, on the strand of the ORF) and length,
+            sorted by start position
+    """
+    is_start = np.zeros(65, dtype=bool)
+    for codon in starts:
+        if len(codon) != 3:
+            raise ValueError("Invalid start codon.")
+        is_start[kmer_encode(codon)] = True
+    is_stop = np.zeros(65, dtype=bool)
+    is_stop[[kmer_encode(codon) for codon in _STOP_CODONS]] = True
+    codes = encode_sequence(sequence)
+    length = codes.shape[0]
+
+    fwd_starts, fwd_ends = _strand_orfs(_codon_codes(codes), is_start,
+                                        is_stop, min_length)
+    rev_starts, rev_ends = _strand_orfs(
+        _codon_codes(_COMPLEM_CODES[codes[::-1]]), is_start, is_stop,
+        min_length)
+    orfs = np.zeros(fwd_starts.shape[0] + rev_starts.shape[0],
+                    dtype=_ORF_DTYPE)
+    orfs["start"] = np.concatenate((fwd_starts, length - rev_ends))
+    orfs["end"] = np.concatenate((fwd_ends, length - rev_starts))
+    orfs["strand"] = ["+"] * fwd_starts.shape[0] + ["-"] * rev_starts.shape[0]
+    orfs["frame"] = np.concatenate((fwd_starts, rev_starts)) % 3
+    orfs["length"] = orfs["end"] - orfs["start"]
+
+    return orfs[np.argsort(orfs["start"], kind="stable")]
+
+
+def _orf_record(args: tuple) -> Tuple[str, np.ndarray]:
+    """Find the ORFs of a single (name, sequence) record."""
+    (name, sequence), min_length, starts = args
+    return name, find_orfs(sequence, min_length=min_length, starts=starts)
+
+
+def find_orfs_fasta(records: Union[str, Iterable[Tuple[str, str]]],
+                    min_length: int = 75,
+                    starts: Iterable[str] = ("ATG", ),
+                    cores: int = 1) -> Iterator[Tuple[str, np.ndarray]]:
+    """Find the open reading frames of each record of a FASTA file.
+
+    Records are read lazily and, when cores > 1, processed in parallel
+    while preserving their order. See find_orfs() for details.
+
+    Args:
+        records: path of a (optionally gzipped) FASTA file, or iterable of
+            (name, sequence) tuples
+        min_length: minimum length of the ORFs in nucleotides, including
+            the stop codon (default: 75)
+        starts: start codons (default: ('ATG', ))
+        cores: number of processes to use (default: 1)
+
+    Returns:
+        orfs: iterator of (name, ORFs structured array) tuples
+    """
+    starts = tuple(starts)
+    if isinstance(records, str):
+        records = read_fasta(records)
+    jobs = ((record, min_length, starts) for record in records)
+    if cores == 1:
+        yield from map(_orf_record, jobs)
+        return
+
+    with Pool(cores) as pool:
+        yield from pool.imap(_orf_record, jobs)
+
+
+def build_fasta_index(path: str, fai_path: Union[str, None] = None) -> str:
+    """Build the .fai index of a FASTA file.
+
+    The index is compatible with samtools faidx: each line holds the name
+    (first word of the header), length, offset of the first base, bases
+    per line and bytes per line of a sequence. The file is read line by
+    line; all the lines of a sequence except the last must have the same
+    length.
+
+    Args:
+        path: path of the (uncompressed) FASTA file
+        fai_path: path of the index (default: path + '.fai')
+
+    Returns:
+        fai_path: path of the index
+    """
+    if path.endswith(".gz"):
+        raise ValueError("Cannot index gzipped FASTA files.")
+    fai_path = fai_path or path + ".fai"
+    entries = {}
+    name, offset = None, 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b">"):
+                name = line[1:].split()[0].decode() if line[1:].strip() \
+                    else ""
+                if name in entries:
+                    raise ValueError("Duplicate sequence name.")
+                entries[name] = [0, offset + len(line), 0, 0, False]
+            elif name is not None:
+                entry = entries[name]
+                bases = len(line.rstrip(b"\r\n"))
+                if entry[4] and bases or entry[2] and bases > entry[2]:
+                    raise ValueError("Cannot index FASTA with irregular "
+                                     "line lengths.")
+                if not entry[2]:
+                    entry[2], entry[3] = bases, len(line)
+                entry[4] = entry[4] or bases < entry[2] or not bases
+                entry[0] += bases
+            offset += len(line)
+    with open(fai_path, "w") as f:
+        for name, entry in entries.items():
+            f.write("{}\t{}\t{}\t{}\t{}\n".format(name, *entry[:4]))
+
+    return fai_path
+
+
+def read_fasta_index(fai_path: str) -> Dict[str, Tuple[int, int, int, int]]:
+    """Read a .fai index of a FASTA file.
+
+    Args:
+        fai_path: path of the index
+
+    Returns:
+        index: dictionary of name: (length, offset, line bases,
+            line width)
+    """
+    index = {}
+    with open(fai_path) as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) >= 5:
+                index[fields[0]] = tuple(int(el) for el in fields[1:5])
+
+    return index
+
+
+def faidx(path: str,
+          cache_size: int = 1 << 26,
+          rebuild: bool = False) -> IndexedFasta:
+    """Open a FASTA file for random access to its regions.
+
+    The .fai index next to the file is used if present and up to date,
+    otherwise it is built with build_fasta_index(). Regions are then read
+    through a memory map of the file, without parsing it.
+
+    Examples:
+        >>> with faidx("genome.fa") as fa:
+        ...     region = reverse_complement(fa.fetch("chr1", 1000, 1100))
+
+    Args:
+        path: path of the (uncompressed) FASTA file
+        cache_size: maximum size in bytes of the cached regions
+            (default: 64 MiB)
+        rebuild: rebuild the index even if it exists (default: False)
+
+    Returns:
+        fasta: instance of prestools.classes.IndexedFasta()
+    """
+    fai_path = path + ".fai"
+    if rebuild or not os.path.exists(fai_path) \
+            or os.path.getmtime(fai_path) < os.path.getmtime(path):
+        build_fasta_index(path, fai_path)
+
+    return IndexedFasta(path=path, index=read_fasta_index(fai_path),
+                        cache_size=cache_size)
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the starts and sizes of the runs of True values."""
+    bounds = np.flatnonzero(np.diff(np.concatenate(([0], mask.view(np.int8),
+                                                    [0]))))
+
+    return bounds[::2], bounds[1::2] - bounds[::2]
+
+
+def _twobit_record(sequence: str) -> bytes:
+    """Encode a sequence as a .2bit record."""
+    if len(sequence) >= 1 << 32:
+        raise ValueError("Cannot store sequences longer than 4 Gb.")
+    raw = np.frombuffer(sequence.encode("ascii"), dtype=np.uint8)
+    codes = _NT_CODES[raw]
+    n_starts, n_sizes = _runs(codes == 4)
+    mask_starts, mask_sizes = _runs((raw >= ord("a")) & (raw <= ord("z")))
+    # 2bit nucleotide values are T=0, C=1, A=2, G=3 (N is stored as T)
+    values = np.array([2, 1, 3, 0, 0], dtype=np.uint8)[codes]
+    values = np.concatenate((values, np.zeros(-len(values) % 4,
+                                              dtype=np.uint8)))
+    packed = values[0::4] << 6 | values[1::4] << 4 | values[2::4] << 2 \
+        | values[3::4]
+    header = np.concatenate(([len(sequence), len(n_starts)], n_starts,
+                             n_sizes, [len(mask_starts)], mask_starts,
+                             mask_sizes, [0]))
+
+    return header.astype("<u4").tobytes() + packed.tobytes()
+
+
+def write_2bit(records: Union[str, Iterable[Tuple[str, str]]],
+               path: str) -> str:
+    """Write sequences to a UCSC .2bit file.
+
+    Each nucleotide is stored in 2 bits; runs of other characters are
+    stored as N blocks and runs of lowercase characters as soft-masked
+    blocks. Records are encoded one at a time, so that whole genomes can
+    be converted without loading them in memory.
+
+    Args:
+        records: path of a (optionally gzipped) FASTA file, whose
+            sequences are named after the first word of their header, or
+            iterable of (name, sequence) tuples
+        path: path of the output file
+
+    Returns:
+        path: path of the output file
+    """
+    if isinstance(records, str):
+        records = ((name.split()[0] if name.strip() else "", sequence)
+                   for name, sequence in read_fasta(records))
+    names, sizes, seen = [], [], set()
+    with tempfile.TemporaryFile() as tmp:
+        for name, sequence in records:
+            if not 0 < len(name.encode()) < 256 or name in seen:
+                raise ValueError("Invalid sequence name.")
+            record = _twobit_record(sequence)
+            seen.add(name)
+            names.append(name)
+            sizes.append(len(record))
+            tmp.write(record)
+        index_size = sum([5 + len(name.encode()) for name in names])
+        version = 0 if 16 + index_size + sum(sizes) < 1 << 32 else 1
+        offset = 16 + index_size + 4 * version * len(names)
+        with open(path, "wb") as f:
+            f.write(struct.pack("<4I", 0x1A412743, version, len(names), 0))
+            for name, size in zip(names, sizes):
+                f.write(struct.pack("<B", len(name.encode())) + name.encode())
+                f.write(struct.pack("<Q" if version else "<I", offset))
+                offset += size
+            tmp.seek(0)
+            shutil.copyfileobj(tmp, f)
+
+    return path
+
+
+def read_2bit(path: str) -> TwoBitFile:
+    """Open a UCSC .2bit file for random access to its regions.
+
+    Only the file header and the list of sequences are read; regions are
+    then decoded on demand through a memory map of the file, either as
+    strings (with N blocks and soft-masked regions) or as arrays of 2-bit
+    codes that can be passed to kmer_count(), kmer_codes() or
+    nt_frequency().
+
+    Examples:
+        >>> with read_2bit("genome.2bit") as genome:
+        ...     codes = genome.fetch("chr1", 0, 1000000, encoded=True)
+        ...     counts = kmer_count(codes, 5)
+
+    Args:
+        path: path of the .2bit file
+
+    Returns:
+        genome: instance of prestools.classes.TwoBitFile()
+    """
+    with open(path, "rb") as f:
+        header = f.read(16)
+        if len(header) < 16:
+            raise ValueError("Invalid 2bit file.")
+        for byteorder in "<>":
+            signature, version, count, _ = struct.unpack(byteorder + "4I",
+                                                         header)
+            if signature == 0x1A412743:
+                break
+        else:
+            raise ValueError("Invalid 2bit file.")
+        if version not in [0, 1]:
+            raise ValueError("Invalid 2bit file.")
+        index = {}
+        for _ in range(count):
+            size = f.read(1)[0]
+            name = f.read(size).decode()
+            index[name] = struct.unpack(
+                byteorder + ("Q" if version else "I"),
+                f.read(8 if version else 4))[0]
+
+    return TwoBitFile(path=path, index=index, byteorder=byteorder)
+
+
+def _shared_key_pairs(keys: np.ndarray, chunk_size: int = 1 << 22
+                      ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Return all the pairs (i < j) of positions with the same key, in
+    chunks of about chunk_size pairs."""
+    n = keys.shape[0]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:]
+                                            != sorted_keys[:-1])))
+    sizes = np.diff(np.append(starts, n))
+    counts = np.repeat(starts + sizes, sizes) - np.arange(n) - 1
+    ends = np.cumsum(counts)
+    splits = np.searchsorted(ends, np.arange(chunk_size, ends[-1], chunk_size)
+                             if n else [])
+    for first, last in zip(np.concatenate(([0], splits)),
+                           np.concatenate((splits, [n]))):
+        chunk = counts[first:last]
+        total = chunk.sum()
+        if not total:
+            continue
+        partners = np.repeat(np.arange(first, last) + 1, chunk) \
+            + np.arange(total) - np.repeat(np.cumsum(chunk) - chunk, chunk)
+        pair_1, pair_2 = np.repeat(order[first:last], chunk), order[partners]
+        yield np.minimum(pair_1, pair_2), np.maximum(pair_1, pair_2)
+
+
+def _pigeonhole_blocks(n: int, length: int, max_distance: int) -> int:
+    """Choose the number s of blocks used as keys when splitting sequences
+    in max_distance + s blocks, at least s of which are identical in pairs
+    within max_distance, minimizing the expected number of candidates
+    (assuming random nucleotide sequences)."""
+    costs = [comb(max_distance + s, s, exact=True)
+             * (n + n * n / 4 ** (s * length // (max_distance + s)))
+             for s in range(1, min(length - max_distance, 16) + 1)]
+
+    return int(np.argmin(costs)) + 1
+
+
+def _verified_pairs(codes: np.ndarray, first: np.ndarray, second: np.ndarray,
+                    max_distance: int) -> Tuple[np.ndarray, np.ndarray,
+                                                np.ndarray]:
+    """Return the candidate pairs within max_distance mismatches (gap
+    positions excluded), in batches bounding memory usage."""
+    rows, cols, distances = [], [], []
+    step = max(1, (1 << 22) // max(codes.shape[1], 1))
+    for start in range(0, first.shape[0], step):
+        a, b = codes[first[start:start + step]], codes[second[start:start
+                                                              + step]]
+        dist = ((a != b) & (a != ord("-")) & (b != ord("-"))).sum(axis=1)
+        keep = dist <= max_distance
+        rows.append(first[start:start + step][keep])
+        cols.append(second[start:start + step][keep])
+        distances.append(dist[keep])
+
+    return rows, cols, distances
+
+
+def find_pairs_within(sequences: List[str],
+                      max_distance: int,
+                      ignore_case: bool = False) -> sps.csr_matrix:
+    """Find all the pairs of sequences within a maximum Hamming distance.
+
+    Only sequences of the same length are compared. Each sequence is split
+    in max_distance + s blocks: two sequences within max_distance
+    mismatches share at least s identical blocks (pigeonhole principle),
+    so only the pairs sharing all the blocks of some combination of s
+    blocks are verified, in vectorized batches, instead of all the pairs.
+    s is 1 (max_distance + 1 blocks) unless longer keys are needed to keep
+    the number of candidates low. As in hamming_distance(), positions with a
+    gap ('-') in either sequence are not counted as mismatches; sequences
+    with gaps are therefore verified against all the sequences of the
+    same length.
+
+    Examples:
+        >>> neighbors = find_pairs_within(barcodes, 1)
+        >>> prestools.clustering.single_linkage_clusters(neighbors)
+
+    Args:
+        sequences: sequences to compare
+        max_distance: maximum Hamming distance of the returned pairs
+        ignore_case: ignore (ASCII) case when comparing sequences
+            (default: False)
+
+    Returns:
+        distances: symmetric sparse matrix of shape (N_seqs, N_seqs)
+            holding the Hamming distance of each pair within max_distance;
+            identical pairs are stored as explicit zeros, so that the
+            sparsity structure is the graph of the pairs (as expected by
+            scipy.sparse.csgraph)
+    """
+    if max_distance < 0:
+        raise ValueError("Invalid max_distance option.")
+    sequences = list(sequences)
+    n = len(sequences)
+    groups = {}
+    for idx, seq in enumerate(sequences):
+        groups.setdefault(len(seq), []).append(idx)
+
+    rows, cols, distances = [], [], []
+    for length, indices in groups.items():
+        indices = np.array(indices)
+        if indices.shape[0] < 2:
+            continue
+        joined = "".join([sequences[idx] for idx in indices.tolist()])
+        try:
+            codes = np.frombuffer(joined.encode("ascii"), dtype=np.uint8)
+        except UnicodeEncodeError:
+            codes = np.frombuffer(joined.encode("utf-32-le"),
+                                  dtype=np.uint32)
+        codes = codes.reshape(indices.shape[0], length)
+        if ignore_case:
+            codes = np.where((codes >= ord("A")) & (codes <= ord("Z")),
+                             codes + 32, codes)
+        candidates = []
+        if length <= max_distance:
+            # no pair can exceed max_distance: compare all of them
+            candidates.append(_shared_key_pairs(np.zeros(indices.shape[0])))
+        else:
+            n_keys = _pigeonhole_blocks(indices.shape[0], length,
+                                        max_distance)
+            n_blocks = max_distance + n_keys
+            bounds = [length * i // n_blocks for i in range(n_blocks + 1)]
+            for blocks in combinations(range(n_blocks), n_keys):
+                key = np.ascontiguousarray(codes[:, np.concatenate(
+                    [np.arange(bounds[i], bounds[i + 1]) for i in blocks])])
+                keys = np.unique(key.view("V{}".format(key.strides[0]))
+                                 .ravel(), return_inverse=True)[1]
+                candidates.append(_shared_key_pairs(keys))
+        gapped = np.flatnonzero((codes == ord("-")).any(axis=1))
+        if gapped.shape[0]:
+            first = np.repeat(gapped, indices.shape[0])
+            second = np.tile(np.arange(indices.shape[0]), gapped.shape[0])
+            candidates.append([(np.minimum(first, second)[first != second],
+                                np.maximum(first, second)[first != second])])
+        for first, second in (pair for chunks in candidates
+                              for pair in chunks):
+            found = _verified_pairs(codes, first, second, max_distance)
+            rows += [indices[el] for el in found[0]]
+            cols += [indices[el] for el in found[1]]
+            distances += found[2]
+
+    if not rows:
+        return sps.csr_matrix((n, n), dtype=np.int64)
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    distances = np.concatenate(distances)
+    _, keep = np.unique(rows * n + cols, return_index=True)
+    rows, cols, distances = rows[keep], cols[keep], distances[keep]
+
+    return sps.csr_matrix((np.concatenate((distances, distances)),
+                           (np.concatenate((rows, cols)),
+                            np.concatenate((cols, rows)))), shape=(n, n))
@@ -1,6 +1,9 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 # Created by Roberto Preste
+import mmap
+import numpy as np
+from collections import OrderedDict
 
 
 class HierCluster:
@@ -57,3 +60,755 @@ class HierCluster:
                     self.pair_dist,
                     self.coph_dist,
                     self.coph_matr)
+
+
+class BenchmarkResult:
+    """
+    Class used to return results of benchmarks run with the utilities
+    available in prestools.misc.
+    """
+
+    def __init__(self, name: str = None, timings=None, peak_memory=None):
+        self._name = name
+        self._timings = [] if timings is None else list(timings)
+        self._peak_memory = peak_memory
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+
+    @property
+    def timings(self):
+        return self._timings
+
+    @timings.setter
+    def timings(self, value):
+        self._timings = list(value)
+
+    @property
+    def peak_memory(self):
+        return self._peak_memory
+
+    @peak_memory.setter
+    def peak_memory(self, value):
+        self._peak_memory = value
+
+    @property
+    def runs(self):
+        return len(self._timings)
+
+    @property
+    def min(self):
+        return min(self._timings) if self._timings else None
+
+    @property
+    def median(self):
+        if not self._timings:
+            return None
+        return float(np.median(self._timings))
+
+    @property
+    def iqr(self):
+        if not self._timings:
+            return None
+        q1, q3 = np.percentile(self._timings, [25, 75])
+        return float(q3 - q1)
+
+    @property
+    def mean(self):
+        if not self._timings:
+            return None
+        return float(np.mean(self._timings))
+
+    def to_dict(self) -> dict:
+        """Return a JSON-serializable representation of the results.
+
+        All timings are expressed in nanoseconds, peak memory in bytes.
+        """
+        return {"name": self.name,
+                "runs": self.runs,
+                "min_ns": self.min,
+                "median_ns": self.median,
+                "iqr_ns": self.iqr,
+                "mean_ns": self.mean,
+                "peak_memory_bytes": self.peak_memory,
+                "timings_ns": self.timings}
+
+    def __repr__(self):
+        return """BenchmarkResult(
+        name: {}, 
+        runs: {}, 
+        min: {} ns, 
+        median: {} ns, 
+        iqr: {} ns, 
+        peak_memory: {}
+        )""".format(self.name,
+                    self.runs,
+                    self.min,
+                    self.median,
+                    self.iqr,
+                    self.peak_memory)
+
+
+class MinHashSketches:
+    """
+    Class used to store the MinHash sketches of a collection of sequences
+    computed with prestools.bioinf.
+
+    Each row of hashes holds the smallest hash values of the k-mers of a
+    sequence, sorted in ascending order and padded with the largest uint64
+    value when the sequence has fewer distinct k-mers than the sketch
+    size.
+    """
+
+    def __init__(self, hashes=None, names=None, k: int = 21,
+                 size: int = 1000, canonical: bool = True, seed: int = 42):
+        self._hashes = hashes
+        self._names = names
+        self._k = k
+        self._size = size
+        self._canonical = canonical
+        self._seed = seed
+
+    @property
+    def hashes(self):
+        return self._hashes
+
+    @hashes.setter
+    def hashes(self, value):
+        self._hashes = value
+
+    @property
+    def names(self):
+        return self._names
+
+    @names.setter
+    def names(self, value):
+        self._names = value
+
+    @property
+    def k(self):
+        return self._k
+
+    @k.setter
+    def k(self, value):
+        self._k = value
+
+    @property
+    def size(self):
+        return self._size
+
+    @size.setter
+    def size(self, value):
+        self._size = value
+
+    @property
+    def canonical(self):
+        return self._canonical
+
+    @canonical.setter
+    def canonical(self, value):
+        self._canonical = value
+
+    @property
+    def seed(self):
+        return self._seed
+
+    @seed.setter
+    def seed(self, value):
+        self._seed = value
+
+    def save(self, path: str) -> str:
+        """Save the sketches to a NumPy .npz file.
+
+        Args:
+            path: path of the output file
+
+        Returns:
+            path: path of the output file
+        """
+        with open(path, "wb") as f:
+            np.savez_compressed(f, hashes=self.hashes,
+                                names=np.asarray(self.names, dtype=str),
+                                params=np.array([self.k, self.size,
+                                                 int(self.canonical),
+                                                 self.seed]))
+
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "MinHashSketches":
+        """Load sketches saved with save().
+
+        Args:
+            path: path of the input file
+
+        Returns:
+            sketches: loaded sketches
+        """
+        with np.load(path, allow_pickle=False) as data:
+            k, size, canonical, seed = data["params"].tolist()
+            return cls(hashes=data["hashes"], names=data["names"].tolist(),
+                       k=k, size=size, canonical=bool(canonical), seed=seed)
+
+    def __len__(self):
+        return 0 if self.hashes is None else self.hashes.shape[0]
+
+    def __repr__(self):
+        return """MinHashSketches(
+        sketches: {}, 
+        k: {}, 
+        size: {}, 
+        canonical: {}, 
+        seed: {}
+        )""".format(len(self),
+                    self.k,
+                    self.size,
+                    self.canonical,
+                    self.seed)
+
+
+class Alignment:
+    """
+    Class used to return results of pairwise sequence alignments computed
+    with prestools.bioinf.
+
+    Start and end positions are 0-based, end-exclusive coordinates of the
+    aligned region of each sequence (excluding the unpenalized end gaps of
+    semiglobal alignments).
+    """
+
+    def __init__(self, aligned_1: str = None, aligned_2: str = None,
+                 score=None, mode: str = None, start_1: int = None,
+                 end_1: int = None, start_2: int = None, end_2: int = None):
+        self._aligned_1 = aligned_1
+        self._aligned_2 = aligned_2
+        self._score = score
+        self._mode = mode
+        self._start_1 = start_1
+        self._end_1 = end_1
+        self._start_2 = start_2
+        self._end_2 = end_2
+
+    @property
+    def aligned_1(self):
+        return self._aligned_1
+
+    @aligned_1.setter
+    def aligned_1(self, value):
+        self._aligned_1 = value
+
+    @property
+    def aligned_2(self):
+        return self._aligned_2
+
+    @aligned_2.setter
+    def aligned_2(self, value):
+        self._aligned_2 = value
+
+    @property
+    def score(self):
+        return self._score
+
+    @score.setter
+    def score(self, value):
+        self._score = value
+
+    @property
+    def mode(self):
+        return self._mode
+
+    @mode.setter
+    def mode(self, value):
+        self._mode = value
+
+    @property
+    def start_1(self):
+        return self._start_1
+
+    @start_1.setter
+    def start_1(self, value):
+        self._start_1 = value
+
+    @property
+    def end_1(self):
+        return self._end_1
+
+    @end_1.setter
+    def end_1(self, value):
+        self._end_1 = value
+
+    @property
+    def start_2(self):
+        return self._start_2
+
+    @start_2.setter
+    def start_2(self, value):
+        self._start_2 = value
+
+    @property
+    def end_2(self):
+        return self._end_2
+
+    @end_2.setter
+    def end_2(self, value):
+        self._end_2 = value
+
+    @property
+    def identity(self):
+        if not self._aligned_1:
+            return None
+        matches = sum([1 for nt_1, nt_2 in zip(self._aligned_1.upper(),
+                                                self._aligned_2.upper())
+                       if nt_1 == nt_2 and nt_1 != "-"])
+        return matches / len(self._aligned_1)
+
+    def __repr__(self):
+        return """Alignment(
+        aligned_1: {}, 
+        aligned_2: {}, 
+        score: {}, 
+        mode: {}, 
+        region_1: {}-{}, 
+        region_2: {}-{}
+        )""".format(self.aligned_1,
+                    self.aligned_2,
+                    self.score,
+                    self.mode,
+                    self.start_1,
+                    self.end_1,
+                    self.start_2,
+                    self.end_2)
+
+
+class BootstrapDistances:
+    """
+    Class used to store the pairwise distances of bootstrap replicates of
+    an alignment computed with prestools.bioinf.
+
+    distances holds the condensed distance vector of the original
+    alignment and each row of replicates that of a bootstrap replicate, in
+    the same order as scipy.spatial.distance.pdist. Distances that cannot
+    be calculated are NaN and are ignored by variance and std.
+    """
+
+    def __init__(self, distances=None, replicates=None, model: str = None,
+                 seed: int = None):
+        self._distances = distances
+        self._replicates = replicates
+        self._model = model
+        self._seed = seed
+
+    @property
+    def distances(self):
+        return self._distances
+
+    @distances.setter
+    def distances(self, value):
+        self._distances = value
+
+    @property
+    def replicates(self):
+        return self._replicates
+
+    @replicates.setter
+    def replicates(self, value):
+        self._replicates = value
+
+    @property
+    def model(self):
+        return self._model
+
+    @model.setter
+    def model(self, value):
+        self._model = value
+
+    @property
+    def seed(self):
+        return self._seed
+
+    @seed.setter
+    def seed(self, value):
+        self._seed = value
+
+    @property
+    def variance(self):
+        if self._replicates is None or self._replicates.shape[0] < 2:
+            return None
+        valid = np.isfinite(self._replicates).sum(axis=0)
+        variance = np.full(self._replicates.shape[1], np.nan)
+        enough = valid > 1
+        variance[enough] = np.nanvar(self._replicates[:, enough], axis=0,
+                                     ddof=1)
+        return variance
+
+    @property
+    def std(self):
+        variance = self.variance
+        return None if variance is None else np.sqrt(variance)
+
+    def __len__(self):
+        return 0 if self.replicates is None else self.replicates.shape[0]
+
+    def __repr__(self):
+        return """BootstrapDistances(
+        pairs: {}, 
+        replicates: {}, 
+        model: {}, 
+        seed: {}
+        )""".format(0 if self.distances is None else len(self.distances),
+                    len(self),
+                    self.model,
+                    self.seed)
+
+
+class IndexedFasta:
+    """
+    Class used to read regions of an indexed FASTA file, as returned by
+    prestools.bioinf.faidx().
+
+    index maps each sequence name to its (length, offset, line bases,
+    line width) entry of the .fai index. The file is memory-mapped and
+    only the lines of the requested region are read; regions are served
+    from blocks of block_size bases, the most recently used of which are
+    cached up to cache_size bytes.
+    """
+
+    def __init__(self, path: str = None, index=None,
+                 cache_size: int = 1 << 26, block_size: int = 1 << 16):
+        self._path = path
+        self._index = index
+        self._cache_size = cache_size
+        self._block_size = block_size
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._file = None
+        self._mmap = None
+
+    @property
+    def path(self):
+        return self._path
+
+    @path.setter
+    def path(self, value):
+        self.close()
+        self._path = value
+
+    @property
+    def index(self):
+        return self._index
+
+    @index.setter
+    def index(self, value):
+        self.clear_cache()
+        self._index = value
+
+    @property
+    def cache_size(self):
+        return self._cache_size
+
+    @cache_size.setter
+    def cache_size(self, value):
+        self._cache_size = value
+        self._evict()
+
+    @property
+    def block_size(self):
+        return self._block_size
+
+    @block_size.setter
+    def block_size(self, value):
+        self.clear_cache()
+        self._block_size = value
+
+    @property
+    def names(self):
+        return list(self._index)
+
+    @property
+    def lengths(self):
+        return {name: entry[0] for name, entry in self._index.items()}
+
+    @property
+    def cached_bytes(self):
+        return self._cached_bytes
+
+    def _read(self, name: str, start: int, end: int) -> str:
+        """Read bases start..end of a sequence from the mapped file."""
+        if start >= end:
+            return ""
+        if self._mmap is None:
+            self._file = open(self._path, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        _, offset, line_bases, line_width = self._index[name]
+        first = offset + start // line_bases * line_width \
+            + start % line_bases
+        last = offset + (end - 1) // line_bases * line_width \
+            + (end - 1) % line_bases
+        data = self._mmap[first:last + 1]
+        if line_width > line_bases:
+            data = data.replace(b"\n", b"").replace(b"\r", b"")
+
+        return data.decode("ascii")
+
+    def _block(self, name: str, block: int) -> str:
+        """Return a block of a sequence, reading it if it is not cached."""
+        key = (name, block)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        start = block * self._block_size
+        data = self._read(name, start, min(start + self._block_size,
+                                           self._index[name][0]))
+        self._cache[key] = data
+        self._cached_bytes += len(data)
+        self._evict()
+
+        return data
+
+    def _evict(self):
+        """Drop the least recently used blocks exceeding the cache size."""
+        while self._cached_bytes > self._cache_size and self._cache:
+            _, data = self._cache.popitem(last=False)
+            self._cached_bytes -= len(data)
+
+    def fetch(self, name: str, start: int = 0, end: int = None) -> str:
+        """Return a region of a sequence.
+
+        Args:
+            name: name of the sequence
+            start: 0-based start position of the region (default: 0)
+            end: end-exclusive end position of the region, clipped to the
+                length of the sequence (default: None, end of the
+                sequence)
+
+        Returns:
+            sequence: sequence of the region
+        """
+        if name not in self._index:
+            raise ValueError("Invalid sequence name.")
+        length = self._index[name][0]
+        end = length if end is None else min(end, length)
+        if start < 0 or start > end:
+            raise ValueError("Invalid region.")
+        if end - start > self._cache_size // 2:
+            return self._read(name, start, end)
+        first, last = start // self._block_size, (end - 1) // self._block_size
+        region = "".join([self._block(name, block)
+                          for block in range(first, last + 1)])
+        offset = first * self._block_size
+
+        return region[start - offset:end - offset]
+
+    def clear_cache(self):
+        """Remove all the cached blocks."""
+        self._cache.clear()
+        self._cached_bytes = 0
+
+    def close(self):
+        """Close the mapped file and clear the cache."""
+        self.clear_cache()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __len__(self):
+        return 0 if self._index is None else len(self._index)
+
+    def __repr__(self):
+        return """IndexedFasta(
+        path: {}, 
+        sequences: {}, 
+        cache_size: {}, 
+        cached_bytes: {}
+        )""".format(self.path,
+                    len(self),
+                    self.cache_size,
+                    self.cached_bytes)
+
+
+class TwoBitFile:
+    """
+    Class used to read regions of a UCSC .2bit file, as returned by
+    prestools.bioinf.read_2bit().
+
+    index maps each sequence name to the offset of its record and
+    byteorder is the byte order of the file ('<' or '>'). The file is
+    memory-mapped: the header of a record (length, N blocks and
+    soft-masked blocks) is only parsed when the sequence is first
+    accessed, and only the bytes of the requested region are decoded.
+    """
+
+    # sequence bytes and prestools.bioinf 2-bit codes of the 2bit
+    # nucleotide values (T=0, C=1, A=2, G=3)
+    _BASES = np.frombuffer(b"TCAG", dtype=np.uint8)
+    _CODES = np.array([3, 1, 0, 2], dtype=np.uint8)
+    _SHIFTS = np.array([6, 4, 2, 0], dtype=np.uint8)
+
+    def __init__(self, path: str = None, index=None, byteorder: str = "<"):
+        self._path = path
+        self._index = index
+        self._byteorder = byteorder
+        self._records = {}
+        self._file = None
+        self._mmap = None
+
+    @property
+    def path(self):
+        return self._path
+
+    @path.setter
+    def path(self, value):
+        self.close()
+        self._path = value
+
+    @property
+    def index(self):
+        return self._index
+
+    @index.setter
+    def index(self, value):
+        self._records = {}
+        self._index = value
+
+    @property
+    def byteorder(self):
+        return self._byteorder
+
+    @byteorder.setter
+    def byteorder(self, value):
+        self._records = {}
+        self._byteorder = value
+
+    @property
+    def names(self):
+        return list(self._index)
+
+    @property
+    def lengths(self):
+        return {name: self._record(name)[0] for name in self._index}
+
+    def _map(self) -> mmap.mmap:
+        """Return the memory map of the file, opening it if needed."""
+        if self._mmap is None:
+            self._file = open(self._path, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def _uint32(self, offset: int, count: int = 1) -> np.ndarray:
+        """Read unsigned 32-bit integers from the mapped file."""
+        return np.frombuffer(self._map(), dtype=self._byteorder + "u4",
+                             count=count, offset=offset).astype(np.int64)
+
+    def _record(self, name: str) -> tuple:
+        """Return the length, N blocks, soft-masked blocks and offset of
+        the packed sequence of a record, parsing its header if needed."""
+        if name not in self._records:
+            if name not in self._index:
+                raise ValueError("Invalid sequence name.")
+            offset = self._index[name]
+            length, n_count = self._uint32(offset, 2).tolist()
+            n_blocks = self._uint32(offset + 8, 2 * n_count)
+            offset += 8 + 8 * n_count
+            mask_count = int(self._uint32(offset)[0])
+            mask_blocks = self._uint32(offset + 4, 2 * mask_count)
+            offset += 8 + 8 * mask_count
+            self._records[name] = (length,
+                                   n_blocks[:n_count], n_blocks[n_count:],
+                                   mask_blocks[:mask_count],
+                                   mask_blocks[mask_count:], offset)
+        return self._records[name]
+
+    @staticmethod
+    def _block_mask(starts: np.ndarray, sizes: np.ndarray,
+                    start: int, end: int) -> np.ndarray:
+        """Return which positions of a region fall in the given blocks."""
+        first = np.searchsorted(starts + sizes, start, side="right")
+        last = np.searchsorted(starts, end, side="left")
+        bounds = np.zeros(end - start + 1, dtype=np.int64)
+        np.add.at(bounds, np.clip(starts[first:last] - start, 0,
+                                  end - start), 1)
+        np.add.at(bounds, np.clip(starts[first:last] + sizes[first:last]
+                                  - start, 0, end - start), -1)
+        return np.cumsum(bounds[:-1]) > 0
+
+    def fetch(self, name: str, start: int = 0, end: int = None,
+              encoded: bool = False):
+        """Return a region of a sequence.
+
+        Args:
+            name: name of the sequence
+            start: 0-based start position of the region (default: 0)
+            end: end-exclusive end position of the region, clipped to the
+                length of the sequence (default: None, end of the
+                sequence)
+            encoded: return an array of 2-bit codes (A=0, C=1, G=2, T=3,
+                N=4, as returned by prestools.bioinf.encode_sequence())
+                instead of a string with soft-masked regions in lowercase
+                (default: False)
+
+        Returns:
+            sequence: sequence of the region
+        """
+        length, n_starts, n_sizes, mask_starts, mask_sizes, offset = \
+            self._record(name)
+        end = length if end is None else min(end, length)
+        if start < 0 or start > end:
+            raise ValueError("Invalid region.")
+        packed = np.frombuffer(self._map(), dtype=np.uint8,
+                               count=(end + 3) // 4 - start // 4,
+                               offset=offset + start // 4)
+        values = (packed[:, np.newaxis] >> self._SHIFTS & 3).ravel()
+        values = values[start % 4:start % 4 + end - start]
+        n_mask = self._block_mask(n_starts, n_sizes, start, end)
+        if encoded:
+            codes = self._CODES[values]
+            codes[n_mask] = 4
+            return codes
+        bases = self._BASES[values]
+        bases[n_mask] = ord("N")
+        bases[self._block_mask(mask_starts, mask_sizes, start, end)] |= 32
+
+        return bases.tobytes().decode("ascii")
+
+    def close(self):
+        """Close the mapped file."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __len__(self):
+        return 0 if self._index is None else len(self._index)
+
+    def __repr__(self):
+        return """TwoBitFile(
+        path: {}, 
+        sequences: {}
+        )""".format(self.path,
+                    len(self))
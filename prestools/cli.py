@@ -3,6 +3,7 @@
 # Created by Roberto Preste
 import sys
 import click
+import prestools.profiling as pp
 from prestools.commands.bioinf import bioinf
 from prestools.commands.clustering import clustering
 # from prestools.commands.graph import graph
@@ -20,9 +21,17 @@ class HandleExceptions(click.Group):
 
 @click.group(cls=HandleExceptions)
 @click.version_option()
-def main():
+@click.option("--profile", "-p", default=None, type=click.Path(),
+              help="""Record calls to prestools functions and save them to
+              the given file, as JSON if it ends with '.json' or as a
+              cProfile-compatible stats file otherwise""")
+@click.pass_context
+def main(ctx, profile):
     """prestools - my personal functions and utilities for Python programming."""
-    pass
+    if profile:
+        pp.reset()
+        pp.enable()
+        ctx.call_on_close(lambda: (pp.disable(), pp.export(profile)))
 
 
 main.add_command(bioinf)
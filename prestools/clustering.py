@@ -4,10 +4,17 @@
 import pandas as pd
 import numpy as np
 import scipy.cluster.hierarchy as sch
+import scipy.sparse as sps
 import scipy.spatial.distance as ssd
+from scipy.sparse.csgraph import connected_components
 import matplotlib.pyplot as plt
-from typing import Union
+from collections import Counter
+from multiprocessing import Pool
+from typing import Union, List, Tuple
 from .classes import HierCluster
+from .bioinf import kmer_codes, hamming_distance, edit_distance
+
+_NEWICK_SPECIAL = set(" \t\n()[]':;,")
 
 
 def hierarchical_clustering(df: Union[pd.DataFrame, np.ndarray],
@@ -89,3 +96,587 @@ def find_n_clusters_elbow(df: Union[pd.DataFrame, np.ndarray],
         plt.show()
 
     return n_clusters
+
+
+def _newick_label(label) -> str:
+    """Quote a Newick label if it contains special characters."""
+    label = str(label)
+    if _NEWICK_SPECIAL.intersection(label):
+        return "'{}'".format(label.replace("'", "''"))
+    return label
+
+
+def _tree_to_newick(children: List[Tuple[int, ...]],
+                    lengths: np.ndarray,
+                    labels: List[str],
+                    root: int,
+                    support: Union[np.ndarray, None] = None) -> str:
+    """Write a tree in Newick format.
+
+    Nodes 0..n-1 are the leaves and node n + k is the internal node whose
+    children are children[k]; lengths holds the length of the branch above
+    each node and support (if given) the support of each internal node,
+    written as a percentage label. The tree is visited with an explicit
+    stack, so that very deep trees do not hit the recursion limit.
+    """
+    n = len(labels)
+    parts = []
+    stack = [(root, 0)]
+    while stack:
+        node, visit = stack.pop()
+        if node < n:
+            parts.append(_newick_label(labels[node]))
+        elif visit < len(children[node - n]):
+            parts.append("(" if visit == 0 else ",")
+            stack.append((node, visit + 1))
+            stack.append((children[node - n][visit], 0))
+            continue
+        else:
+            parts.append(")")
+            if support is not None and node != root \
+                    and not np.isnan(support[node - n]):
+                parts.append("{:.0f}".format(100 * support[node - n]))
+        if node != root:
+            parts.append(":{:.10g}".format(lengths[node]))
+
+    return "".join(parts) + ";"
+
+
+def _as_condensed(distances: Union[np.ndarray, pd.DataFrame],
+                  labels: Union[List[str], None]) -> Tuple[np.ndarray,
+                                                           List[str]]:
+    """Return a condensed distance vector and the taxa labels from a
+    condensed vector, square matrix or square dataframe of distances."""
+    if isinstance(distances, pd.DataFrame):
+        if labels is None:
+            labels = list(distances.index)
+        distances = distances.to_numpy()
+    distances = np.asarray(distances, dtype=float)
+    if distances.ndim == 2:
+        distances = ssd.squareform(distances, checks=False)
+    n = int(round((1 + np.sqrt(1 + 8 * distances.shape[0])) / 2))
+    if n * (n - 1) // 2 != distances.shape[0]:
+        raise ValueError("Invalid distances shape.")
+    if labels is None:
+        labels = [str(i) for i in range(n)]
+    elif len(labels) != n:
+        raise ValueError("Invalid labels length.")
+
+    return distances, list(labels)
+
+
+def _linkage_tree(linkage: np.ndarray) -> Tuple[List[Tuple[int, ...]],
+                                                np.ndarray]:
+    """Return the children of each internal node and the branch lengths
+    of the tree described by a linkage matrix."""
+    n = linkage.shape[0] + 1
+    heights = np.concatenate((np.zeros(n), linkage[:, 2] / 2))
+    children = [(int(a), int(b)) for a, b in linkage[:, :2]]
+    parents = np.zeros(2 * n - 1, dtype=np.intp)
+    parents[linkage[:, :2].astype(np.intp).ravel()] = np.repeat(
+        np.arange(n, 2 * n - 1), 2)
+
+    return children, heights[parents] - heights
+
+
+def linkage_to_newick(linkage: Union[HierCluster, np.ndarray],
+                      labels: Union[List[str], None] = None) -> str:
+    """Convert a hierarchical clustering linkage matrix to Newick format.
+
+    Node heights are half of the linkage distances, so that the distance
+    between two leaves along the tree equals the distance at which they
+    were merged (as in UPGMA trees).
+
+    Args:
+        linkage: linkage matrix returned by scipy.cluster.hierarchy.linkage,
+            or HierCluster object
+        labels: names of the leaves (default: their indices)
+
+    Returns:
+        newick: tree in Newick format
+    """
+    if isinstance(linkage, HierCluster):
+        linkage = linkage.linkage
+    linkage = np.asarray(linkage)
+    n = linkage.shape[0] + 1
+    if labels is None:
+        labels = [str(i) for i in range(n)]
+    elif len(labels) != n:
+        raise ValueError("Invalid labels length.")
+
+    return _tree_to_newick(*_linkage_tree(linkage), labels, 2 * n - 2)
+
+
+def upgma(distances: Union[np.ndarray, pd.DataFrame],
+          labels: Union[List[str], None] = None) -> str:
+    """Build a UPGMA tree from pairwise distances.
+
+    The tree is built with scipy.cluster.hierarchy.linkage (average
+    method), which needs O(n^2) time and memory.
+
+    Args:
+        distances: condensed distance vector (as returned by
+            scipy.spatial.distance.pdist), square distance matrix or
+            dataframe
+        labels: names of the taxa (default: index of the dataframe, or
+            taxa indices)
+
+    Returns:
+        newick: tree in Newick format
+    """
+    distances, labels = _as_condensed(distances, labels)
+    if len(labels) == 1:
+        return "{};".format(_newick_label(labels[0]))
+
+    return linkage_to_newick(sch.linkage(distances, method="average"),
+                             labels=labels)
+
+
+def _nj_best_pair(dist: np.ndarray, u: np.ndarray, bound: np.ndarray,
+                  r: int, block_size: int = 64) -> Tuple[int, int]:
+    """Find the pair of active nodes minimizing the NJ criterion
+    d(i, j) - u(i) - u(j), with u(i) = sum of distances of i / (r - 2).
+
+    bound holds a lower bound of min_j d(i, j) - u(j) for each row i. Rows
+    are evaluated in blocks, in increasing order of their resulting lower
+    bound, and the search stops as soon as no remaining row can beat the
+    best pair found so far (as in RapidNJ). bound is refreshed for the
+    evaluated rows.
+    """
+    bounds = bound[:r] - u[:r]
+    order = np.argsort(bounds)
+    best, best_pair = np.inf, None
+    for start in range(0, r, block_size):
+        rows = order[start:start + block_size]
+        if bounds[rows[0]] >= best:
+            break
+        block = dist[rows, :r] - u[np.newaxis, :r]
+        block[np.arange(rows.shape[0]), rows] = np.inf
+        bound[rows] = block.min(axis=1)
+        block -= u[rows, np.newaxis]
+        i, j = divmod(int(np.argmin(block)), r)
+        if block[i, j] < best:
+            best, best_pair = block[i, j], (int(rows[i]), j)
+
+    return best_pair
+
+
+def _nj_tree(distances: np.ndarray, n: int,
+             method: str) -> Tuple[List[Tuple[int, ...]], np.ndarray]:
+    """Return the children of each internal node and the branch lengths
+    of the neighbor-joining tree of n >= 3 taxa (see neighbor_joining()).
+    The root is the last node, a trifurcation."""
+    dist = ssd.squareform(distances)
+    sums = dist.sum(axis=1)
+    u = sums / (n - 2)
+    np.fill_diagonal(dist, np.inf)
+    bound = (dist - u).min(axis=1) if method == "rapid" else None
+    np.fill_diagonal(dist, 0)
+    nodes = np.arange(n)
+    children, lengths = [], np.zeros(2 * n - 2)
+    for r in range(n, 3, -1):
+        if method == "canonical":
+            q = (r - 2) * dist[:r, :r] - sums[:r, np.newaxis] \
+                - sums[np.newaxis, :r]
+            np.fill_diagonal(q, np.inf)
+            i, j = divmod(int(np.argmin(q)), r)
+        else:
+            i, j = _nj_best_pair(dist, u, bound, r)
+        i, j = min(i, j), max(i, j)
+        d_ij = dist[i, j]
+        length_i = d_ij / 2 + (sums[i] - sums[j]) / (2 * (r - 2))
+        lengths[nodes[i]] = length_i
+        lengths[nodes[j]] = d_ij - length_i
+        children.append((int(nodes[i]), int(nodes[j])))
+
+        # the new node takes the slot of i, the last active node that of j
+        new_dist = (dist[i, :r] + dist[j, :r] - d_ij) / 2
+        sums[:r] += new_dist - dist[i, :r] - dist[j, :r]
+        new_dist[i] = new_dist[j] = 0
+        dist[i, :r] = dist[:r, i] = new_dist
+        sums[i] = new_dist.sum()
+        nodes[i] = n + len(children) - 1
+        last = r - 1
+        if j != last:
+            dist[j, :r] = dist[last, :r]
+            dist[:r, j] = dist[:r, last]
+            dist[j, j] = 0
+            for arr in (sums, u, nodes) + ((bound, ) if bound is not None
+                                          else ()):
+                arr[j] = arr[last]
+
+        if method == "rapid" and last > 3:
+            # u grows by at most shift for the surviving nodes, so the
+            # bounds are lowered by shift and checked against the new node
+            new_u = sums[:last] / (last - 2)
+            shift = np.max(np.delete(new_u - u[:last], i))
+            bound[:last] -= shift
+            np.minimum(bound[:last], dist[:last, i] - new_u[i],
+                       out=bound[:last])
+            row = dist[i, :last] - new_u
+            row[i] = np.inf
+            bound[i] = row.min()
+            u[:last] = new_u
+
+    d = dist[:3, :3]
+    for k, (a, b) in enumerate([(1, 2), (0, 2), (0, 1)]):
+        lengths[nodes[k]] = (d[k, a] + d[k, b] - d[a, b]) / 2
+    children.append(tuple(int(el) for el in nodes[:3]))
+
+    return children, lengths
+
+
+def neighbor_joining(distances: Union[np.ndarray, pd.DataFrame],
+                     labels: Union[List[str], None] = None,
+                     method: str = "rapid") -> str:
+    """Build a neighbor-joining tree from pairwise distances.
+
+    Both methods give the same tree and keep a single n x n distance
+    matrix in memory. The canonical method evaluates the NJ criterion for
+    all pairs at each step (O(n^3) time); the rapid method keeps a lower
+    bound of the criterion of each row and only evaluates the rows that
+    can beat the best pair found so far (as in RapidNJ), which is much
+    faster for large trees. The resulting tree is
+    unrooted, with a trifurcation at the last node joined.
+
+    Args:
+        distances: condensed distance vector (as returned by
+            scipy.spatial.distance.pdist), square distance matrix or
+            dataframe
+        labels: names of the taxa (default: index of the dataframe, or
+            taxa indices)
+        method: method to use to find the pairs to join ('rapid',
+            'canonical') (default: 'rapid')
+
+    Returns:
+        newick: tree in Newick format
+    """
+    if method not in ["rapid", "canonical"]:
+        raise ValueError("Invalid method option.")
+    distances, labels = _as_condensed(distances, labels)
+    n = len(labels)
+    if n < 3:
+        return upgma(distances, labels=labels)
+
+    return _tree_to_newick(*_nj_tree(distances, n, method), labels,
+                           2 * n - 3)
+
+
+def _build_tree(distances: np.ndarray, n: int,
+                tree: str) -> Tuple[List[Tuple[int, ...]], np.ndarray]:
+    """Return the children of each internal node and the branch lengths
+    of the UPGMA or neighbor-joining tree of n >= 3 taxa."""
+    if tree == "upgma":
+        return _linkage_tree(sch.linkage(distances, method="average"))
+    return _nj_tree(distances, n, "rapid")
+
+
+def _clade_hashes(children: List[Tuple[int, ...]], n: int,
+                  rooted: bool) -> List[int]:
+    """Return a 64-bit hash of the leaves below each internal node.
+
+    The hash of a clade is the sum of random values assigned to its
+    leaves. In unrooted trees a clade and its complement describe the
+    same split, so clades containing leaf 0 are replaced by their
+    complement.
+    """
+    mask = (1 << 64) - 1
+    hashes = np.random.default_rng(0).integers(0, 1 << 64, size=n,
+                                               dtype=np.uint64).tolist()
+    total = sum(hashes) & mask
+    has_first = [False] * (n + len(children))
+    has_first[0] = True
+    for k, nodes in enumerate(children):
+        hashes.append(sum([hashes[node] for node in nodes]) & mask)
+        has_first[n + k] = any([has_first[node] for node in nodes])
+    if not rooted:
+        for node in range(n, n + len(children)):
+            if has_first[node]:
+                hashes[node] = (total - hashes[node]) & mask
+
+    return hashes[n:]
+
+
+def _replicate_clades(args: tuple) -> Union[set, None]:
+    """Clade hashes of the tree built from a bootstrap replicate, or None
+    if some of its distances are missing."""
+    distances, n, tree = args
+    if np.isnan(distances).any():
+        return None
+    children, _ = _build_tree(distances, n, tree)
+
+    return set(_clade_hashes(children, n, tree == "upgma"))
+
+
+def clade_support(distances: Union[np.ndarray, pd.DataFrame],
+                  replicates: np.ndarray,
+                  labels: Union[List[str], None] = None,
+                  tree: str = "neighbor_joining",
+                  cores: int = 1) -> str:
+    """Build a tree annotated with the bootstrap support of its clades.
+
+    A tree is built from distances and from each row of replicates (e.g.
+    the distances and replicates of the BootstrapDistances object returned
+    by prestools.bioinf.bootstrap_distances()). The support of a clade is
+    the percentage of replicate trees containing it, as a clade for UPGMA
+    trees or as a split for the unrooted neighbor-joining trees, and is
+    written as the label of its internal node. Replicates with missing
+    (NaN) distances are ignored.
+
+    Args:
+        distances: condensed distance vector (as returned by
+            scipy.spatial.distance.pdist), square distance matrix or
+            dataframe
+        replicates: condensed distance vectors of the bootstrap
+            replicates, of shape (N_replicates, N_pairs)
+        labels: names of the taxa (default: index of the dataframe, or
+            taxa indices)
+        tree: method used to build the trees ('neighbor_joining',
+            'upgma') (default: 'neighbor_joining')
+        cores: number of processes used to build the replicate trees
+            (default: 1)
+
+    Returns:
+        newick: tree in Newick format
+    """
+    if tree not in ["neighbor_joining", "upgma"]:
+        raise ValueError("Invalid tree option.")
+    distances, labels = _as_condensed(distances, labels)
+    replicates = np.asarray(replicates, dtype=float)
+    if replicates.ndim != 2 or replicates.shape[1] != distances.shape[0]:
+        raise ValueError("Invalid replicates shape.")
+    if np.isnan(distances).any():
+        raise ValueError("Cannot build a tree from NaN distances.")
+    n = len(labels)
+    if n < 3:
+        return upgma(distances, labels=labels)
+
+    children, lengths = _build_tree(distances, n, tree)
+    jobs = ((row, n, tree) for row in replicates)
+    if cores == 1:
+        clades = list(map(_replicate_clades, jobs))
+    else:
+        with Pool(cores) as pool:
+            clades = pool.map(_replicate_clades, jobs)
+    clades = [el for el in clades if el is not None]
+    counts = Counter([clade for el in clades for clade in el])
+    support = np.array([counts[clade] for clade in
+                        _clade_hashes(children, n, tree == "upgma")],
+                       dtype=float) / len(clades) if clades \
+        else np.full(len(children), np.nan)
+
+    return _tree_to_newick(children, lengths, labels, n + len(children) - 1,
+                           support=support)
+
+
+def single_linkage_clusters(neighbors: sps.spmatrix) -> np.ndarray:
+    """Single-linkage clusters of a sparse neighbor matrix.
+
+    Each stored entry (including explicit zeros) of the matrix, such as
+    the one returned by prestools.bioinf.find_pairs_within(), links two
+    elements; clusters are the connected components of the resulting
+    graph, which is equivalent to cutting a single-linkage tree at the
+    threshold used to find the neighbors, without computing all the
+    pairwise distances.
+
+    Args:
+        neighbors: sparse matrix of shape (N, N) of the neighbor pairs
+
+    Returns:
+        labels: cluster label of each element, numbered in order of
+            first appearance
+    """
+    _, labels = connected_components(sps.csr_matrix(neighbors),
+                                     directed=False)
+    _, first, labels = np.unique(labels, return_index=True,
+                                 return_inverse=True)
+
+    return np.argsort(np.argsort(first))[labels]
+
+
+def _kmer_indicator(sequences: List[str], k: int) -> sps.csr_matrix:
+    """Sparse sequence-by-k-mer matrix of the distinct k-mers of each
+    sequence."""
+    kmers = [np.unique(kmer_codes(seq, k)) for seq in sequences]
+    indptr = np.concatenate(([0], np.cumsum([el.shape[0] for el in kmers])))
+    columns = np.concatenate(kmers) if kmers else np.zeros(0, dtype=np.uint64)
+
+    return sps.csr_matrix((np.ones(columns.shape[0], dtype=np.int32),
+                           columns.astype(np.int64), indptr),
+                          shape=(len(sequences), 4 ** k))
+
+
+def _shared_row(shared: sps.csr_matrix, row: int,
+                dense: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the columns and values of a row of a matrix of shared
+    k-mers, including the zeros if dense is True."""
+    lo, hi = shared.indptr[row], shared.indptr[row + 1]
+    if not dense:
+        return shared.indices[lo:hi], shared.data[lo:hi]
+    data = np.zeros(shared.shape[1], dtype=shared.data.dtype)
+    data[shared.indices[lo:hi]] = shared.data[lo:hi]
+
+    return np.arange(shared.shape[1]), data
+
+
+def _candidates(cols: np.ndarray, shared: np.ndarray,
+                rep_lengths: np.ndarray, threshold: int, length: int,
+                max_edits: int, distance: str) -> np.ndarray:
+    """Return the representatives sharing enough k-mers with a sequence
+    to be within the given distance, in order of creation."""
+    if not max_edits:
+        return cols[:0]
+    if distance == "p_distance":
+        keep = rep_lengths == length
+    else:
+        keep = rep_lengths - length <= max_edits
+    keep &= shared >= threshold
+
+    return np.sort(cols[keep])
+
+
+def _first_match(args: tuple) -> int:
+    """Return the position of the first candidate representative within
+    the given distance of a sequence, or -1."""
+    sequence, candidates, max_edits, distance = args
+    for pos, rep in enumerate(candidates):
+        if distance == "edit_distance":
+            if edit_distance(sequence, rep, max_distance=max_edits,
+                             ignore_case=True) <= max_edits:
+                return pos
+        elif hamming_distance(sequence, rep, ignore_case=True) <= max_edits:
+            return pos
+
+    return -1
+
+
+def greedy_clustering(sequences: List[str],
+                      identity: float = 0.97,
+                      distance: str = "edit_distance",
+                      k: int = 5,
+                      batch_size: int = 256,
+                      cores: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """Greedy identity-based clustering of sequences (as in CD-HIT).
+
+    Exact duplicates are collapsed by hashing first. Distinct sequences
+    are then sorted by decreasing length (and abundance), and each one
+    joins the cluster of the first representative within the identity
+    threshold, or becomes the representative of a new cluster. Identity
+    is 1 - d / length of the sequence, where d is its edit distance (or
+    number of mismatches, for 'p_distance') from the (longer)
+    representative; comparisons are case insensitive.
+
+    Representatives are only compared when they share enough distinct
+    k-mers with the sequence: each edit removes at most k of its k-mers,
+    so this prefilter never misses a match. Shared k-mers are counted for
+    batches of sequences at once with sparse products, and the candidate
+    representatives of the sequences of a batch are verified in parallel;
+    sequences of the same batch are then compared with each other in
+    order. Candidates are always verified in order of creation, so the
+    clusters do not depend on batch_size or cores.
+
+    Args:
+        sequences: sequences to cluster
+        identity: minimum identity between a sequence and the
+            representative of its cluster (default: 0.97)
+        distance: distance used to verify candidates ('edit_distance',
+            'p_distance', which only compares sequences of the same
+            length) (default: 'edit_distance')
+        k: length of the k-mers of the prefilter (default: 5)
+        batch_size: number of sequences processed at once
+            (default: 256)
+        cores: number of processes used to verify candidates
+            (default: 1)
+
+    Returns:
+        representatives: indices of the representative of each cluster
+        labels: cluster of each sequence
+    """
+    if distance not in ["edit_distance", "p_distance"]:
+        raise ValueError("Invalid distance option.")
+    if not 0 < identity <= 1:
+        raise ValueError("Invalid identity option.")
+
+    ids, firsts, counts, inverse = {}, [], [], []
+    for idx, seq in enumerate(sequences):
+        key = seq.upper()
+        if key not in ids:
+            ids[key] = len(firsts)
+            firsts.append(idx)
+            counts.append(0)
+        counts[ids[key]] += 1
+        inverse.append(ids[key])
+    unique = list(ids)
+    firsts = np.array(firsts, dtype=np.int64)
+    lengths = np.array([len(seq) for seq in unique], dtype=np.int64)
+    order = np.lexsort((firsts, -np.array(counts), -lengths))
+    max_edits = np.floor((1 - identity) * lengths + 1e-9).astype(np.int64)
+
+    clusters = np.full(len(unique), -1, dtype=np.int64)
+    reps, blocks = [], []
+    pool = Pool(cores) if cores > 1 else None
+    try:
+        for start in range(0, len(unique), batch_size):
+            batch = order[start:start + batch_size]
+            indicator = _kmer_indicator([unique[el] for el in batch.tolist()],
+                                        k)
+            kmers = np.diff(indicator.indptr)
+            thresholds = kmers - k * max_edits[batch]
+            if blocks:
+                jobs, candidates = [], []
+                shared = sps.hstack([indicator @ block.T for block in blocks],
+                                    format="csr")
+                rep_ids = np.array(reps, dtype=np.int64)
+                for row, seq in enumerate(batch.tolist()):
+                    cols, data = _shared_row(shared, row,
+                                             thresholds[row] <= 0)
+                    cols = _candidates(cols, data, lengths[rep_ids[cols]],
+                                       thresholds[row], lengths[seq],
+                                       max_edits[seq], distance)
+                    candidates.append(cols)
+                    jobs.append((unique[seq],
+                                 [unique[reps[el]] for el in cols.tolist()],
+                                 int(max_edits[seq]), distance))
+                if pool is None:
+                    found = list(map(_first_match, jobs))
+                else:
+                    found = pool.map(_first_match, jobs)
+                for row, (pos, cols) in enumerate(zip(found, candidates)):
+                    if pos >= 0:
+                        clusters[batch[row]] = cols[pos]
+
+            # sequences of the batch left out are compared in order
+            left = np.flatnonzero(clusters[batch] < 0)
+            shared = (indicator[left] @ indicator[left].T).tocsr()
+            is_rep = np.zeros(left.shape[0], dtype=bool)
+            for pos, row in enumerate(left.tolist()):
+                seq = int(batch[row])
+                cols, data = _shared_row(shared, pos, thresholds[row] <= 0)
+                keep = is_rep[cols]
+                cols = batch[left[_candidates(cols[keep], data[keep],
+                                              lengths[batch[left[cols[keep]]]],
+                                              thresholds[row], lengths[seq],
+                                              max_edits[seq], distance)]]
+                match = _first_match((unique[seq],
+                                      [unique[el] for el in cols.tolist()],
+                                      int(max_edits[seq]), distance))
+                if match >= 0:
+                    clusters[seq] = clusters[cols[match]]
+                else:
+                    clusters[seq] = len(reps)
+                    reps.append(seq)
+                    is_rep[pos] = True
+            if is_rep.any():
+                blocks.append(indicator[left[is_rep]])
+                while len(blocks) > 1 \
+                        and blocks[-2].shape[0] <= blocks[-1].shape[0]:
+                    block = blocks.pop()
+                    blocks[-1] = sps.vstack([blocks[-1], block], format="csr")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    representatives = firsts[np.array(reps, dtype=np.int64)]
+
+    return representatives, clusters[np.array(inverse, dtype=np.int64)]
@@ -27,6 +27,25 @@ def hamming_distance(seq_1, seq_2, ignore_case):
     click.echo(result)
 
 
+@bioinf.command()
+@click.argument("seq_1")
+@click.argument("seq_2")
+@click.option("--max_distance", "-m", type=int, default=None,
+              help="""Stop when the distance exceeds this value, returning 
+              max_distance + 1 (default: None)""")
+@click.option("--ignore_case", "-i", is_flag=True, default=False,
+              help="""Ignore case when comparing sequences (default: False)""")
+def edit_distance(seq_1, seq_2, max_distance, ignore_case):
+    """Edit distance between two sequences
+
+    Calculate the edit (Levenshtein) distance between SEQ_1 and SEQ_2,
+    which can have different lengths.
+    """
+    result = pb.edit_distance(seq_1, seq_2, max_distance=max_distance,
+                              ignore_case=ignore_case)
+    click.echo(result)
+
+
 @bioinf.command()
 @click.argument("seq_1")
 @click.argument("seq_2")
@@ -144,3 +163,26 @@ def random_sequence(length, alphabet):
     """
     result = pb.random_sequence(length, alphabet=alphabet)
     click.echo(result)
+
+
+@bioinf.command()
+@click.argument("fasta", type=click.Path(exists=True, dir_okay=False))
+@click.argument("motifs", nargs=-1, required=True)
+@click.option("--mismatches", "-m", type=int, default=0,
+              help="""Maximum number of mismatches of each occurrence 
+              (default: 0)""")
+@click.option("--single_strand", "-s", is_flag=True, default=False,
+              help="""Do not search the reverse complement of the motifs 
+              (default: False)""")
+def find_motifs(fasta, motifs, mismatches, single_strand):
+    """Find IUPAC motifs in a FASTA file
+
+    Find all the occurrences of the given IUPAC MOTIFS in the records of a
+    (optionally gzipped) FASTA file, which is read line by line. Each
+    occurrence is printed as a tab-separated line of record name, start,
+    end (0-based, end-exclusive), motif, strand and number of mismatches.
+    """
+    for hit in pb.find_motifs_fasta(fasta, list(motifs),
+                                    mismatches=mismatches,
+                                    both_strands=not single_strand):
+        click.echo("\t".join([str(el) for el in hit]))
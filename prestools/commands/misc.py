@@ -27,18 +27,32 @@ def prime_factors(number):
 
 @misc.command()
 @click.argument("sentence")
-@click.option("--word", "-w", default=False,
+@click.option("--word", "-w", default=None,
               help="""Target word to count occurrences of""")
 @click.option("--ignore_case", "-i", is_flag=True, default=False,
               help="""Ignore case in the given sentence (default: False)""")
-def wordcount(sentence, word, ignore_case):
+@click.option("--file", "-f", "from_file", is_flag=True, default=False,
+              help="""Read words from the file SENTENCE, or from stdin if
+              SENTENCE is '-' (default: False)""")
+@click.option("--top", "-t", default=None, type=int,
+              help="""Only return the TOP most frequent words""")
+@click.option("--cores", "-c", default=1, type=int,
+              help="""Number of cores to use when reading from a file
+              (default: 1)""")
+def wordcount(sentence, word, ignore_case, from_file, top, cores):
     """Count occurrences of words in a sentence
 
     Return the number of occurrences of each word in the given SENTENCE,
     in the form of a dictionary; it is also possible to directly return
-    the number of occurrences of a specific WORD.
+    the number of occurrences of a specific WORD. With --file, words are
+    counted from the file SENTENCE instead.
     """
-    result = pm.wordcount(sentence, word, ignore_case)
+    if from_file:
+        result = pm.wordcount_file(sentence, word, ignore_case, cores=cores)
+    else:
+        result = pm.wordcount(sentence, word, ignore_case)
+    if top is not None and not word:
+        result = pm.top_words(result, top)
     click.echo(result)
 
 
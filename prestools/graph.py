@@ -2,42 +2,202 @@
 # -*- coding: UTF-8 -*-
 # Created by Roberto Preste
 import itertools
+from xml.sax.saxutils import escape as xml_escape
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+import scipy.sparse as sps
 import scipy.cluster.hierarchy as sch
-from typing import Union, List
+from multiprocessing import Pool
+from matplotlib.figure import Figure
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
+from matplotlib.collections import PathCollection, LineCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from typing import Union, List, Tuple, Callable, Iterator
+from .classes import HierCluster
+
+
+def _new_figure(show: bool, figsize: Tuple[float, float]) -> Figure:
+    """Return a new figure, managed by pyplot if it has to be shown, or a
+    standalone Figure drawn with the Agg backend otherwise."""
+    if show:
+        return plt.figure(figsize=figsize)
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+
+    return fig
+
+
+def _finalize_figure(fig: Figure,
+                     save: Union[bool, str],
+                     show: bool) -> Union[Figure, None]:
+    """Save the figure if required, then either show it or return it."""
+    if save:
+        fig.savefig(save)
+    if show:
+        plt.show()
+        return
+
+    return fig
 
 
-def flatten_image(img: np.ndarray, scale: bool = False) -> np.ndarray:
+def flatten_image(img: np.ndarray,
+                  scale: bool = False,
+                  out: Union[np.ndarray, None] = None) -> np.ndarray:
     """Convert an image array to a single-dimension vector.
 
+    The unscaled vector is a view of the input image whenever its memory
+    layout allows it, so no data is copied.
+
     Args:
-        img: input image array of shape (l, h, d = 3)
+        img: input image array of shape (l, h) or (l, h, d), with any
+            number of channels d
         scale: scale resulting vector dividing its values by 255
             (default: False)
+        out: preallocated array of shape (l * h * d, 1) where the scaled
+            vector is written, e.g. to obtain float32 values (default: None)
 
     Returns:
         v: reshaped vector of shape (l * h * d, 1)
     """
-    v = img.reshape(img.shape[0] * img.shape[1] * img.shape[2], 1)
+    v = img.reshape(-1, 1)
     if scale:
-        return v / 255
+        if out is None:
+            return v / 255
+        return np.divide(v, 255, out=out, casting="unsafe")
 
     return v
 
 
+def flatten_images(imgs: np.ndarray,
+                   scale: bool = False,
+                   dtype: np.dtype = np.float32,
+                   out: Union[np.ndarray, None] = None) -> np.ndarray:
+    """Convert a stack of images to a 2D array with one image per row.
+
+    The unscaled array is a view of the input stack whenever its memory
+    layout allows it (e.g. for C-contiguous arrays and memory-mapped
+    files), so no data is copied. Scaled values are written directly to
+    a single output array of the given dtype, without float64
+    intermediates.
+
+    Args:
+        imgs: input image array of shape (N, l, h) or (N, l, h, d), with
+            any number of channels d
+        scale: scale resulting values dividing them by 255 (default: False)
+        dtype: data type of the scaled array, ignored if out is given
+            (default: np.float32)
+        out: preallocated array of shape (N, l * h * d) where the scaled
+            values are written (default: None)
+
+    Returns:
+        v: reshaped array of shape (N, l * h * d)
+    """
+    v = imgs.reshape(imgs.shape[0], -1)
+    if not scale:
+        return v
+    if out is None:
+        out = np.empty(v.shape, dtype=dtype)
+    elif out.shape != v.shape:
+        raise ValueError("Invalid out shape.")
+
+    return np.divide(v, out.dtype.type(255), out=out, casting="unsafe")
+
+
+def iter_flatten_images(imgs: Union[str, np.ndarray],
+                        batch_size: int = 1024,
+                        scale: bool = False,
+                        dtype: np.dtype = np.float32) -> Iterator[np.ndarray]:
+    """Flatten a stack of images in batches, optionally reading it from a
+    memory-mapped .npy file so that it never has to fit in memory.
+
+    When scale=True all batches are written to the same preallocated
+    buffer, which is overwritten at each iteration: copy a batch if it
+    has to be kept.
+
+    Examples:
+        >>> for batch in iter_flatten_images("images.npy", scale=True):
+        ...     model.partial_fit(batch)
+
+    Args:
+        imgs: path of a .npy file or image array of shape (N, l, h) or
+            (N, l, h, d)
+        batch_size: number of images in each batch (default: 1024)
+        scale: scale resulting values dividing them by 255 (default: False)
+        dtype: data type of the scaled batches (default: np.float32)
+
+    Returns:
+        batches: iterator of arrays of shape (batch_size, l * h * d)
+    """
+    if isinstance(imgs, str):
+        imgs = np.load(imgs, mmap_mode="r")
+    n_features = int(np.prod(imgs.shape[1:]))
+    buffer = None
+    if scale:
+        buffer = np.empty((min(batch_size, imgs.shape[0]), n_features),
+                          dtype=dtype)
+    for start in range(0, imgs.shape[0], batch_size):
+        batch = imgs[start:start + batch_size]
+        out = buffer[:batch.shape[0]] if scale else None
+        yield flatten_images(batch, scale=scale, out=out)
+
+
+def _linkage_array(linkage: Union[HierCluster, np.ndarray]) -> np.ndarray:
+    """Return the linkage matrix stored in a HierCluster, or the given
+    linkage matrix itself."""
+    if isinstance(linkage, HierCluster):
+        return linkage.linkage
+    return np.asarray(linkage)
+
+
+def _aggregate_by_linkage(df: pd.DataFrame,
+                          Z: np.ndarray,
+                          n_groups: int) -> pd.DataFrame:
+    """Average the rows of a dataframe within the clusters obtained by
+    cutting the linkage tree into (at most) n_groups clusters."""
+    groups = sch.fcluster(Z, n_groups, criterion="maxclust")
+    _, groups = np.unique(groups, return_inverse=True)
+    groups = groups.ravel()
+    counts = np.bincount(groups)
+    indicator = sps.csr_matrix((np.ones(groups.shape[0]),
+                                (groups, np.arange(groups.shape[0]))))
+    values = indicator @ df.to_numpy(dtype=float) / counts[:, np.newaxis]
+    first = np.full(counts.shape[0], -1)
+    first[groups[::-1]] = np.arange(groups.shape[0])[::-1]
+    labels = ["{} (+{})".format(df.index[i], n - 1) if n > 1
+              else str(df.index[i]) for i, n in zip(first, counts)]
+
+    return pd.DataFrame(values, index=labels, columns=df.columns)
+
+
 def plot_heatmap_dendrogram(df: pd.DataFrame,
                             cmap: str = "RdBu_r",
                             title: str = "Cluster Heatmap",
                             save: Union[bool, str] = False,
-                            method: str = "ward"):
+                            method: str = "ward",
+                            show: bool = True,
+                            row_linkage: Union[HierCluster, np.ndarray,
+                                               None] = None,
+                            col_linkage: Union[HierCluster, np.ndarray,
+                                               None] = None,
+                            max_display: int = 500,
+                            annot: Union[bool, None] = None,
+                            rasterized: Union[bool, None] = None,
+                            figsize: Tuple[float, float] = (20, 16)):
     """Plot a heatmap with hierarchical clustering of a dataframe.
 
     Create (and optionally save) a heatmap with hierarchical clustering
     created using Seaborn, starting from a given dataframe of
     correlations.
+    Precomputed linkages (e.g. from
+    prestools.clustering.hierarchical_clustering) can be given to avoid
+    clustering the data again. If the dataframe has more than max_display
+    rows (or columns), rows (or columns) are grouped by cutting their
+    dendrogram into max_display clusters and each cluster is displayed as
+    the average of its members.
 
     See Also:
         https://docs.scipy.org/doc/scipy/reference/generated/scipy.cluster.hierarchy.linkage.html
@@ -50,35 +210,84 @@ def plot_heatmap_dendrogram(df: pd.DataFrame,
             it is possible to specify the path/filename where the file
             will be saved (default: False)
         method: method to use to cluster the data (default: 'ward')
+        show: show the plot; if False, the figure is detached from pyplot
+            and returned instead (default: True)
+        row_linkage: precomputed linkage of the rows, as a HierCluster or
+            linkage matrix (default: None)
+        col_linkage: precomputed linkage of the columns, as a HierCluster
+            or linkage matrix (default: None)
+        max_display: maximum number of rows and columns to display
+            (default: 500)
+        annot: write values in each cell; if None, only do so when at
+            most 400 cells are displayed (default: None)
+        rasterized: rasterize the heatmap cells, which keeps vector
+            output small; if None, only do so when more than 10000 cells
+            are displayed (default: None)
+        figsize: size of the figure in inches (default: (20, 16))
+
+    Returns:
+        fig: resulting figure, if show is False
     """
     if df.shape == (0, 0) or df.shape == (1, 1):
         return False
-    cm = sns.clustermap(df, method=method, figsize=(20, 16), vmin=-1, vmax=1,
-                        annot=True, cmap=cmap)
-    plt.suptitle(title, fontsize=22)
-    if save:
-        cm.savefig(save)
-    plt.show()
-
-    return
-
-
-def plot_dendrogram(df: Union[pd.DataFrame, np.ndarray],
+    if not isinstance(df, pd.DataFrame):
+        df = pd.DataFrame(df)
+    row_Z = None if row_linkage is None else _linkage_array(row_linkage)
+    col_Z = None if col_linkage is None else _linkage_array(col_linkage)
+
+    if df.shape[0] > max_display:
+        if row_Z is None:
+            row_Z = sch.linkage(df, method=method)
+        df = _aggregate_by_linkage(df, row_Z, max_display)
+        row_Z = None
+    if df.shape[1] > max_display:
+        if col_Z is None:
+            col_Z = sch.linkage(df.T, method=method)
+        df = _aggregate_by_linkage(df.T, col_Z, max_display).T
+        col_Z = None
+
+    n_cells = df.shape[0] * df.shape[1]
+    if annot is None:
+        annot = n_cells <= 400
+    if rasterized is None:
+        rasterized = n_cells > 10000
+    cm = sns.clustermap(df, method=method, figsize=figsize, vmin=-1, vmax=1,
+                        annot=annot, cmap=cmap, row_linkage=row_Z,
+                        col_linkage=col_Z, rasterized=rasterized)
+    if not show:
+        plt.close(cm.fig)
+    cm.fig.suptitle(title, fontsize=22)
+
+    return _finalize_figure(cm.fig, save, show)
+
+
+def plot_dendrogram(df: Union[pd.DataFrame, np.ndarray, HierCluster, None],
                     cut_off: Union[bool, float] = False,
                     title: str = "Dendrogram",
                     save: Union[bool, str] = False,
-                    method: str = "ward"):
+                    method: str = "ward",
+                    show: bool = True,
+                    linkage: Union[HierCluster, np.ndarray, None] = None,
+                    labels: Union[List[str], None] = None,
+                    truncate_mode: Union[str, None] = None,
+                    p: int = 30) -> Union[Figure, None, bool]:
     """Plot a dendrogram plot from a dataframe.
 
     Create (and optionally save) a dendrogram plot starting from a given
     dataframe of correlations. It is also possible to add a cut-off line
     given a distance to use for separating clusters.
+    A precomputed linkage (e.g. from
+    prestools.clustering.hierarchical_clustering) can be used instead of
+    clustering the data again, and large trees can be truncated to their
+    last p merged clusters ('lastp') or to p levels ('level').
 
     See Also:
         https://docs.scipy.org/doc/scipy/reference/generated/scipy.cluster.hierarchy.linkage.html
+        https://docs.scipy.org/doc/scipy/reference/generated/scipy.cluster.hierarchy.dendrogram.html
 
     Args:
-        df: input dataframe of correlations
+        df: input dataframe of correlations, or a HierCluster instance
+            (can be None if linkage is given)
         cut_off: if not False, a vertical line will be added to better
             identify clusters (default: False)
         title: title for resulting plot (default: 'Dendrogram')
@@ -86,38 +295,282 @@ def plot_dendrogram(df: Union[pd.DataFrame, np.ndarray],
             it is possible to specify the path/filename where the file
             will be saved (default: False)
         method: method to use to cluster the data (default: 'ward')
+        show: show the plot; if False, a standalone figure (not tracked
+            by pyplot) is returned instead (default: True)
+        linkage: precomputed linkage, as a HierCluster or linkage matrix
+            (default: None)
+        labels: leaf labels (default: columns of df, if any)
+        truncate_mode: truncate the dendrogram ('lastp', 'level') or
+            draw all the leaves (None) (default: None)
+        p: parameter of truncate_mode (default: 30)
+
+    Returns:
+        fig: resulting figure, if show is False
     """
-    if df.shape == (0, 0) or df.shape == (1, 1):
-        return False
-    Z = sch.linkage(df, method=method)
-    # dists = ssd.pdist(df)
-    # c, coph_dists = sch.cophenet(Z, dists)
-    plt.figure(figsize=(20, 16))
-    sch.dendrogram(Z, leaf_font_size=16, labels=df.columns, orientation="left")
+    if isinstance(df, HierCluster) and linkage is None:
+        linkage = df
+    if df is None and linkage is None:
+        raise ValueError("Either df or linkage must be given.")
+    if linkage is not None:
+        Z = _linkage_array(linkage)
+        if Z.shape[0] == 0:
+            return False
+    else:
+        if df.shape == (0, 0) or df.shape == (1, 1):
+            return False
+        Z = sch.linkage(df, method=method)
+    if labels is None and isinstance(df, pd.DataFrame):
+        labels = df.columns
+    fig = _new_figure(show, (20, 16))
+    ax = fig.add_subplot(111)
+    sch.dendrogram(Z, leaf_font_size=16, labels=labels, orientation="left",
+                   truncate_mode=truncate_mode, p=p, ax=ax)
     if cut_off:
-        plt.axvline(x=cut_off, linewidth=4.0, linestyle="--")
-    plt.title(title, fontsize=22)
-    plt.xlabel("distance", fontsize=14)
-    plt.ylabel("feature", fontsize=14)
-    plt.yticks(fontsize=14)
-    plt.xticks(fontsize=14)
-    if save:
-        plt.savefig(save)
-    plt.show()
+        ax.axvline(x=cut_off, linewidth=4.0, linestyle="--")
+    ax.set_title(title, fontsize=22)
+    ax.set_xlabel("distance", fontsize=14)
+    ax.set_ylabel("feature", fontsize=14)
+    ax.tick_params(labelsize=14)
+
+    return _finalize_figure(fig, save, show)
 
-    return
 
+def _dendrogram_segments(Z: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the coordinates of the links of a dendrogram, without
+    recursion (unlike scipy.cluster.hierarchy.dendrogram).
 
-def plot_confusion_matrix(cm: np.ndarray,
+    Leaves are placed at 5, 15, 25, ... in the order given by
+    scipy.cluster.hierarchy.leaves_list, as in scipy.
+
+    Returns:
+        segments: array of shape (N - 1, 4, 2) with the (position, height)
+            of the four points of each U-shaped link
+        order: leaf indices in display order
+    """
+    order = sch.leaves_list(Z)
+    n = order.shape[0]
+    pos = np.empty(2 * n - 1)
+    pos[order] = 5.0 + 10.0 * np.arange(n)
+    height = np.zeros(2 * n - 1)
+    height[n:] = Z[:, 2]
+    left = Z[:, 0].astype(int)
+    right = Z[:, 1].astype(int)
+    for k in range(n - 1):
+        pos[n + k] = (pos[left[k]] + pos[right[k]]) / 2
+    top = height[n:]
+    segments = np.stack([
+        np.column_stack([pos[left], height[left]]),
+        np.column_stack([pos[left], top]),
+        np.column_stack([pos[right], top]),
+        np.column_stack([pos[right], height[right]])
+    ], axis=1)
+
+    return segments, order
+
+
+def _write_svg_dendrogram(segments: np.ndarray,
+                          order: np.ndarray,
+                          path: str,
+                          labels: Union[List[str], None],
+                          title: str,
+                          size: Tuple[int, int],
+                          chunk_size: int = 10000):
+    """Write a dendrogram to an SVG file, a chunk of links at a time."""
+    width, height = size
+    margin = 60
+    label_space = 100 if labels is not None else 0
+    n = order.shape[0]
+    max_h = segments[:, :, 1].max() or 1.0
+    scale_x = (width - 2 * margin) / (10.0 * n)
+    scale_y = (height - 2 * margin - label_space) / max_h
+    base_y = height - margin - label_space
+
+    with open(path, "w") as f:
+        f.write('<svg xmlns="http://www.w3.org/2000/svg" width="{}" '
+                'height="{}" viewBox="0 0 {} {}">\n'.format(width, height,
+                                                          width, height))
+        f.write('<rect width="100%" height="100%" fill="white"/>\n')
+        f.write('<text x="{}" y="{}" font-size="22" text-anchor="middle">'
+                '{}</text>\n'.format(width / 2, margin / 2,
+                                     xml_escape(title)))
+        f.write('<g fill="none" stroke="#1f77b4" stroke-width="1">\n')
+        for start in range(0, segments.shape[0], chunk_size):
+            chunk = segments[start:start + chunk_size]
+            xs = margin + chunk[:, :, 0] * scale_x
+            ys = base_y - chunk[:, :, 1] * scale_y
+            f.write("".join(
+                '<path d="M{:.2f},{:.2f}V{:.2f}H{:.2f}V{:.2f}"/>\n'.format(
+                    x[0], y[0], y[1], x[3], y[3])
+                for x, y in zip(xs.tolist(), ys.tolist())))
+        f.write("</g>\n")
+        if labels is not None:
+            f.write('<g font-size="10" text-anchor="end">\n')
+            for start in range(0, n, chunk_size):
+                idx = order[start:start + chunk_size]
+                xs = margin + (5.0 + 10.0 * np.arange(
+                    start, start + idx.shape[0])) * scale_x
+                f.write("".join(
+                    '<text transform="translate({:.2f},{:.2f}) rotate(-90)">'
+                    '{}</text>\n'.format(x, base_y + 5,
+                                         xml_escape(str(labels[i])))
+                    for x, i in zip(xs.tolist(), idx.tolist())))
+            f.write("</g>\n")
+        f.write("</svg>\n")
+
+
+def save_dendrogram(linkage: Union[HierCluster, np.ndarray],
+                    path: str,
+                    labels: Union[List[str], None] = None,
+                    title: str = "Dendrogram",
+                    size: Tuple[int, int] = (2000, 1600),
+                    max_labels: int = 500) -> str:
+    """Save the dendrogram of a (possibly very large) linkage to a file.
+
+    Unlike plot_dendrogram(), this function is meant for trees with up to
+    hundreds of thousands of leaves: link coordinates are computed
+    without recursion, SVG files are written directly a chunk at a time
+    (including leaf labels), and other formats (e.g. PNG) are rendered
+    headless with all the links drawn as a single artist, adding leaf
+    labels only if there are at most max_labels of them.
+
+    Args:
+        linkage: linkage, as a HierCluster or linkage matrix
+        path: path of the output file; the format is inferred from the
+            extension
+        labels: leaf labels (default: None)
+        title: title for resulting plot (default: 'Dendrogram')
+        size: size of the image in pixels (default: (2000, 1600))
+        max_labels: maximum number of labels drawn in non-SVG formats
+            (default: 500)
+
+    Returns:
+        path: path of the output file
+    """
+    Z = _linkage_array(linkage)
+    segments, order = _dendrogram_segments(Z)
+
+    if path.lower().endswith(".svg"):
+        _write_svg_dendrogram(segments, order, path, labels, title, size)
+        return path
+
+    dpi = 100
+    fig = _new_figure(False, (size[0] / dpi, size[1] / dpi))
+    ax = fig.add_subplot(111)
+    ax.add_collection(LineCollection(segments, linewidths=0.5))
+    ax.set_xlim(0, 10 * order.shape[0])
+    ax.set_ylim(0, segments[:, :, 1].max() * 1.05 or 1.0)
+    if labels is not None and order.shape[0] <= max_labels:
+        ax.set_xticks(5.0 + 10.0 * np.arange(order.shape[0]))
+        ax.set_xticklabels([labels[i] for i in order], rotation=90)
+    else:
+        ax.set_xticks([])
+    ax.set_title(title, fontsize=22)
+    ax.set_ylabel("distance", fontsize=14)
+    fig.savefig(path, dpi=dpi)
+    fig.clear()
+
+    return path
+
+
+def confusion_matrix(y_true: np.ndarray,
+                     y_pred: np.ndarray,
+                     n_classes: Union[int, None] = None,
+                     sparse: bool = False) -> Union[np.ndarray,
+                                                    sps.csr_matrix]:
+    """Compute a confusion matrix from arrays of true and predicted labels.
+
+    Labels are expected to be integer-coded (0, 1, ..., n_classes - 1);
+    any other labels are first converted to the index of the label in the
+    sorted array of all the unique labels.
+
+    Args:
+        y_true: array of true labels, of shape (N, )
+        y_pred: array of predicted labels, of shape (N, )
+        n_classes: number of classes (default: inferred from labels)
+        sparse: return a scipy sparse matrix, which avoids allocating
+            n_classes^2 counts (default: False)
+
+    Returns:
+        cm: confusion matrix, of shape (n_classes, n_classes), where
+            rows are true labels and columns are predicted labels
+    """
+    y_true = np.asarray(y_true).ravel()
+    y_pred = np.asarray(y_pred).ravel()
+    if y_true.shape != y_pred.shape:
+        raise ValueError("True and predicted labels must have the same "
+                         "length.")
+    if not (np.issubdtype(y_true.dtype, np.integer)
+            and np.issubdtype(y_pred.dtype, np.integer)):
+        _, codes = np.unique(np.concatenate([y_true, y_pred]),
+                             return_inverse=True)
+        y_true, y_pred = codes[:y_true.shape[0]], codes[y_true.shape[0]:]
+    if n_classes is None:
+        n_classes = int(max(y_true.max(), y_pred.max())) + 1 \
+            if y_true.shape[0] else 0
+    if y_true.shape[0] and (min(y_true.min(), y_pred.min()) < 0
+                            or max(y_true.max(), y_pred.max()) >= n_classes):
+        raise ValueError("Invalid n_classes option.")
+
+    if sparse:
+        cm = sps.coo_matrix((np.ones(y_true.shape[0], dtype=np.int64),
+                             (y_true, y_pred)),
+                            shape=(n_classes, n_classes))
+        return cm.tocsr()
+
+    cm = np.bincount(y_true * n_classes + y_pred,
+                     minlength=n_classes * n_classes)
+
+    return cm.reshape(n_classes, n_classes)
+
+
+def _annotate_cells(fig: Figure, ax: plt.Axes,
+                    rows: np.ndarray, cols: np.ndarray,
+                    labels: List[str], colors: np.ndarray,
+                    fontsize: float = 16):
+    """Draw text labels centered on the given cells as a single artist.
+
+    Each distinct label is converted to a path only once, and all the
+    labels are then drawn by one PathCollection, which is much faster
+    than creating a Text artist per cell.
+    """
+    prop = FontProperties(weight="bold")
+    cache = {}
+    paths = []
+    for label in labels:
+        if label not in cache:
+            path = TextPath((0, 0), label, size=fontsize, prop=prop)
+            ext = path.get_extents()
+            cache[label] = path.transformed(Affine2D().translate(
+                -(ext.x0 + ext.x1) / 2, -(ext.y0 + ext.y1) / 2))
+        paths.append(cache[label])
+    collection = PathCollection(
+        paths, offsets=np.column_stack([cols, rows]),
+        offset_transform=ax.transData,
+        transform=Affine2D().scale(1 / 72) + fig.dpi_scale_trans,
+        facecolors=colors, edgecolors="none")
+    ax.add_collection(collection, autolim=False)
+
+    return collection
+
+
+def plot_confusion_matrix(cm: Union[np.ndarray, sps.spmatrix],
                           class_names: List[str],
                           title: str = "Confusion Matrix",
                           cmap: str = "Reds",
                           normalize: bool = False,
-                          save: Union[bool, str] = False):
+                          save: Union[bool, str] = False,
+                          show: bool = True,
+                          max_annotations: int = 2500) -> Union[Figure,
+                                                                None, bool]:
     """Create a plot from a confusion matrix array.
 
+    Cell values are drawn on top of the matrix; when the matrix has more
+    than max_annotations cells (or it is a scipy sparse matrix) only
+    non-zero cells are annotated, and annotations are skipped entirely if
+    there are still more than max_annotations of them.
+
     Args:
-        cm: input confusion matrix array
+        cm: input confusion matrix array (dense or scipy sparse)
         class_names: class names to use
         title: title for resulting plot (default: 'Confusion Matrix')
         cmap: colormap to use (default: 'RdBu_r')
@@ -125,49 +578,108 @@ def plot_confusion_matrix(cm: np.ndarray,
         save: if False, the plot will not be saved, just shown; otherwise
             it is possible to specify the path/filename where the file
             will be saved (default: False)
+        show: show the plot; if False, a standalone figure (not tracked
+            by pyplot) is returned instead (default: True)
+        max_annotations: maximum number of cells to annotate
+            (default: 2500)
+
+    Returns:
+        fig: resulting figure, if show is False
 
     See Also:
         http://scikit-learn.org/stable/auto_examples/model_selection/plot_confusion_matrix.html
 
     """
-    if np.sum(cm) == 0:
+    sparse = sps.issparse(cm)
+    total = cm.sum()
+    if total == 0:
         return False
 
-    accuracy = np.trace(cm) / float(np.sum(cm))
+    accuracy = cm.diagonal().sum() / float(total)
     misclass = 1 - accuracy
 
-    plt.figure(figsize=(20, 16))
-    plt.imshow(cm, interpolation="nearest", cmap=cmap)
-    plt.title("{}\n".format(title), fontsize=22)
-    cbar = plt.colorbar()
+    if sparse:
+        rows, cols = cm.nonzero()
+        cm = cm.toarray()
+    elif cm.size > max_annotations:
+        rows, cols = np.nonzero(cm)
+    else:
+        rows, cols = np.indices(cm.shape).reshape(2, -1)
+
+    fig = _new_figure(show, (20, 16))
+    ax = fig.add_subplot(111)
+    img = ax.imshow(cm, interpolation="nearest", cmap=cmap)
+    ax.set_title("{}\n".format(title), fontsize=22)
+    cbar = fig.colorbar(img, ax=ax)
     cbar.set_label('# of samples\n', rotation=270, size=14, labelpad=18)
 
     tick_marks = np.arange(len(class_names))
-    plt.xticks(tick_marks, class_names, fontsize=14)
-    plt.yticks(tick_marks, class_names, fontsize=14)
+    ax.set_xticks(tick_marks)
+    ax.set_xticklabels(class_names, fontsize=14)
+    ax.set_yticks(tick_marks)
+    ax.set_yticklabels(class_names, fontsize=14)
 
     if normalize:
-        cm = cm.astype("float") / cm.sum(axis=1)[:, np.newaxis]
-
-    thresh = cm.max() / 1.5 if normalize else cm.max() / 2
-    for i, j in itertools.product(range(cm.shape[0]), range(cm.shape[1])):
-        if normalize:
-            plt.text(j, i, "{:0.4f}".format(cm[i, j]),
-                     horizontalalignment="center", fontsize=16, weight="bold",
-                     color="white" if cm[i, j] > thresh else "black")
-        else:
-            plt.text(j, i, "{:,}".format(cm[i, j]),
-                     horizontalalignment="center", fontsize=16, weight="bold",
-                     color="white" if cm[i, j] > thresh else "black")
-
-    plt.ylabel("True label", fontsize=14)
-    plt.xlabel("Predicted label\n\nAccuracy={:0.4f}; Misclass={:0.4f}".format(accuracy, misclass),
-               fontsize=14)
-    if save:
-        plt.savefig(save)
-    plt.show()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cm = cm.astype("float") / cm.sum(axis=1)[:, np.newaxis]
+        cm = np.nan_to_num(cm)
 
-    return
+    if 0 < rows.shape[0] <= max_annotations:
+        thresh = cm.max() / 1.5 if normalize else cm.max() / 2
+        values = cm[rows, cols]
+        uniq, inverse = np.unique(values, return_inverse=True)
+        fmt = "{:0.4f}" if normalize else "{:,}"
+        uniq_labels = [fmt.format(el) for el in uniq.tolist()]
+        labels = [uniq_labels[i] for i in inverse.ravel()]
+        colors = np.where(values > thresh, "white", "black")
+        _annotate_cells(fig, ax, rows, cols, labels, colors)
+
+    ax.set_ylabel("True label", fontsize=14)
+    ax.set_xlabel("Predicted label\n\nAccuracy={:0.4f}; Misclass={:0.4f}".format(accuracy, misclass),
+                  fontsize=14)
+
+    return _finalize_figure(fig, save, show)
+
+
+def _render_job(job: Tuple[Callable, dict]) -> Union[str, None]:
+    function, kwargs = job
+    fig = function(**dict(kwargs, show=False))
+    if isinstance(fig, Figure):
+        fig.clear()
+
+    return kwargs.get("save") or None
+
+
+def render_plots(jobs: List[Tuple[Callable, dict]],
+                 cores: int = 4) -> List[Union[str, None]]:
+    """Render and save many plots in parallel.
+
+    Each job is a (function, kwargs) tuple, where function is one of the
+    plotting functions of this module and kwargs are the arguments it
+    will be called with; kwargs should include the `save` path, since
+    plots are rendered headless (show=False) in separate worker
+    processes and figures are released as soon as they are saved.
+
+    Examples:
+        >>> render_plots([(plot_dendrogram, {"df": df, "save": "a.png"}),
+        ...               (plot_confusion_matrix, {"cm": cm,
+        ...                                        "class_names": names,
+        ...                                        "save": "b.png"})])
+        ['a.png', 'b.png']
+
+    Args:
+        jobs: list of (function, kwargs) tuples
+        cores: number of cores to use (default: 4)
+
+    Returns:
+        paths: list of saved files, in the same order as jobs
+    """
+    pool = Pool(cores)
+    paths = pool.map(_render_job, jobs)
+    pool.close()
+    pool.join()
+
+    return paths
 
 
 def reduce_xaxis_ticks(ax: plt.Axes, step: int):
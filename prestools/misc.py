@@ -3,40 +3,107 @@
 # Created by Roberto Preste
 import os
 import re
+import sys
+import json
+import heapq
+import operator
 import time
+import functools
+import tracemalloc
 import numpy as np
 import pandas as pd
+from math import gcd
+from collections import Counter
 from multiprocessing import Pool
-from typing import List, Any, Type, Union, Callable, Tuple, Iterable
+from typing import (List, Any, Type, Union, Callable, Tuple, Iterable, Dict,
+                    Iterator, TextIO)
+from .classes import BenchmarkResult
 
+_BENCHMARKS = {}
 
-def flatten(iterable: Iterable, drop_null: bool = False) -> List[Any]:
+_WORD_RE = re.compile(r"\w+")
+
+_TRAILING_WORD_RE = re.compile(r"\w+$")
+
+_TRIAL_DIVISION_BOUND = 1 << 16
+
+_MR_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+
+def flatten(iterable: Iterable,
+            drop_null: bool = False,
+            max_depth: Union[int, None] = None) -> List[Any]:
     """Flatten out a nested iterable.
 
     Flatten a nested iterable, even with multiple nesting levels and
     different data types. It is also possible to drop null values (None)
-    from the resulting list.
+    from the resulting list. See iflatten() for details.
 
     Args:
         iterable: nested iterable to flatten
         drop_null: filter out None from the flattened list (default: False)
+        max_depth: maximum number of nesting levels to flatten, or None
+            to flatten all of them (default: None)
 
     Returns:
         flat list
     """
-    def flattenator(element):
-        for el in element:
-            if isinstance(el, Iterable) and not isinstance(el, (str, bytes)):
-                yield from flattenator(el)
-            else:
-                yield el
+    return list(iflatten(iterable, drop_null=drop_null, max_depth=max_depth))
+
+
+def _flat_iter(element: Iterable, depth: int,
+               max_depth: Union[int, None]) -> Iterator[Any]:
+    """Return an iterator over element, which is entirely flattened at once
+    if it is a NumPy array (or pandas object) of non-object dtype whose
+    dimensions are all within max_depth."""
+    if isinstance(element, (pd.Series, pd.DataFrame, pd.Index)):
+        element = element.to_numpy()
+    if isinstance(element, np.ndarray) and element.dtype != object \
+            and (max_depth is None or depth + element.ndim - 1 <= max_depth):
+        return iter(element.ravel())
+
+    return iter(element)
 
-    if drop_null:
-        return list(filter(None.__ne__, list(flattenator(iterable))))
-    return list(flattenator(iterable))
 
+def iflatten(iterable: Iterable,
+             drop_null: bool = False,
+             max_depth: Union[int, None] = None) -> Iterator[Any]:
+    """Lazily flatten out a nested iterable.
 
-def invert_dict(input_dict: dict, sort_keys: bool = False) -> dict:
+    Generator version of flatten(), which yields the elements of a nested
+    iterable one at a time. Nesting is traversed using an explicit stack,
+    so that arbitrarily deep nesting does not hit the recursion limit.
+    Strings and bytes are not flattened. NumPy arrays and pandas objects
+    are flattened in bulk using their values (so a DataFrame yields its
+    values rather than its column labels), unless they have object dtype.
+
+    Args:
+        iterable: nested iterable to flatten
+        drop_null: filter out None from the flattened elements
+            (default: False)
+        max_depth: maximum number of nesting levels to flatten, or None
+            to flatten all of them (default: None)
+
+    Returns:
+        generator of flattened elements
+    """
+    stack = [_flat_iter(iterable, 0, max_depth)]
+    while stack:
+        for el in stack[-1]:
+            if isinstance(el, Iterable) and not isinstance(el, (str, bytes)) \
+                    and (max_depth is None or len(stack) <= max_depth):
+                stack.append(_flat_iter(el, len(stack), max_depth))
+                break
+            if drop_null and el is None:
+                continue
+            yield el
+        else:
+            stack.pop()
+
+
+def invert_dict(input_dict: dict,
+                sort_keys: bool = False,
+                collision: str = "last") -> dict:
     """Create a new dictionary swapping keys and values.
 
     Invert a given dictionary, creating a new dictionary where each key is
@@ -44,6 +111,9 @@ def invert_dict(input_dict: dict, sort_keys: bool = False) -> dict:
     key that it was associated to in the original dictionary
     (e.g. invert_dict({1: ["A", "E"], 2: ["D", "G"]}) =
     {"A": 1, "E": 1, "D": 2, "G": 2}).
+    If the same value appears under several keys, the collision policy
+    decides whether the last key ('last') or the first one ('first') is
+    kept, or whether all of them are kept in a list ('list').
     It is also possible to return an inverted dictionary with keys in
     alphabetical order, although this makes little sense for intrinsically
     unordered data structures like dictionaries, but it may be useful when
@@ -53,22 +123,195 @@ def invert_dict(input_dict: dict, sort_keys: bool = False) -> dict:
         input_dict: original dictionary to be inverted
         sort_keys: sort the keys in the inverted dictionary in
             alphabetical order (default: False)
+        collision: how to handle values found under several keys
+            ('last', 'first', 'list') (default: 'last')
+
+    Returns:
+        new_dict: inverted dictionary
+    """
+    pairs = ((x, el) for x in input_dict for el in input_dict[x])
+
+    return invert_pairs(pairs, sort_keys=sort_keys, collision=collision)
+
+
+def invert_pairs(pairs: Iterable[Tuple[Any, Any]],
+                 sort_keys: bool = False,
+                 collision: str = "last") -> dict:
+    """Create a dictionary mapping values to keys from (key, value) pairs.
+
+    Streaming version of invert_dict(), which consumes an iterable of
+    (key, value) pairs (e.g. lines of a gene/transcript mapping file)
+    without requiring the original dictionary to be built first.
+
+    Args:
+        pairs: iterable of (key, value) tuples
+        sort_keys: sort the keys in the inverted dictionary in
+            alphabetical order (default: False)
+        collision: how to handle values found under several keys
+            ('last', 'first', 'list') (default: 'last')
 
     Returns:
         new_dict: inverted dictionary
     """
-    new_dict = {el: x for x in input_dict for el in input_dict[x]}
+    if collision not in ["last", "first", "list"]:
+        raise ValueError("Invalid collision option.")
+
+    if collision == "last":
+        new_dict = {value: key for key, value in pairs}
+    elif collision == "first":
+        new_dict = {}
+        for key, value in pairs:
+            if value not in new_dict:
+                new_dict[value] = key
+    else:
+        new_dict = {}
+        for key, value in pairs:
+            if value in new_dict:
+                new_dict[value].append(key)
+            else:
+                new_dict[value] = [key]
+
     if sort_keys:
-        return {el: new_dict[el] for el in sorted(new_dict)}
+        return dict(sorted(new_dict.items()))
 
     return new_dict
 
 
+def invert_array_mapping(keys: np.ndarray,
+                         values: np.ndarray) -> Tuple[np.ndarray,
+                                                      np.ndarray,
+                                                      np.ndarray]:
+    """Invert an integer-coded mapping stored as two arrays.
+
+    Given the parallel arrays keys and values, where each keys[i] is
+    mapped to values[i], group keys by value without building any Python
+    dictionary. The result is returned in compressed (CSR-like) form: the
+    keys mapped to unique_values[j] are grouped_keys[indptr[j]:indptr[j + 1]],
+    in their original order; grouped_keys[indptr[:-1]] and
+    grouped_keys[indptr[1:] - 1] give the first and last key of each value.
+
+    Examples:
+        >>> invert_array_mapping(np.array([1, 1, 2, 2]), np.array([7, 9, 9, 8]))
+        (array([7, 8, 9]), array([0, 1, 2, 4]), array([1, 2, 1, 2]))
+
+    Args:
+        keys: array of keys, of shape (N, )
+        values: array of values mapped to each key, of shape (N, )
+
+    Returns:
+        unique_values: sorted array of unique values
+        indptr: array of group boundaries, of shape (N_unique + 1, )
+        grouped_keys: array of keys grouped by value, of shape (N, )
+    """
+    keys = np.asarray(keys)
+    values = np.asarray(values)
+    if keys.shape != values.shape:
+        raise ValueError("Keys and values must have the same shape.")
+
+    order = np.argsort(values, kind="stable")
+    unique_values, starts = np.unique(values[order], return_index=True)
+    indptr = np.append(starts, values.shape[0])
+
+    return unique_values, indptr, keys[order]
+
+
+@functools.lru_cache(maxsize=None)
+def _small_primes(limit: int) -> np.ndarray:
+    """Return all the primes lower than limit (sieve of Eratosthenes)."""
+    sieve = np.ones(limit, dtype=bool)
+    sieve[:2] = False
+    for i in range(2, int(limit ** 0.5) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = False
+    primes = np.nonzero(sieve)[0]
+    primes.setflags(write=False)
+
+    return primes
+
+
+def _is_prime(number: int) -> bool:
+    """Miller-Rabin primality test, deterministic for numbers < 3.3e24."""
+    if number < 2:
+        return False
+    for p in _MR_BASES:
+        if number % p == 0:
+            return number == p
+    d, r = number - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        r += 1
+    for a in _MR_BASES:
+        x = pow(a, d, number)
+        if x == 1 or x == number - 1:
+            continue
+        for _ in range(r - 1):
+            x = pow(x, 2, number)
+            if x == number - 1:
+                break
+        else:
+            return False
+
+    return True
+
+
+def _pollard_rho(number: int) -> int:
+    """Return a non-trivial divisor of a composite number (Brent's
+    variant of Pollard's rho algorithm)."""
+    if number % 2 == 0:
+        return 2
+    for c in range(1, number):
+        y, r, q, g = 2, 1, 1, 1
+        x = ys = y
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % number
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(128, r - k)):
+                    y = (y * y + c) % number
+                    q = q * abs(x - y) % number
+                g = gcd(q, number)
+                k += 128
+            r *= 2
+        if g == number:
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % number
+                g = gcd(abs(x - ys), number)
+        if g != number:
+            return g
+
+    return number
+
+
+def _large_prime_factors(number: int) -> List[int]:
+    """Factorise a number with no prime factors below the trial division
+    bound, using Miller-Rabin and Pollard's rho."""
+    factors = []
+    stack = [number]
+    while stack:
+        n = stack.pop()
+        if n == 1:
+            continue
+        if _is_prime(n):
+            factors.append(n)
+            continue
+        d = _pollard_rho(n)
+        stack.extend([d, n // d])
+
+    return factors
+
+
 def prime_factors(number: int) -> List[int]:
     """Calculate the prime factors of a number.
 
     Calculate the prime factors of a given natural number. Note that 1 is
     not a prime number, so it will not be included.
+    Trial division by the primes below 2^16 is used for small factors,
+    while the remaining cofactor (if any) is factorised using
+    Miller-Rabin primality tests and Pollard's rho algorithm.
 
     Args:
         number: input natural number
@@ -77,13 +320,59 @@ def prime_factors(number: int) -> List[int]:
         factors: list of prime factors
     """
     factors = []
-    i = 2
-    while number > 1:
-        if number % i == 0:
-            number = number // i
-            factors.append(i)
-            continue
-        i += 1
+    number = int(number)
+    for p in _small_primes(_TRIAL_DIVISION_BOUND).tolist():
+        if p * p > number:
+            break
+        while number % p == 0:
+            number //= p
+            factors.append(p)
+    if number > 1:
+        if number < _TRIAL_DIVISION_BOUND ** 2:
+            factors.append(number)
+        else:
+            factors.extend(sorted(_large_prime_factors(number)))
+
+    return factors
+
+
+def prime_factors_batch(numbers: Union[Iterable[int],
+                                       np.ndarray]) -> List[List[int]]:
+    """Calculate the prime factors of many numbers at once.
+
+    Trial division by the primes below 2^16 is performed on the whole
+    array at once, only keeping track of the numbers which may still have
+    small factors; the remaining large cofactors are then factorised one
+    by one as in prime_factors().
+
+    Args:
+        numbers: array or iterable of natural numbers (up to 2^63 - 1)
+
+    Returns:
+        factors: list of lists of prime factors, in the same order as
+            numbers
+    """
+    remaining = np.array(numbers, dtype=np.int64).ravel()
+    factors = [[] for _ in range(remaining.shape[0])]
+    active = np.nonzero(remaining > 1)[0]
+
+    for p in _small_primes(_TRIAL_DIVISION_BOUND).tolist():
+        active = active[remaining[active] >= p * p]
+        if active.shape[0] == 0:
+            break
+        divisible = active[remaining[active] % p == 0]
+        while divisible.shape[0] > 0:
+            for i in divisible.tolist():
+                factors[i].append(p)
+            remaining[divisible] //= p
+            divisible = divisible[remaining[divisible] % p == 0]
+
+    for i in np.nonzero(remaining > 1)[0].tolist():
+        number = int(remaining[i])
+        if number < _TRIAL_DIVISION_BOUND ** 2:
+            factors[i].append(number)
+        else:
+            factors[i].extend(sorted(_large_prime_factors(number)))
 
     return factors
 
@@ -101,11 +390,106 @@ def filter_type(input_list: List[Any], target_type: Type) -> List[Any]:
     Returns:
         filtered: filtered list
     """
-    filtered = [el for el in input_list if type(el) == target_type]
+    filtered = partition_by_type(input_list, [target_type])[target_type]
 
     return filtered
 
 
+def _type_resolver(types: Tuple[Type, ...], subclasses: bool) -> Callable:
+    """Return a cached function mapping the type of an element to the
+    bucket it belongs to (or None)."""
+    resolved = {t: t for t in types}
+
+    def resolve(el_type: Type) -> Union[Type, None]:
+        try:
+            return resolved[el_type]
+        except KeyError:
+            target = None
+            if subclasses:
+                target = next((t for t in el_type.__mro__ if t in types),
+                              None)
+            resolved[el_type] = target
+            return target
+
+    return resolve
+
+
+def ipartition_by_type(iterable: Iterable,
+                       types: Iterable[Type],
+                       subclasses: bool = False) -> Iterator[Tuple[Type,
+                                                                   Any]]:
+    """Lazily assign the elements of an iterable to the given types.
+
+    Generator version of partition_by_type(), which yields a (type,
+    element) tuple for each element belonging to one of the given types,
+    skipping the others.
+
+    Args:
+        iterable: input iterable to partition
+        types: desired types
+        subclasses: also match instances of subclasses, which are
+            assigned to their closest type in the MRO (default: False)
+
+    Returns:
+        generator of (type, element) tuples
+    """
+    resolve = _type_resolver(tuple(types), subclasses)
+    for el in iterable:
+        target = resolve(type(el))
+        if target is not None:
+            yield target, el
+
+
+def partition_by_type(iterable: Iterable,
+                      types: Iterable[Type],
+                      subclasses: bool = False) -> Dict[Type, List[Any]]:
+    """Split the elements of an iterable into lists of the given types.
+
+    Traverse the iterable only once and return a dictionary where each of
+    the given types is mapped to the list of elements of that type (in
+    their original order); elements of other types are discarded.
+    One-dimensional NumPy arrays and pandas Series/Index are partitioned
+    with one vectorized comparison per distinct type found.
+
+    Args:
+        iterable: input iterable to partition
+        types: desired types
+        subclasses: also match instances of subclasses, which are
+            assigned to their closest type in the MRO (default: False)
+
+    Returns:
+        buckets: dictionary of type: list of elements
+    """
+    types = tuple(types)
+    buckets = {t: [] for t in types}
+
+    if isinstance(iterable, (pd.Series, pd.Index)):
+        iterable = iterable.to_numpy()
+    if isinstance(iterable, np.ndarray) and iterable.ndim == 1:
+        resolve = _type_resolver(types, subclasses)
+        if iterable.dtype != object:
+            target = resolve(iterable.dtype.type)
+            if target is not None:
+                buckets[target] = list(iterable)
+            return buckets
+        el_types = np.frompyfunc(type, 1, 1)(iterable)
+        masks = {}
+        for el_type in set(el_types):
+            target = resolve(el_type)
+            if target is None:
+                continue
+            mask = el_types == el_type
+            masks[target] = masks[target] | mask if target in masks else mask
+        for target, mask in masks.items():
+            buckets[target] = iterable[mask].tolist()
+        return buckets
+
+    for target, el in ipartition_by_type(iterable, types, subclasses):
+        buckets[target].append(el)
+
+    return buckets
+
+
 def wordcount(sentence: str,
               word: Union[bool, str] = False,
               ignore_case: bool = False) -> Union[dict, int]:
@@ -123,17 +507,106 @@ def wordcount(sentence: str,
     Returns:
         word_dict: dictionary of word counts
     """
-    if ignore_case:
-        sentence = sentence.casefold()
-    words = re.sub(r"\W", " ", sentence).split()
-    wordset = set(words)
-    word_dict = {el: words.count(el) for el in wordset}
+    word_dict = dict(_count_words(sentence, ignore_case))
     if word:
         return word_dict.get(word, 0)
 
     return word_dict
 
 
+def _count_words(text: str, ignore_case: bool = False) -> Counter:
+    if ignore_case:
+        text = text.casefold()
+    return Counter(_WORD_RE.findall(text))
+
+
+def _iter_word_chunks(handle: TextIO, chunk_size: int) -> Iterator[str]:
+    """Read a text stream in chunks, never splitting a word between two
+    consecutive chunks."""
+    tail = ""
+    while True:
+        chunk = handle.read(chunk_size)
+        if not chunk:
+            break
+        chunk = tail + chunk
+        match = _TRAILING_WORD_RE.search(chunk)
+        if match:
+            tail = chunk[match.start():]
+            chunk = chunk[:match.start()]
+        else:
+            tail = ""
+        if chunk:
+            yield chunk
+    if tail:
+        yield tail
+
+
+def wordcount_file(path: Union[str, TextIO],
+                   word: Union[bool, str] = False,
+                   ignore_case: bool = False,
+                   chunk_size: int = 1 << 20,
+                   cores: int = 1) -> Union[dict, int]:
+    """Count occurrences of words in a text file.
+
+    Same as wordcount(), but the text is read in chunks of `chunk_size`
+    characters, so that files larger than the available memory can be
+    processed. With cores > 1, chunks are counted in parallel and the
+    partial counts are merged at the end.
+
+    Args:
+        path: path of the input file, '-' to read from stdin, or an
+            already opened text stream
+        word: target word to count occurrences of
+        ignore_case: ignore case in the given text (default: False)
+        chunk_size: number of characters read at a time (default: 1 MiB)
+        cores: number of cores to use (default: 1)
+
+    Returns:
+        word_dict: dictionary of word counts
+    """
+    if path == "-":
+        handle, close = sys.stdin, False
+    elif isinstance(path, str):
+        handle, close = open(path), True
+    else:
+        handle, close = path, False
+
+    counts = Counter()
+    chunks = _iter_word_chunks(handle, chunk_size)
+    try:
+        if cores > 1:
+            with Pool(cores) as pool:
+                for partial in pool.imap_unordered(
+                        functools.partial(_count_words,
+                                          ignore_case=ignore_case),
+                        chunks):
+                    counts.update(partial)
+        else:
+            for chunk in chunks:
+                counts.update(_count_words(chunk, ignore_case))
+    finally:
+        if close:
+            handle.close()
+
+    if word:
+        return counts.get(word, 0)
+
+    return dict(counts)
+
+
+def top_words(word_dict: dict, k: int = 10) -> List[Tuple[str, int]]:
+    """Return the k most frequent words from a dictionary of word counts.
+
+    Args:
+        word_dict: dictionary of word counts, as returned by wordcount()
+        k: number of words to return (default: 10)
+
+    Returns:
+        top: list of (word, count) tuples, most frequent first
+    """
+    return heapq.nlargest(k, word_dict.items(), key=operator.itemgetter(1))
+
+
 def equal_files(file1: str, file2: str) -> bool:
     """Check whether two files are identical.
 
@@ -161,6 +634,7 @@ def benchmark(function: Callable) -> Callable:
     Args:
         function: function to benchmark
     """
+    @functools.wraps(function)
     def wrapper(*args, **kwargs) -> Tuple[str, float, Any]:
         """Return time spent to call a function.
 
@@ -174,16 +648,162 @@ def benchmark(function: Callable) -> Callable:
         :return: Tuple[str,float,Any]
         """
         f_name = function.__name__
-        start = time.time()
+        start = time.perf_counter_ns()
         f_val = function(*args, **kwargs)
-        end = time.time()
-        f_time = end - start
+        end = time.perf_counter_ns()
+        f_time = (end - start) / 1e9
 
         return f_name, f_time, f_val
 
     return wrapper
 
 
+def _peak_memory(function: Callable, args: tuple, kwargs: dict) -> int:
+    """Return the peak memory (in bytes) allocated while calling function."""
+    was_tracing = tracemalloc.is_tracing()
+    if was_tracing and hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    elif not was_tracing:
+        tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        function(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    return max(peak - base, 0)
+
+
+def run_benchmark(function: Callable,
+                  args: tuple = (),
+                  kwargs: Union[dict, None] = None,
+                  repeat: int = 5,
+                  warmup: int = 1,
+                  memory: bool = False,
+                  name: Union[str, None] = None) -> BenchmarkResult:
+    """Run a micro-benchmark of a given function.
+
+    Call the function `warmup` times without recording, then `repeat`
+    times measuring each call with a high-resolution counter. If memory
+    is True, one additional call is run under tracemalloc to record the
+    peak memory allocated, so that tracing overhead does not affect the
+    recorded timings.
+
+    Args:
+        function: function to benchmark
+        args: positional arguments for the function (default: ())
+        kwargs: keyword arguments for the function (default: None)
+        repeat: number of measured calls (default: 5)
+        warmup: number of unmeasured calls run beforehand (default: 1)
+        memory: also record the peak memory allocated (default: False)
+        name: name used to identify the benchmark (default: function name)
+
+    Returns:
+        result: instance of prestools.classes.BenchmarkResult()
+    """
+    if repeat < 1:
+        raise ValueError("At least one measured run is required.")
+    kwargs = kwargs or {}
+    for _ in range(warmup):
+        function(*args, **kwargs)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        function(*args, **kwargs)
+        timings.append(time.perf_counter_ns() - start)
+
+    result = BenchmarkResult(name or function.__name__, timings)
+    if memory:
+        result.peak_memory = _peak_memory(function, args, kwargs)
+
+    return result
+
+
+def record_benchmark(function: Union[Callable, None] = None,
+                     name: Union[str, None] = None) -> Callable:
+    """Record the execution time of every call of a given function.
+
+    Decorator that, unlike benchmark(), returns the values of the wrapped
+    function unchanged and stores the timing of each call in a global
+    registry, which can be inspected with get_benchmarks() and saved with
+    export_benchmarks(). It can be used both as @record_benchmark and
+    @record_benchmark(name="...").
+
+    Args:
+        function: function to benchmark
+        name: name used to record the timings (default: function name)
+    """
+    def decorator(func: Callable) -> Callable:
+        key = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _BENCHMARKS.setdefault(key, []).append(
+                    time.perf_counter_ns() - start)
+
+        return wrapper
+
+    if function is None:
+        return decorator
+    return decorator(function)
+
+
+def get_benchmarks() -> Dict[str, BenchmarkResult]:
+    """Return the results recorded by functions decorated with
+    record_benchmark().
+
+    Returns:
+        results: dictionary of name: BenchmarkResult
+    """
+    return {key: BenchmarkResult(key, timings)
+            for key, timings in _BENCHMARKS.items()}
+
+
+def clear_benchmarks():
+    """Remove all the results recorded by record_benchmark()."""
+    _BENCHMARKS.clear()
+
+
+def export_benchmarks(path: str,
+                      results: Union[Iterable[BenchmarkResult],
+                                     None] = None,
+                      metadata: Union[dict, None] = None) -> str:
+    """Save benchmark results to a JSON file.
+
+    Save the given benchmark results (or those recorded with
+    record_benchmark() if none are given) to a JSON file, together with
+    the prestools version and any additional metadata, so that results
+    from different releases can be compared.
+
+    Args:
+        path: path of the output JSON file
+        results: benchmark results to save (default: None)
+        metadata: additional information to store (default: None)
+
+    Returns:
+        path: path of the output JSON file
+    """
+    from . import __version__
+
+    if results is None:
+        results = get_benchmarks().values()
+    data = {"prestools_version": __version__,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "metadata": metadata or {},
+            "benchmarks": [res.to_dict() for res in results]}
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+    return path
+
+
 def apply_parallel(df: pd.DataFrame,
                    function: Callable,
                    cores: int = 4) -> pd.DataFrame:
@@ -202,7 +822,9 @@ def apply_parallel(df: pd.DataFrame,
     Returns:
         df: resulting dataframe
     """
-    df_split = np.array_split(df, cores)
+    bounds = np.linspace(0, len(df), cores + 1).astype(int)
+    df_split = [df.iloc[start:end] for start, end in zip(bounds[:-1],
+                                                         bounds[1:])]
     pool = Pool(cores)
     df = pd.concat(pool.map(function, df_split))
     pool.close()
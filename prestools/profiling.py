@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Created by Roberto Preste
+import os
+import json
+import time
+import atexit
+import marshal
+import inspect
+import importlib
+import functools
+import contextlib
+from typing import Union, Iterable, Dict
+
+_DEFAULT_MODULES = ("prestools.bioinf", "prestools.clustering",
+                    "prestools.misc", "prestools.graph")
+
+_ORIGINALS = {}
+_STATS = {}
+_STACK = []
+
+
+def _input_size(args: tuple) -> Union[int, None]:
+    """Return the size of the first argument of a call, if it has one."""
+    if not args:
+        return None
+    obj = args[0]
+    size = getattr(obj, "size", None)
+    if isinstance(size, int):
+        return size
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+def _new_stat(function) -> dict:
+    code = function.__code__
+    return {"key": (code.co_filename, code.co_firstlineno,
+                    function.__name__),
+            "calls": 0, "total_ns": 0, "own_ns": 0,
+            "total_input_size": 0, "max_input_size": None,
+            "callers": {}}
+
+
+def _instrument(name: str, function):
+    """Wrap a function so that each call is recorded in the stats."""
+    stat = _STATS.setdefault(name, _new_stat(function))
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        _STACK.append([name, 0])
+        start = time.perf_counter_ns()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            _, children = _STACK.pop()
+            stat["calls"] += 1
+            stat["total_ns"] += elapsed
+            stat["own_ns"] += elapsed - children
+            size = _input_size(args)
+            if size is not None:
+                stat["total_input_size"] += size
+                if stat["max_input_size"] is None \
+                        or size > stat["max_input_size"]:
+                    stat["max_input_size"] = size
+            if _STACK:
+                _STACK[-1][1] += elapsed
+                caller = stat["callers"].setdefault(_STACK[-1][0],
+                                                    [0, 0, 0])
+                caller[0] += 1
+                caller[1] += elapsed - children
+                caller[2] += elapsed
+
+    return wrapper
+
+
+def enable(modules: Union[Iterable[str], None] = None):
+    """Start recording calls to the public functions of prestools.
+
+    Replace each public function of the given modules with an
+    instrumented version recording call counts, cumulative time and
+    input sizes. Only calls made through the module (e.g.
+    `pb.hamming_distance()`, including calls between functions of the same
+    module) are recorded; names imported with `from ... import` before
+    enabling keep pointing to the original functions.
+
+    Args:
+        modules: names of the modules to instrument (default: bioinf,
+            clustering, misc and graph)
+    """
+    for mod_name in modules or _DEFAULT_MODULES:
+        module = importlib.import_module(mod_name)
+        for attr, obj in list(vars(module).items()):
+            if attr.startswith("_") or not inspect.isfunction(obj) \
+                    or obj.__module__ != mod_name \
+                    or (mod_name, attr) in _ORIGINALS:
+                continue
+            _ORIGINALS[(mod_name, attr)] = obj
+            setattr(module, attr,
+                    _instrument("{}.{}".format(mod_name, attr), obj))
+
+
+def disable():
+    """Stop recording calls, restoring the original functions.
+
+    Recorded stats are kept until reset() is called.
+    """
+    for (mod_name, attr), obj in _ORIGINALS.items():
+        setattr(importlib.import_module(mod_name), attr, obj)
+    _ORIGINALS.clear()
+
+
+def is_enabled() -> bool:
+    """Return True if instrumentation is currently active."""
+    return bool(_ORIGINALS)
+
+
+def reset():
+    """Remove all recorded stats."""
+    _STATS.clear()
+
+
+@contextlib.contextmanager
+def instrument(modules: Union[Iterable[str], None] = None,
+               output: Union[str, None] = None):
+    """Context manager recording calls to prestools functions.
+
+    Examples:
+        >>> with instrument():
+        ...     pb.p_distance("ACGT", "ACGA")
+        >>> get_stats()["prestools.bioinf.p_distance"]["calls"]
+        1
+
+    Args:
+        modules: names of the modules to instrument (default: bioinf,
+            clustering, misc and graph)
+        output: if given, stats are exported to this path on exit
+            (see export())
+    """
+    enable(modules)
+    try:
+        yield
+    finally:
+        disable()
+        if output:
+            export(output)
+
+
+def get_stats() -> Dict[str, dict]:
+    """Return the recorded stats of each called function.
+
+    Times are expressed in seconds; `own_time` excludes the time spent in
+    other instrumented functions.
+
+    Returns:
+        stats: dictionary of function name: stats
+    """
+    stats = {}
+    for name, stat in _STATS.items():
+        if stat["calls"] == 0:
+            continue
+        stats[name] = {
+            "calls": stat["calls"],
+            "total_time": stat["total_ns"] / 1e9,
+            "own_time": stat["own_ns"] / 1e9,
+            "mean_time": stat["total_ns"] / stat["calls"] / 1e9,
+            "total_input_size": stat["total_input_size"],
+            "max_input_size": stat["max_input_size"]
+        }
+
+    return stats
+
+
+def export_json(path: str) -> str:
+    """Save recorded stats to a JSON file.
+
+    Args:
+        path: path of the output file
+
+    Returns:
+        path: path of the output file
+    """
+    with open(path, "w") as f:
+        json.dump(get_stats(), f, indent=2)
+
+    return path
+
+
+def export_pstats(path: str) -> str:
+    """Save recorded stats to a cProfile-compatible file.
+
+    The resulting file can be loaded with `pstats.Stats(path)` or any
+    tool reading cProfile output (e.g. snakeviz).
+
+    Args:
+        path: path of the output file
+
+    Returns:
+        path: path of the output file
+    """
+    stats = {}
+    for stat in _STATS.values():
+        if stat["calls"] == 0:
+            continue
+        callers = {_STATS[name]["key"]: (calls, calls, own / 1e9, tot / 1e9)
+                   for name, (calls, own, tot) in stat["callers"].items()}
+        stats[stat["key"]] = (stat["calls"], stat["calls"],
+                              stat["own_ns"] / 1e9, stat["total_ns"] / 1e9,
+                              callers)
+    with open(path, "wb") as f:
+        marshal.dump(stats, f)
+
+    return path
+
+
+def export(path: str) -> str:
+    """Save recorded stats, as JSON if path ends with '.json' or as a
+    cProfile-compatible stats file otherwise.
+
+    Args:
+        path: path of the output file
+
+    Returns:
+        path: path of the output file
+    """
+    if path.lower().endswith(".json"):
+        return export_json(path)
+    return export_pstats(path)
+
+
+def _enable_from_env(variable: str = "PRESTOOLS_PROFILE"):
+    """Enable instrumentation if the given environment variable is set,
+    exporting stats to the path it contains when the interpreter exits."""
+    path = os.environ.get(variable)
+    if not path:
+        return
+    enable()
+    atexit.register(export, path)
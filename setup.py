@@ -41,7 +41,7 @@ setup(
     include_package_data=True,
     keywords='prestools',
     name='prestools',
-    packages=find_packages(),
+    packages=find_packages(exclude=["tests", "benchmarks"]),
     setup_requires=setup_requirements,
     test_suite='tests',
     tests_require=test_requirements,
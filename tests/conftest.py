@@ -223,3 +223,13 @@ def sample_gene_lengths() -> np.ndarray:
     """Return a sample gene lengths array."""
     lengths = np.array([3931, 2409, 5897, 2825])
     return lengths
+
+
+@pytest.fixture
+def sample_fasta_file(tmp_path) -> str:
+    """Return the path of a FASTA file with three short records."""
+    path = tmp_path / "sample.fasta"
+    path.write_text(">seq_1 first\nACGTAC\nGTNAC\n"
+                    ">seq_2\nAAAAAAAA\n"
+                    ">seq_3\nacgt\n")
+    return str(path)
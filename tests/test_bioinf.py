@@ -1,9 +1,14 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 # Created by Roberto Preste
+import os
+import gzip
+import random
+import struct
 import pytest
 import numpy as np
 import prestools.bioinf as pb
+from prestools.classes import MinHashSketches
 
 
 # pb.hamming_distance
@@ -262,3 +267,994 @@ def test_quantile_norm_log(sample_gene_counts):
     ])
     result = pb.quantile_norm(sample_gene_counts, to_log=True)
     np.testing.assert_array_almost_equal(result, expect)
+
+
+# pb.read_fasta
+
+def test_read_fasta(sample_fasta_file):
+    expect = [("seq_1 first", "ACGTACGTNAC"), ("seq_2", "AAAAAAAA"),
+              ("seq_3", "acgt")]
+    result = list(pb.read_fasta(sample_fasta_file))
+    assert result == expect
+
+
+def test_read_fasta_gzip(tmp_path):
+    path = str(tmp_path / "sample.fasta.gz")
+    with gzip.open(path, "wt") as f:
+        f.write(">a\nAC\nGT\n>b\nTT\n")
+    expect = [("a", "ACGT"), ("b", "TT")]
+    result = list(pb.read_fasta(path))
+    assert result == expect
+
+
+# pb.kmer_encode
+
+def test_kmer_encode_decode():
+    expect = "GATTACA"
+    result = pb.kmer_decode(pb.kmer_encode(expect), 7)
+    assert result == expect
+
+
+def test_kmer_encode_error():
+    with pytest.raises(ValueError):
+        pb.kmer_encode("ACN")
+
+
+# pb.kmer_codes
+
+def test_kmer_codes():
+    expect = [pb.kmer_encode(el) for el in ["ACG", "CGT", "AAC"]]
+    result = pb.kmer_codes("ACGTNAAC", 3).tolist()
+    assert result == expect
+
+
+def test_kmer_codes_canonical():
+    expect = [pb.kmer_encode(el) for el in ["AAC", "TAA", "TAA", "AAC",
+                                            "ACG"]]
+    result = pb.kmer_codes("GTTAACG", 3, canonical=True).tolist()
+    assert result == expect
+
+
+def test_kmer_codes_short():
+    result = pb.kmer_codes("AC", 3)
+    assert result.shape == (0, )
+
+
+def test_kmer_codes_error():
+    with pytest.raises(ValueError):
+        pb.kmer_codes("ACGT", 32)
+
+
+# pb.kmer_count
+
+def test_kmer_count_dense():
+    result = pb.kmer_count("ACGTAC", 2)
+    assert result.shape == (16, )
+    assert result[pb.kmer_encode("AC")] == 2
+    assert result.sum() == 5
+
+
+def test_kmer_count_sparse(sample_nt_sequence):
+    expect = {}
+    for i in range(len(sample_nt_sequence) - 11):
+        code = pb.kmer_encode(sample_nt_sequence[i:i + 12])
+        expect[code] = expect.get(code, 0) + 1
+    result = pb.kmer_count(sample_nt_sequence, 12)
+    assert result == expect
+
+
+def test_kmer_count_canonical():
+    expect = pb.kmer_count("AACGTTT", 3, canonical=True)
+    result = pb.kmer_count(pb.reverse_complement("AACGTTT"), 3,
+                           canonical=True)
+    assert (result == expect).all()
+
+
+def test_kmer_count_chunks(monkeypatch, sample_nt_sequence):
+    expect = pb.kmer_count(sample_nt_sequence, 4, canonical=True)
+    monkeypatch.setattr(pb, "_KMER_CHUNK_SIZE", 7)
+    result = pb.kmer_count(sample_nt_sequence, 4, canonical=True)
+    assert (result == expect).all()
+
+
+def test_kmer_count_sparse_chunks(monkeypatch, sample_nt_sequence):
+    expect = pb.kmer_count(sample_nt_sequence * 3, 4, dense=False)
+    monkeypatch.setattr(pb, "_KMER_CHUNK_SIZE", 7)
+    result = pb.kmer_count(sample_nt_sequence * 3, 4, dense=False)
+    assert result == expect
+
+
+# pb.iter_kmer_counts
+
+def test_iter_kmer_counts(sample_fasta_file):
+    result = list(pb.iter_kmer_counts(sample_fasta_file, 2))
+    assert [el[0] for el in result] == ["seq_1 first", "seq_2", "seq_3"]
+    assert [el[1].sum() for el in result] == [8, 7, 3]
+
+
+def test_iter_kmer_counts_parallel(sample_fasta_file):
+    expect = list(pb.iter_kmer_counts(sample_fasta_file, 13))
+    result = list(pb.iter_kmer_counts(sample_fasta_file, 13, cores=2))
+    assert result == expect
+
+
+# pb.kmer_count_fasta
+
+def test_kmer_count_fasta(sample_fasta_file):
+    result = pb.kmer_count_fasta(sample_fasta_file, 2)
+    assert result[pb.kmer_encode("AA")] == 7
+    assert result.sum() == 18
+
+
+def test_kmer_count_fasta_sparse(sample_fasta_file):
+    expect = {pb.kmer_encode("ACGTACG"): 1, pb.kmer_encode("CGTACGT"): 1,
+              pb.kmer_encode("AAAAAAA"): 2}
+    result = pb.kmer_count_fasta(sample_fasta_file, 7, dense=False)
+    assert result == expect
+
+
+# pb.kmer_spectrum
+
+def test_kmer_spectrum():
+    expect = [0, 2, 0, 1]
+    result = pb.kmer_spectrum({1: 3, 5: 1, 7: 1}).tolist()
+    assert result == expect
+
+
+# pb.kmer_distance_matrix
+
+def test_kmer_distance_matrix_cosine():
+    expect = np.array([[0., 0., 1.], [0., 0., 1.], [1., 1., 0.]])
+    result = pb.kmer_distance_matrix(["AAAAA", "AAAAAAAAA", "CCCCCC"], k=3)
+    np.testing.assert_array_almost_equal(result, expect)
+
+
+def test_kmer_distance_matrix_jaccard():
+    expect = np.array([[0., 0.5], [0.5, 0.]])
+    result = pb.kmer_distance_matrix(["AACC", "AACG"], k=2, metric="jaccard")
+    np.testing.assert_array_almost_equal(result, expect)
+
+
+def test_kmer_distance_matrix_euclidean():
+    expect = np.sqrt(2) / 3
+    result = pb.kmer_distance_matrix(["AACC", "AACG"], k=2,
+                                     metric="euclidean")
+    assert result[0, 1] == pytest.approx(expect)
+
+
+def test_kmer_distance_matrix_error():
+    with pytest.raises(ValueError):
+        pb.kmer_distance_matrix(["AACC", "AACG"], metric="hamming")
+
+
+# pb.kmer_distance
+
+def test_kmer_distance_unequal_lengths(sample_nt_sequence):
+    result = pb.kmer_distance(sample_nt_sequence, sample_nt_sequence[:50])
+    assert result == pytest.approx(0, abs=0.05)
+
+
+# pb.minhash_sketch
+
+def test_minhash_sketch(sample_nt_long_1):
+    result = pb.minhash_sketch(sample_nt_long_1, size=100)
+    assert result.shape == (100, )
+    assert (np.diff(result.astype(float)) > 0).all()
+
+
+def test_minhash_sketch_chunks(monkeypatch, sample_nt_long_1):
+    expect = pb.minhash_sketch(sample_nt_long_1, size=50)
+    monkeypatch.setattr(pb, "_KMER_CHUNK_SIZE", 100)
+    result = pb.minhash_sketch(sample_nt_long_1, size=50)
+    assert (result == expect).all()
+
+
+def test_minhash_sketch_repeats(monkeypatch):
+    sequence = "ACGTTGCA" * 500 + "".join(random.Random(3).choices("ACGT",
+                                                                  k=2000))
+    codes = pb.kmer_codes(sequence, 5, canonical=True)
+    expect = np.unique(pb._hash_kmers(codes, 42))[:100]
+    monkeypatch.setattr(pb, "_KMER_CHUNK_SIZE", 1000)
+    result = pb.minhash_sketch(sequence, k=5, size=100)
+    np.testing.assert_array_equal(result, expect)
+
+
+def test_minhash_sketch_canonical(sample_nt_long_1):
+    expect = pb.minhash_sketch(sample_nt_long_1)
+    result = pb.minhash_sketch(pb.reverse_complement(sample_nt_long_1))
+    assert (result == expect).all()
+
+
+# pb.sketch_sequences
+
+def test_sketch_sequences(sample_fasta_file):
+    result = pb.sketch_sequences(sample_fasta_file, k=3, size=4)
+    assert result.names == ["seq_1 first", "seq_2", "seq_3"]
+    assert result.hashes.shape == (3, 4)
+    assert (result.hashes[1, 1:] == pb._SKETCH_EMPTY).all()
+
+
+def test_sketch_sequences_parallel(sample_fasta_file):
+    expect = pb.sketch_sequences(sample_fasta_file, k=3, size=4)
+    result = pb.sketch_sequences(sample_fasta_file, k=3, size=4, cores=2)
+    assert (result.hashes == expect.hashes).all()
+
+
+def test_sketch_sequences_save_load(sample_fasta_file, tmp_path):
+    expect = pb.sketch_sequences(sample_fasta_file, k=5, size=8,
+                                 canonical=False)
+    path = expect.save(str(tmp_path / "sketches.npz"))
+    result = MinHashSketches.load(path)
+    assert (result.hashes == expect.hashes).all()
+    assert result.names == expect.names
+    assert (result.k, result.size, result.canonical, result.seed) == \
+        (5, 8, False, 42)
+
+
+# pb.mash_distance
+
+def test_mash_distance_identical(sample_nt_long_1):
+    result = pb.mash_distance(sample_nt_long_1, sample_nt_long_1)
+    assert result == 0
+
+
+def test_mash_distance_unrelated(sample_nt_long_1):
+    result = pb.mash_distance(sample_nt_long_1, "A" * 100)
+    assert result == 1
+
+
+def test_mash_distance_exact(sample_nt_long_1, sample_nt_long_2):
+    seq_1 = sample_nt_long_1.replace("\n", "").replace(" ", "")
+    seq_2 = sample_nt_long_2.replace("\n", "").replace(" ", "")
+    kmers_1 = {seq_1[i:i + 7] for i in range(len(seq_1) - 6)}
+    kmers_2 = {seq_2[i:i + 7] for i in range(len(seq_2) - 6)}
+    j = len(kmers_1 & kmers_2) / len(kmers_1 | kmers_2)
+    expect = -np.log(2 * j / (1 + j)) / 7
+    result = pb.mash_distance(seq_1, seq_2, k=7,
+                              size=100000, canonical=False)
+    assert result == pytest.approx(expect)
+
+
+# pb.mash_candidates
+
+def test_mash_candidates(sample_nt_long_1):
+    seqs = [("a", sample_nt_long_1), ("b", "T" * 30),
+            ("c", sample_nt_long_1[:-5] + "GGGGG"), ("d", "T" * 40)]
+    sketches = pb.sketch_sequences(seqs, k=11, size=200)
+    rows, cols, distances = pb.mash_candidates(sketches, max_distance=0.05)
+    assert list(zip(rows, cols)) == [(0, 2), (1, 3)]
+    assert (distances <= 0.05).all()
+
+
+def test_mash_candidates_blocks(sample_nt_long_1, sample_nt_long_2):
+    seqs = [(str(i), pb.mutate_sequence(sample_nt_long_1[:300], i))
+            for i in range(6)] + [("x", sample_nt_long_2)]
+    sketches = pb.sketch_sequences(seqs, k=11, size=50)
+    expect = pb.mash_candidates(sketches, max_distance=0.2)
+    result = pb.mash_candidates(sketches, max_distance=0.2, block_size=2)
+    for res, exp in zip(result, expect):
+        np.testing.assert_array_almost_equal(res, exp)
+
+
+# pb.mash_distance_matrix
+
+def test_mash_distance_matrix(sample_nt_long_1, sample_nt_long_2):
+    seqs = [("a", sample_nt_long_1), ("b", sample_nt_long_2)]
+    sketches = pb.sketch_sequences(seqs, k=7, size=100000,
+                                   canonical=False)
+    expect = pb.mash_distance(sample_nt_long_1, sample_nt_long_2, k=7,
+                              size=100000, canonical=False)
+    result = pb.mash_distance_matrix(sketches)
+    assert result[0, 1] == result[1, 0] == pytest.approx(expect)
+    assert result[0, 0] == 0
+
+
+# pb.align
+
+def _gotoh_score(seq_1, seq_2, mode, match=1, mismatch=-1, gap_open=-3,
+                 gap_extend=-1):
+    """Reference affine-gap alignment score, computed cell by cell."""
+    neg = -10 ** 9
+    n, m = len(seq_1), len(seq_2)
+    h = [[neg] * (m + 1) for _ in range(n + 1)]
+    e = [[neg] * (m + 1) for _ in range(n + 1)]
+    f = [[neg] * (m + 1) for _ in range(n + 1)]
+    h[0][0] = 0
+    for j in range(1, m + 1):
+        h[0][j] = gap_open + (j - 1) * gap_extend if mode == "global" else 0
+    for i in range(1, n + 1):
+        h[i][0] = gap_open + (i - 1) * gap_extend if mode == "global" else 0
+        for j in range(1, m + 1):
+            e[i][j] = max(e[i][j - 1] + gap_extend, h[i][j - 1] + gap_open)
+            f[i][j] = max(f[i - 1][j] + gap_extend, h[i - 1][j] + gap_open)
+            sub = match if seq_1[i - 1] == seq_2[j - 1] else mismatch
+            h[i][j] = max(h[i - 1][j - 1] + sub, e[i][j], f[i][j])
+            if mode == "local":
+                h[i][j] = max(h[i][j], 0)
+    if mode == "global":
+        return h[n][m]
+    if mode == "local":
+        return max(max(row) for row in h)
+    return max(max(h[n]), max(row[m] for row in h))
+
+
+def test_align_identical():
+    result = pb.align("ACGT", "acgt")
+    assert result.score == 4
+    assert (result.aligned_1, result.aligned_2) == ("ACGT", "acgt")
+    assert result.identity == 1
+
+
+def test_align_global_gap():
+    result = pb.align("ACGTTACG", "ACGTACG")
+    assert result.score == 4
+    assert result.aligned_1 == "ACGTTACG"
+    assert result.aligned_2.replace("-", "") == "ACGTACG"
+    assert result.aligned_2.count("-") == 1
+
+
+def test_align_affine_gap():
+    result = pb.align("AAAAGGGAAAA", "AAAAAAAA")
+    assert result.score == 3
+    assert result.aligned_2 == "AAAA---AAAA"
+
+
+def test_align_local():
+    result = pb.align("TTTTACGTACGTTTTT", "GGACGTACGGG", mode="local")
+    assert result.score == 7
+    assert (result.aligned_1, result.aligned_2) == ("ACGTACG", "ACGTACG")
+    assert (result.start_1, result.end_1) == (4, 11)
+    assert (result.start_2, result.end_2) == (2, 9)
+
+
+def test_align_semiglobal():
+    result = pb.align("ACGTACGT", "GTAC", mode="semiglobal")
+    assert result.score == 4
+    assert (result.aligned_1, result.aligned_2) == ("ACGTACGT", "--GTAC--")
+    assert (result.start_1, result.end_1) == (2, 6)
+
+
+def test_align_score_only():
+    expect = pb.align("GATTACA", "GCATGCT").score
+    result = pb.align("GATTACA", "GCATGCT", score_only=True)
+    assert result == expect
+
+
+def test_align_banded(sample_nt_sequence):
+    seq_2 = sample_nt_sequence[:40] + sample_nt_sequence[42:]
+    expect = pb.align(sample_nt_sequence, seq_2)
+    result = pb.align(sample_nt_sequence, seq_2, band=3)
+    assert result.score == expect.score
+    assert result.aligned_2 == expect.aligned_2
+
+
+def test_align_banded_widened():
+    expect = pb.align("ACGTACGTAC", "ACGT").score
+    result = pb.align("ACGTACGTAC", "ACGT", band=1).score
+    assert result == expect
+
+
+def test_align_empty():
+    result = pb.align("ACG", "")
+    assert result.score == -5
+    assert (result.aligned_1, result.aligned_2) == ("ACG", "---")
+
+
+def test_align_error():
+    with pytest.raises(ValueError):
+        pb.align("ACGT", "ACGT", mode="glocal")
+
+
+# pb.align_batch
+
+@pytest.mark.parametrize("mode", ["global", "local", "semiglobal"])
+def test_align_batch_reference(mode):
+    rng = np.random.RandomState(0)
+    pairs = [("".join(rng.choice(list("ACGT"), rng.randint(0, 15))),
+              "".join(rng.choice(list("ACGT"), rng.randint(0, 15))))
+             for _ in range(40)]
+    expect = [_gotoh_score(seq_1, seq_2, mode, 2, -3, -4, -1)
+              for seq_1, seq_2 in pairs]
+    result = pb.align_batch(pairs, mode=mode, match=2, mismatch=-3,
+                            gap_open=-4, gap_extend=-1, batch_size=7)
+    assert [el.score for el in result] == expect
+    for (seq_1, seq_2), el in zip(pairs, result):
+        if mode == "local":
+            seq_1 = seq_1[el.start_1:el.end_1]
+            seq_2 = seq_2[el.start_2:el.end_2]
+        assert el.aligned_1.replace("-", "") == seq_1
+        assert el.aligned_2.replace("-", "") == seq_2
+
+
+def test_align_batch_score_only():
+    pairs = [("ACGTACGT", "ACGAACGT"), ("A", "ACGT"), ("GGGG", "CCCC")]
+    expect = [el.score for el in pb.align_batch(pairs)]
+    result = pb.align_batch(pairs, score_only=True)
+    assert isinstance(result, np.ndarray)
+    assert result.tolist() == expect
+
+
+def test_align_batch_parallel():
+    pairs = [("ACGTACGT", "ACGAACGT"), ("A", "ACGT"), ("GGGG", "CCCC")]
+    expect = pb.align_batch(pairs, score_only=True)
+    result = pb.align_batch(pairs, score_only=True, batch_size=1, cores=2)
+    assert result.tolist() == expect.tolist()
+
+
+# pb.alignment_distances
+
+def test_alignment_distances():
+    pairs = [("ACGTACGTAA", "ACGTCGTAA"), ("ACGTTGCA", "ACGATGCA")]
+    expect = [0.0, pb.p_distance("ACGTTGCA", "ACGATGCA")]
+    result = pb.alignment_distances(pairs, model="hamming_distance")
+    assert result[0] == 0
+    result = pb.alignment_distances(pairs)
+    np.testing.assert_array_almost_equal(result, expect)
+
+
+def test_alignment_distances_nan():
+    result = pb.alignment_distances([("AAAA", "TTTT")],
+                                    model="jukes_cantor_distance")
+    assert np.isnan(result[0])
+
+
+def test_alignment_distances_error():
+    with pytest.raises(ValueError):
+        pb.alignment_distances([("AAAA", "TTTT")], model="p")
+
+
+# pb.encode_batch
+
+def test_encode_batch():
+    codes, lengths = pb.encode_batch(["AC", "", "acg"], ignore_case=True)
+    assert lengths.tolist() == [2, 0, 3]
+    assert codes.tolist() == [[65, 67, 0], [0, 0, 0], [65, 67, 71]]
+
+
+# pb.edit_distance
+
+def test_edit_distance_zero():
+    expect = 0
+    result = pb.edit_distance("CAGATA", "CAGATA")
+    assert result == expect
+
+
+def test_edit_distance_unequal_lengths():
+    expect = 3
+    result = pb.edit_distance("kitten", "sitting")
+    assert result == expect
+
+
+def test_edit_distance_indel():
+    expect = 2
+    result = pb.edit_distance("CAGATA", "CGATAA")
+    assert result == expect
+
+
+def test_edit_distance_empty():
+    expect = 4
+    result = pb.edit_distance("", "ACGT")
+    assert result == expect
+
+
+def test_edit_distance_ignore_case():
+    expect = 0
+    result = pb.edit_distance("acgt", "ACGT", ignore_case=True)
+    assert result == expect
+
+
+def test_edit_distance_ignore_case_ascii():
+    expect = 2
+    result = pb.edit_distance("aß", "ASS", ignore_case=True)
+    assert result == expect
+
+
+def test_edit_distance_max_distance():
+    expect = 3
+    result = pb.edit_distance("AAAAAAAA", "TTTTTTTT", max_distance=2)
+    assert result == expect
+
+
+def test_edit_distance_max_distance_lengths():
+    expect = 2
+    result = pb.edit_distance("A", "ACGTACGT", max_distance=1)
+    assert result == expect
+
+
+def test_edit_distance_long(sample_nt_sequence):
+    seq_2 = sample_nt_sequence[:30] + sample_nt_sequence[33:] + "GG"
+    expect = 5
+    result = pb.edit_distance(sample_nt_sequence, seq_2)
+    assert result == expect
+
+
+# pb.edit_distance_batch
+
+def _levenshtein(seq_1, seq_2):
+    """Reference edit distance, computed cell by cell."""
+    prev = list(range(len(seq_2) + 1))
+    for i, char_1 in enumerate(seq_1, 1):
+        cur = [i]
+        for j, char_2 in enumerate(seq_2, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1,
+                           prev[j - 1] + (char_1 != char_2)))
+        prev = cur
+    return prev[-1]
+
+
+def test_edit_distance_batch():
+    rng = np.random.RandomState(0)
+    query = "".join(rng.choice(list("ACGT"), 30))
+    targets = ["".join(rng.choice(list("ACGTN"), rng.randint(0, 80)))
+               for _ in range(50)] + [query[2:], query + "A", ""]
+    expect = [_levenshtein(query, el) for el in targets]
+    result = pb.edit_distance_batch(query, targets)
+    assert result.tolist() == expect
+
+
+def test_edit_distance_batch_max_distance():
+    targets = ["ACGTACGT", "ACGAACGT", "ACGT", "TTTTTTTT", "ACGTACGTA"]
+    expect = [0, 1, 2, 2, 1]
+    result = pb.edit_distance_batch("ACGTACGT", targets, max_distance=1)
+    assert result.tolist() == expect
+
+
+def test_edit_distance_batch_encoded():
+    targets = ["acgtacgt", "ACGAACGT"]
+    expect = [0, 1]
+    result = pb.edit_distance_batch("ACGTACGT", pb.encode_batch(targets),
+                                    ignore_case=True)
+    assert result.tolist() == expect
+
+
+def test_edit_distance_batch_ignore_case():
+    targets = ["acgTNn-", "ACGTAC", "aCGTn"]
+    expect = [pb.edit_distance("ACgtNN-", el, ignore_case=True)
+              for el in targets]
+    result = pb.edit_distance_batch("ACgtNN-", targets, ignore_case=True)
+    assert result.tolist() == expect
+
+
+def test_edit_distance_batch_long_targets(sample_nt_sequence):
+    targets = [sample_nt_sequence, sample_nt_sequence[5:]]
+    expect = [0, 5]
+    result = pb.edit_distance_batch(sample_nt_sequence, targets)
+    assert result.tolist() == expect
+
+
+def test_edit_distance_batch_empty_query():
+    expect = [0, 3]
+    result = pb.edit_distance_batch("", ["", "ACG"])
+    assert result.tolist() == expect
+
+
+# pb.pairwise_distances
+
+def test_pairwise_distances():
+    seqs = ["ACGTACGTAC", "ACGTACGTAA", "ACGAACGTAA"]
+    expect = [pb.kimura_distance(seqs[0], seqs[1]),
+              pb.kimura_distance(seqs[0], seqs[2]),
+              pb.kimura_distance(seqs[1], seqs[2])]
+    result = pb.pairwise_distances(seqs, model="kimura_distance")
+    np.testing.assert_array_almost_equal(result, expect)
+
+
+def test_pairwise_distances_parallel():
+    seqs = ["ACGTACGTAC", "ACGTACGTAA", "ACGAACGTAA", "TTTTTTTTTT"]
+    expect = pb.pairwise_distances(seqs, model="jukes_cantor_distance")
+    result = pb.pairwise_distances(seqs, model="jukes_cantor_distance",
+                                   cores=2)
+    np.testing.assert_array_equal(result, expect)
+    assert np.isnan(result[2])
+
+
+def test_pairwise_distances_error():
+    with pytest.raises(ValueError):
+        pb.pairwise_distances(["ACGT", "ACGA"], model="hamming")
+
+
+# pb.bootstrap_distances
+
+@pytest.fixture
+def sample_alignment():
+    return ["ACGTACGTAC-GTTACGGCA", "ACGTTCGTAC-GTTACGGTA",
+            "acgaacgtacagttacggca", "ACCTACGTACAGTAACGCCA",
+            "ACGTACGGACAGTTACGGCA", "NNNNNNNNNNNNNNNNNNNN"]
+
+
+@pytest.mark.parametrize("model", ["hamming_distance", "p_distance",
+                                   "jukes_cantor_distance",
+                                   "tajima_nei_distance", "kimura_distance",
+                                   "tamura_distance"])
+def test_bootstrap_distances_models(sample_alignment, model):
+    expect = pb.pairwise_distances(sample_alignment, model=model)
+    result = pb.bootstrap_distances(sample_alignment, model=model,
+                                    replicates=4, seed=1)
+    np.testing.assert_allclose(result.distances, expect)
+    assert result.replicates.shape == (4, 15)
+
+
+def test_bootstrap_distances_reproducible(sample_alignment):
+    expect = pb.bootstrap_distances(sample_alignment, replicates=25, seed=3)
+    result = pb.bootstrap_distances(sample_alignment, replicates=25, seed=3,
+                                    cores=2)
+    np.testing.assert_array_equal(result.replicates, expect.replicates)
+    assert result.seed == 3
+
+
+def test_bootstrap_distances_variance(sample_alignment):
+    boot = pb.bootstrap_distances(sample_alignment, "jukes_cantor_distance",
+                                  replicates=50, seed=0)
+    result = boot.variance
+    assert result.shape == (15, )
+    assert np.all(result[~np.isnan(result)] >= 0)
+    assert np.isnan(result[4])
+    np.testing.assert_allclose(boot.std ** 2, result)
+    assert np.nanmean(boot.replicates[:, 0]) == pytest.approx(
+        boot.distances[0], abs=0.05)
+
+
+def test_bootstrap_distances_error():
+    with pytest.raises(ValueError):
+        pb.bootstrap_distances(["ACGT", "ACG"])
+
+
+# pb.find_motifs
+
+def test_find_motifs():
+    expect = [(1, 5, "site", "+", 0), (1, 5, "site", "-", 0),
+              (5, 8, "tag", "+", 0)]
+    result = pb.find_motifs("AACGTTAGG", {"site": "ACGT", "tag": "TRG"})
+    assert result == expect
+
+
+def test_find_motifs_single_strand():
+    expect = [(2, 5, "GAT", "+", 0)]
+    result = pb.find_motifs("acgatc", ["GAT"], both_strands=False)
+    assert result == expect
+
+
+def test_find_motifs_reverse_complement():
+    expect = [(2, 5, "GAT", "-", 0)]
+    result = pb.find_motifs("ccatcc", ["GAT"])
+    assert result == expect
+
+
+def test_find_motifs_mismatches():
+    expect = [(0, 6, "ACGNNT", "+", 1), (6, 12, "ACGNNT", "+", 0)]
+    result = pb.find_motifs("ACCAATACGTTTNNNNNN", ["ACGNNT"], mismatches=1,
+                            both_strands=False)
+    assert result == expect
+
+
+def test_find_motifs_naive():
+    random.seed(5)
+    sequence = "".join([random.choice("ACGTacgtN") for _ in range(500)])
+    motifs = ["ACGTRY", "TTNAG", "GGGCC"]
+    expect = sorted([(i, i + len(motif), motif, "+", mism)
+                     for motif in motifs
+                     for i in range(len(sequence) - len(motif) + 1)
+                     for mism in [sum([1 for nt, code in
+                                       zip(sequence[i:].upper(), motif)
+                                       if nt not in pb._IUPAC_DICT[code]])]
+                     if mism <= 2])
+    result = sorted(pb.find_motifs(sequence, motifs, mismatches=2,
+                                   both_strands=False))
+    assert result == expect
+
+
+def test_find_motifs_degenerate():
+    expect = [(0, 2, "sw", "+", 0), (0, 3, "bdv", "+", 0),
+              (0, 3, "bdv", "-", 0), (1, 3, "sw", "-", 0),
+              (2, 4, "sw", "+", 0)]
+    result = pb.find_motifs("GAGT", {"sw": "SW", "bdv": "BDV"})
+    assert result == expect
+
+
+def test_find_motifs_degenerate_naive():
+    random.seed(6)
+    sequence = "".join([random.choice("ACGT") for _ in range(500)])
+    motifs = ["SWBDHV", "KMRYN", "GSWC"]
+    complement = dict(zip("ACGT", "TGCA"))
+    expect = sorted([(i, i + len(motif), motif, strand, mism)
+                     for motif in motifs
+                     for i in range(len(sequence) - len(motif) + 1)
+                     for strand, site in [
+                         ("+", sequence[i:i + len(motif)]),
+                         ("-", "".join([complement[nt] for nt in
+                                        sequence[i:i + len(motif)]])[::-1])]
+                     for mism in [sum([1 for nt, code in zip(site, motif)
+                                       if nt not in pb._IUPAC_DICT[code]])]
+                     if mism <= 1])
+    result = sorted(pb.find_motifs(sequence, motifs, mismatches=1))
+    assert result == expect
+
+
+def test_find_motifs_error():
+    with pytest.raises(ValueError):
+        pb.find_motifs("ACGT", ["ACGX"])
+    with pytest.raises(ValueError):
+        pb.find_motifs("ACGT", ["AC"], mismatches=2)
+
+
+# pb.find_motifs_fasta
+
+def test_find_motifs_fasta(sample_fasta_file):
+    expect = [("seq_1 first", 0, 4, "ACGT", "+", 0),
+              ("seq_1 first", 4, 8, "ACGT", "+", 0),
+              ("seq_3", 0, 4, "ACGT", "+", 0)]
+    result = list(pb.find_motifs_fasta(sample_fasta_file, ["ACGT"],
+                                       both_strands=False))
+    assert result == expect
+
+
+def test_find_motifs_fasta_records():
+    expect = [("b", 1, 4, "m", "+", 0), ("b", 2, 5, "m", "-", 0)]
+    result = list(pb.find_motifs_fasta([("a", "TTTT"), ("b", "GCATGC")],
+                                       {"m": "CAT"}))
+    assert result == expect
+
+
+# pb.find_orfs
+
+def test_find_orfs():
+    expect = [(2, 14, "+", 2, 12)]
+    result = pb.find_orfs("CCATGAAACCCTAGCC", min_length=0).tolist()
+    assert result == expect
+
+
+def test_find_orfs_reverse():
+    expect = [(2, 14, "-", 2, 12)]
+    result = pb.find_orfs("GGCTAGGGTTTCATGG", min_length=0).tolist()
+    assert result == expect
+
+
+def test_find_orfs_longest():
+    expect = [(0, 12, "+", 0, 12)]
+    result = pb.find_orfs("ATGATGAAATAA", min_length=0).tolist()
+    assert result == expect
+
+
+def test_find_orfs_starts():
+    sequence = "GTGAAAATGCCCTGA"
+    expect = [(6, 15, "+", 0, 9)]
+    result = pb.find_orfs(sequence, min_length=0).tolist()
+    assert result == expect
+    expect = [(0, 15, "+", 0, 15)]
+    result = pb.find_orfs(sequence, min_length=0,
+                          starts=["ATG", "GTG"]).tolist()
+    assert result == expect
+
+
+def test_find_orfs_min_length():
+    expect = 0
+    result = pb.find_orfs("ATGAAATAA", min_length=10)
+    assert result.shape[0] == expect
+    assert result.dtype.names == ("start", "end", "strand", "frame",
+                                  "length")
+
+
+def test_find_orfs_no_stop():
+    expect = 0
+    result = pb.find_orfs("ATGAAAAAAAAANNNTA", min_length=0)
+    assert result.shape[0] == expect
+
+
+def test_find_orfs_error():
+    with pytest.raises(ValueError):
+        pb.find_orfs("ATGAAATAA", starts=["AT"])
+
+
+# pb.find_orfs_fasta
+
+def test_find_orfs_fasta(tmp_path):
+    path = tmp_path / "orfs.fasta"
+    path.write_text(">a\nCCATGAAA\nCCCTAGCC\n>b\nAAAA\n")
+    result = list(pb.find_orfs_fasta(str(path), min_length=0))
+    assert [el[0] for el in result] == ["a", "b"]
+    assert result[0][1].tolist() == [(2, 14, "+", 2, 12)]
+    assert result[1][1].shape[0] == 0
+
+
+def test_find_orfs_fasta_parallel():
+    records = [("a", "CCATGAAACCCTAGCC"), ("b", "GGCTAGGGTTTCATGG")]
+    expect = [(name, orfs.tolist()) for name, orfs
+              in pb.find_orfs_fasta(records, min_length=0)]
+    result = [(name, orfs.tolist()) for name, orfs
+              in pb.find_orfs_fasta(records, min_length=0, cores=2)]
+    assert result == expect
+
+
+# pb.build_fasta_index
+
+@pytest.fixture
+def sample_wrapped_fasta(tmp_path) -> str:
+    """Return the path of a FASTA file with wrapped lines."""
+    path = tmp_path / "wrapped.fasta"
+    path.write_bytes(b">chr1 first\nACGTA\nCGTAC\nGT\n>chr2\nAAAA\r\nCC\r\n"
+                     b">empty\n")
+    return str(path)
+
+
+def test_build_fasta_index(sample_wrapped_fasta):
+    expect = "chr1\t12\t12\t5\t6\nchr2\t6\t33\t4\t6\nempty\t0\t50\t0\t0\n"
+    result = pb.build_fasta_index(sample_wrapped_fasta)
+    assert result == sample_wrapped_fasta + ".fai"
+    with open(result) as f:
+        assert f.read() == expect
+
+
+def test_build_fasta_index_error(tmp_path):
+    path = tmp_path / "irregular.fasta"
+    path.write_text(">a\nACG\nAC\nACG\n")
+    with pytest.raises(ValueError):
+        pb.build_fasta_index(str(path))
+    with pytest.raises(ValueError):
+        pb.build_fasta_index(str(path) + ".gz")
+
+
+# pb.read_fasta_index
+
+def test_read_fasta_index(sample_wrapped_fasta):
+    expect = {"chr1": (12, 12, 5, 6), "chr2": (6, 33, 4, 6),
+              "empty": (0, 50, 0, 0)}
+    result = pb.read_fasta_index(pb.build_fasta_index(sample_wrapped_fasta))
+    assert result == expect
+
+
+# pb.faidx
+
+def test_faidx(sample_wrapped_fasta):
+    with pb.faidx(sample_wrapped_fasta) as fa:
+        assert fa.names == ["chr1", "chr2", "empty"]
+        assert "chr2" in fa
+        assert fa.fetch("chr1") == "ACGTACGTACGT"
+        assert fa.fetch("chr1", 3, 11) == "TACGTACG"
+        assert fa.fetch("chr1", 10, 100) == "GT"
+        assert fa.fetch("chr2", 2, 5) == "AAC"
+        assert fa.fetch("empty") == ""
+
+
+def test_faidx_cache(sample_wrapped_fasta):
+    fa = pb.faidx(sample_wrapped_fasta, cache_size=6)
+    fa.block_size = 3
+    expect = "GTACGTAC"
+    result = fa.fetch("chr1", 2, 10)
+    assert result == expect
+    assert fa.fetch("chr1", 0, 3) == "ACG"
+    assert fa.cached_bytes <= 6
+    fa.close()
+    assert fa.cached_bytes == 0
+
+
+def test_faidx_existing_index(sample_wrapped_fasta):
+    with open(sample_wrapped_fasta + ".fai", "w") as f:
+        f.write("chr2\t6\t33\t4\t6\n")
+    os.utime(sample_wrapped_fasta, (0, 0))
+    expect = ["chr2"]
+    result = pb.faidx(sample_wrapped_fasta).names
+    assert result == expect
+    result = pb.faidx(sample_wrapped_fasta, rebuild=True).names
+    assert len(result) == 3
+
+
+def test_faidx_error(sample_wrapped_fasta):
+    fa = pb.faidx(sample_wrapped_fasta)
+    with pytest.raises(ValueError):
+        fa.fetch("chr3")
+    with pytest.raises(ValueError):
+        fa.fetch("chr1", 5, 2)
+
+
+# pb.write_2bit
+
+def test_write_2bit(tmp_path):
+    expect = struct.pack("<4I", 0x1A412743, 0, 1, 0) + b"\x01a" \
+        + struct.pack("<I", 22) + struct.pack("<8I", 5, 1, 4, 1, 1, 4, 1, 0) \
+        + bytes([0b10011100, 0])
+    path = pb.write_2bit([("a", "ACGTn")], str(tmp_path / "a.2bit"))
+    with open(path, "rb") as f:
+        result = f.read()
+    assert result == expect
+
+
+def test_write_2bit_fasta(sample_fasta_file, tmp_path):
+    path = pb.write_2bit(sample_fasta_file, str(tmp_path / "sample.2bit"))
+    expect = ["seq_1", "seq_2", "seq_3"]
+    result = pb.read_2bit(path).names
+    assert result == expect
+
+
+def test_write_2bit_error(tmp_path):
+    with pytest.raises(ValueError):
+        pb.write_2bit([("a", "ACGT"), ("a", "ACGT")],
+                      str(tmp_path / "a.2bit"))
+
+
+# pb.read_2bit
+
+def test_read_2bit(tmp_path):
+    sequence = "NNacgtACGTTTnnGGCA"
+    path = pb.write_2bit([("chr1", sequence), ("chr2", "")],
+                         str(tmp_path / "a.2bit"))
+    with pb.read_2bit(path) as genome:
+        assert genome.lengths == {"chr1": 18, "chr2": 0}
+        assert genome.fetch("chr1") == sequence
+        assert genome.fetch("chr2") == ""
+        for start in range(len(sequence)):
+            for end in range(start, len(sequence) + 2):
+                assert genome.fetch("chr1", start, end) \
+                    == sequence[start:end]
+
+
+def test_read_2bit_encoded(tmp_path):
+    sequence = "NNacgtACGTTTnnGGCA"
+    path = pb.write_2bit([("chr1", sequence)], str(tmp_path / "a.2bit"))
+    genome = pb.read_2bit(path)
+    expect = pb.encode_sequence(sequence[1:15])
+    result = genome.fetch("chr1", 1, 15, encoded=True)
+    np.testing.assert_array_equal(result, expect)
+    assert pb.nt_frequency(result) == pb.nt_frequency(sequence[1:15])
+
+
+def test_read_2bit_big_endian(tmp_path):
+    path = tmp_path / "big.2bit"
+    path.write_bytes(struct.pack(">4I", 0x1A412743, 0, 1, 0) + b"\x01a"
+                     + struct.pack(">I", 22)
+                     + struct.pack(">8I", 5, 1, 4, 1, 1, 0, 2, 0)
+                     + bytes([0b10011100, 0]))
+    expect = "acGTN"
+    result = pb.read_2bit(str(path)).fetch("a")
+    assert result == expect
+
+
+def test_read_2bit_error(tmp_path, sample_fasta_file):
+    with pytest.raises(ValueError):
+        pb.read_2bit(sample_fasta_file)
+    path = pb.write_2bit([("a", "ACGT")], str(tmp_path / "a.2bit"))
+    genome = pb.read_2bit(path)
+    with pytest.raises(ValueError):
+        genome.fetch("b")
+    with pytest.raises(ValueError):
+        genome.fetch("a", 3, 1)
+
+
+# pb.find_pairs_within
+
+def test_find_pairs_within():
+    sequences = ["ACGTACGT", "ACGTACGA", "TCGTACGA", "ACGTAC", "ACGTAG",
+                 "ACGTACGT"]
+    expect = [[0, 1, 0, 0, 0, 0],
+              [1, 0, 1, 0, 0, 1],
+              [0, 1, 0, 0, 0, 0],
+              [0, 0, 0, 0, 1, 0],
+              [0, 0, 0, 1, 0, 0],
+              [0, 1, 0, 0, 0, 0]]
+    result = pb.find_pairs_within(sequences, 1)
+    np.testing.assert_array_equal(result.toarray(), expect)
+    assert result.nnz == 10
+
+
+def test_find_pairs_within_naive():
+    random.seed(3)
+    base = pb.random_sequence(12)
+    sequences = [pb.mutate_sequence(base, random.randint(1, 4))
+                 for _ in range(60)]
+    sequences[5] = sequences[5][:4] + "-" + sequences[5][5:]
+    result = pb.find_pairs_within(sequences, 3).toarray()
+    for i in range(len(sequences)):
+        for j in range(len(sequences)):
+            distance = pb.hamming_distance(sequences[i], sequences[j])
+            expect = distance if i != j and distance <= 3 else 0
+            assert result[i, j] == expect
+
+
+def test_find_pairs_within_ignore_case():
+    expect = 2
+    result = pb.find_pairs_within(["acgt", "ACGA"], 1, ignore_case=True).nnz
+    assert result == expect
+
+
+def test_find_pairs_within_error():
+    with pytest.raises(ValueError):
+        pb.find_pairs_within(["ACGT", "ACGA"], -1)
@@ -72,6 +72,26 @@ def test_cli_hamming_distance_ignore_case_short():
     assert result.output.strip() == expect
 
 
+# edit-distance
+
+def test_cli_edit_distance():
+    runner = CliRunner()
+    expect = "2"
+    result = runner.invoke(cli.main, ["bioinf", "edit-distance",
+                                      "CAGATA", "CGATAA"])
+    assert result.exit_code == 0
+    assert result.output.strip() == expect
+
+
+def test_cli_edit_distance_max_distance():
+    runner = CliRunner()
+    expect = "2"
+    result = runner.invoke(cli.main, ["bioinf", "edit-distance",
+                                      "CAGATA", "GTCTAT", "-m", "1"])
+    assert result.exit_code == 0
+    assert result.output.strip() == expect
+
+
 # reverse-complement
 
 def test_cli_reverse_complement():
@@ -242,3 +262,30 @@ def test_cli_tamura_distance(sample_nt_long_1, sample_nt_long_2):
                                       sample_nt_long_1, sample_nt_long_2])
     assert result.exit_code == 0
     assert result.output.strip() == expect
+
+
+# find-motifs
+
+def test_cli_find_motifs(sample_fasta_file):
+    runner = CliRunner()
+    expect = "seq_1 first\t0\t4\tACGT\t+\t0\n" \
+             "seq_1 first\t0\t4\tACGT\t-\t0\n" \
+             "seq_1 first\t4\t8\tACGT\t+\t0\n" \
+             "seq_1 first\t4\t8\tACGT\t-\t0\n" \
+             "seq_3\t0\t4\tACGT\t+\t0\n" \
+             "seq_3\t0\t4\tACGT\t-\t0\n"
+    result = runner.invoke(cli.main, ["bioinf", "find-motifs",
+                                      sample_fasta_file, "ACGT"])
+    assert result.exit_code == 0
+    assert result.output == expect
+
+
+def test_cli_find_motifs_mismatches(sample_fasta_file):
+    runner = CliRunner()
+    expect = "".join(["seq_2\t{}\t{}\tAAAT\t+\t1\n".format(i, i + 4)
+                      for i in range(5)])
+    result = runner.invoke(cli.main, ["bioinf", "find-motifs",
+                                      sample_fasta_file, "AAAT", "-m", "1",
+                                      "-s"])
+    assert result.exit_code == 0
+    assert result.output == expect
@@ -55,6 +55,15 @@ def test_cli_prime_factors_large():
     assert result.output.strip() == expect
 
 
+def test_cli_prime_factors_semiprime():
+    runner = CliRunner()
+    expect = "[4294967279, 4294967291]"
+    result = runner.invoke(cli.main, ["misc", "prime-factors",
+                                      "18446743979220271189"])
+    assert result.exit_code == 0
+    assert result.output.strip() == expect
+
+
 # pm.wordcount
 
 def test_cli_wordcount():
@@ -125,6 +134,24 @@ def test_cli_wordcount_specific_word_ignore_case_false():
     assert result.output.strip() == expect
 
 
+def test_cli_wordcount_file():
+    runner = CliRunner()
+    expect = {"same": 1}
+    result = runner.invoke(cli.main, ["misc", "wordcount", SAME1, "--file"])
+    assert result.exit_code == 0
+    assert eval(result.output.strip()) == expect
+
+
+def test_cli_wordcount_stdin_top():
+    runner = CliRunner()
+    expect = [("word", 3), ("test", 2)]
+    result = runner.invoke(cli.main, ["misc", "wordcount", "-", "--file",
+                                      "--top", "2"],
+                           input="word test word\ntest word wordcount\n")
+    assert result.exit_code == 0
+    assert eval(result.output.strip()) == expect
+
+
 # pm.equal_files
 
 def test_cli_equal_files():
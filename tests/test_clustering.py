@@ -1,9 +1,14 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 # Created by Roberto Preste
+import re
 import pytest
 import prestools.clustering as pc
 import numpy as np
+import pandas as pd
+import scipy.cluster.hierarchy as sch
+import scipy.sparse as sps
+import scipy.spatial.distance as ssd
 
 
 # pc.hierarchical_clustering
@@ -61,3 +66,239 @@ def test_find_n_clusters_elbow_sample_df(sample_corr_df):
     assert result == expect
 
 
+
+
+def _newick_distances(newick):
+    """Return the path lengths between the leaves of a Newick tree."""
+    tokens = re.findall(r"[(),;]|:[^,();]+|'[^']*'|[^(),;:]+", newick)
+    edges, stack, leaves, next_id = [], [], [], 0
+    for token in tokens:
+        if token == "(":
+            stack.append("n{}".format(next_id))
+            next_id += 1
+        elif token == ")":
+            node = stack.pop()
+            if stack:
+                edges.append([stack[-1], node, 0.0])
+        elif token.startswith(":"):
+            edges[-1][2] = float(token[1:])
+        elif token not in ",;":
+            leaves.append(token.strip("'"))
+            edges.append([stack[-1], leaves[-1], 0.0])
+    graph = {}
+    for a, b, length in edges:
+        graph.setdefault(a, []).append((b, length))
+        graph.setdefault(b, []).append((a, length))
+    result = {}
+    for leaf in leaves:
+        dist, todo = {leaf: 0.0}, [leaf]
+        while todo:
+            node = todo.pop()
+            for other, length in graph[node]:
+                if other not in dist:
+                    dist[other] = dist[node] + length
+                    todo.append(other)
+        result[leaf] = dist
+    return result
+
+
+@pytest.fixture
+def additive_distances():
+    """Return the path lengths between the leaves of the tree
+    ((a:1,b:2):1,c:3,(d:1,e:1):2)."""
+    labels = ["a", "b", "c", "d", "e"]
+    df = pd.DataFrame([[0, 3, 5, 5, 5],
+                       [3, 0, 6, 6, 6],
+                       [5, 6, 0, 6, 6],
+                       [5, 6, 6, 0, 2],
+                       [5, 6, 6, 2, 0]], index=labels, columns=labels,
+                      dtype=float)
+    return df
+
+
+# pc.linkage_to_newick
+
+def test_linkage_to_newick():
+    linkage = sch.linkage(ssd.pdist(np.array([[0.], [1.], [5.]])),
+                          method="average")
+    expect = "(2:2.25,(0:0.5,1:0.5):1.75);"
+    result = pc.linkage_to_newick(linkage)
+    assert result == expect
+
+
+def test_linkage_to_newick_hiercluster(sample_corr_df):
+    cl = pc.hierarchical_clustering(sample_corr_df)
+    result = pc.linkage_to_newick(cl, labels=list(sample_corr_df.index))
+    assert result.count("(") == 4
+    assert all(el in result for el in sample_corr_df.index)
+
+
+def test_linkage_to_newick_deep():
+    n = 5000
+    linkage = np.array([[0 if i == 0 else n + i - 1, i + 1, i + 1, i + 2]
+                        for i in range(n - 1)], dtype=float)
+    result = pc.linkage_to_newick(linkage)
+    assert result.count("(") == n - 1
+
+
+def test_linkage_to_newick_error():
+    with pytest.raises(ValueError):
+        pc.linkage_to_newick(np.array([[0, 1, 1., 2]]), labels=["a"])
+
+
+# pc.upgma
+
+def test_upgma(additive_distances):
+    result = _newick_distances(pc.upgma(additive_distances))
+    assert result["d"]["e"] == pytest.approx(2)
+    assert result["a"]["b"] == pytest.approx(3)
+    assert result["a"]["e"] == result["c"]["e"]
+
+
+def test_upgma_condensed_labels():
+    expect = "(c:2.125,('a b':0.5,b:0.5):1.625);"
+    result = pc.upgma(np.array([1., 4.5, 4.]), labels=["a b", "b", "c"])
+    assert result == expect
+
+
+def test_upgma_single():
+    expect = "a;"
+    result = pc.upgma(np.zeros(0), labels=["a"])
+    assert result == expect
+
+
+def test_upgma_error():
+    with pytest.raises(ValueError):
+        pc.upgma(np.array([1., 2.]))
+
+
+# pc.neighbor_joining
+
+@pytest.mark.parametrize("method", ["rapid", "canonical"])
+def test_neighbor_joining_additive(additive_distances, method):
+    result = _newick_distances(pc.neighbor_joining(additive_distances,
+                                                   method=method))
+    for i in additive_distances.index:
+        for j in additive_distances.columns:
+            assert result[i][j] == pytest.approx(additive_distances.loc[i,
+                                                                        j])
+
+
+def test_neighbor_joining_methods():
+    distances = ssd.pdist(np.random.RandomState(0).rand(60, 4))
+    expect = pc.neighbor_joining(distances, method="canonical")
+    result = pc.neighbor_joining(distances, method="rapid")
+    assert result == expect
+
+
+def test_neighbor_joining_two():
+    expect = "(0:1.5,1:1.5);"
+    result = pc.neighbor_joining(np.array([3.]))
+    assert result == expect
+
+
+def test_neighbor_joining_error(additive_distances):
+    with pytest.raises(ValueError):
+        pc.neighbor_joining(additive_distances, method="fast")
+
+
+# pc.clade_support
+
+@pytest.fixture
+def grouped_distances():
+    """Return the distances of three well separated pairs of taxa and
+    replicates where the third pair is only recovered half of the times."""
+    points = np.array([[0, 0], [0, 1], [10, 0], [10, 1], [5, 10], [5, 11]],
+                      dtype=float)
+    distances = ssd.pdist(points)
+    swapped = ssd.pdist(points[[0, 1, 2, 4, 3, 5]])
+    replicates = np.array([distances, distances, swapped, swapped])
+    return distances, replicates
+
+
+@pytest.mark.parametrize("tree", ["neighbor_joining", "upgma"])
+def test_clade_support(grouped_distances, tree):
+    distances, replicates = grouped_distances
+    result = pc.clade_support(distances, replicates,
+                              labels=list("aAbBcC"), tree=tree)
+    assert re.search(r"\(a:[^,]+,A:[^)]+\)100:", result)
+    assert re.search(r"\([bc]:[^,]+,[BC]:[^)]+\)50:", result)
+
+
+def test_clade_support_nan(grouped_distances):
+    distances, replicates = grouped_distances
+    replicates = replicates.copy()
+    replicates[2:, 0] = np.nan
+    result = pc.clade_support(distances, replicates, labels=list("aAbBcC"),
+                              tree="upgma")
+    assert set(re.findall(r"\)(\d+):", result)) == {"100"}
+
+
+def test_clade_support_error(grouped_distances):
+    distances, replicates = grouped_distances
+    with pytest.raises(ValueError):
+        pc.clade_support(distances, replicates, tree="single")
+    with pytest.raises(ValueError):
+        pc.clade_support(distances, replicates[:, 1:])
+
+
+# pc.single_linkage_clusters
+
+def test_single_linkage_clusters():
+    neighbors = sps.csr_matrix((np.zeros(4), ([1, 3, 4, 5], [3, 1, 5, 4])),
+                               shape=(6, 6))
+    expect = [0, 1, 2, 1, 3, 3]
+    result = pc.single_linkage_clusters(neighbors)
+    np.testing.assert_array_equal(result, expect)
+
+
+# pc.greedy_clustering
+
+def test_greedy_clustering():
+    sequences = ["ACGTACGTAC", "acgtacgtac", "ACGTACGTACGT", "TTTTGGGGCC",
+                 "ACGTACGAACGT", "TTTTGGGGCA"]
+    expect_reps = [2, 3]
+    expect_labels = [0, 0, 0, 1, 0, 1]
+    reps, labels = pc.greedy_clustering(sequences, identity=0.8, k=3)
+    np.testing.assert_array_equal(reps, expect_reps)
+    np.testing.assert_array_equal(labels, expect_labels)
+
+
+def test_greedy_clustering_p_distance():
+    sequences = ["ACGTACGTAC", "ACGTACGTACGT", "ACGTACGAACGT", "ACGTACGTAA"]
+    expect_reps = [1, 0]
+    expect_labels = [1, 0, 0, 1]
+    reps, labels = pc.greedy_clustering(sequences, identity=0.9,
+                                        distance="p_distance", k=3)
+    np.testing.assert_array_equal(reps, expect_reps)
+    np.testing.assert_array_equal(labels, expect_labels)
+
+
+def test_greedy_clustering_duplicates():
+    sequences = ["ACGT", "AAAA", "acgt", "ACGA", "AAAA", "AAAA"]
+    expect_reps = [1, 0, 3]
+    expect_labels = [1, 0, 1, 2, 0, 0]
+    reps, labels = pc.greedy_clustering(sequences, identity=1)
+    np.testing.assert_array_equal(reps, expect_reps)
+    np.testing.assert_array_equal(labels, expect_labels)
+
+
+@pytest.mark.parametrize("batch_size,cores", [(1, 1), (2, 1), (256, 1),
+                                              (2, 2)])
+def test_greedy_clustering_batches(batch_size, cores):
+    # the last sequence is within the threshold of the second and third
+    sequences = ["GGGTATGTCGACCCTCTTCG", "GAGTATGCCGAGCCTCTTCT",
+                 "GGATATGCCGAGCCTCTTCG", "GCGTATGCCGAGCCTCTTCG"]
+    expect_reps = [0, 1, 2]
+    expect_labels = [0, 1, 2, 1]
+    reps, labels = pc.greedy_clustering(sequences, identity=0.9, k=3,
+                                        batch_size=batch_size, cores=cores)
+    np.testing.assert_array_equal(reps, expect_reps)
+    np.testing.assert_array_equal(labels, expect_labels)
+
+
+def test_greedy_clustering_error():
+    with pytest.raises(ValueError):
+        pc.greedy_clustering(["ACGT"], distance="hamming")
+    with pytest.raises(ValueError):
+        pc.greedy_clustering(["ACGT"], identity=0)
@@ -1,10 +1,18 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 # Created by Roberto Preste
+import os
 import pytest
+from xml.etree import ElementTree
 import numpy as np
+import pandas as pd
+import scipy.sparse as sps
+import scipy.cluster.hierarchy as sch
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from numpy.testing import assert_array_almost_equal
 import prestools.graph as pg
+import prestools.clustering as pc
 
 
 # pg.plot_heatmap_dendrogram
@@ -21,6 +29,122 @@ def test_plot_heatmap_dendrogram_one_entry_df(sample_one_entry_df):
     assert result == expect
 
 
+def test_plot_heatmap_dendrogram_headless(sample_corr_df, tmp_path):
+    out = str(tmp_path / "heatmap.png")
+    plt.close("all")
+    result = pg.plot_heatmap_dendrogram(sample_corr_df, save=out, show=False)
+    assert isinstance(result, Figure)
+    assert plt.get_fignums() == []
+    assert os.path.getsize(out) > 0
+
+
+def test_plot_heatmap_dendrogram_precomputed_linkage(sample_corr_df):
+    cl = pc.hierarchical_clustering(sample_corr_df)
+    result = pg.plot_heatmap_dendrogram(sample_corr_df, show=False,
+                                        row_linkage=cl,
+                                        col_linkage=cl.linkage)
+    assert isinstance(result, Figure)
+
+
+def test_plot_heatmap_dendrogram_aggregate():
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame(rng.randn(50, 60)).corr()
+    result = pg.plot_heatmap_dendrogram(df, show=False, max_display=10)
+    heatmap_ax = max(result.axes, key=lambda ax: len(ax.get_yticklabels()))
+    assert len(heatmap_ax.get_yticklabels()) <= 10
+    assert len(heatmap_ax.texts) == len(heatmap_ax.get_yticklabels()) ** 2
+
+
+def test_plot_heatmap_dendrogram_no_annot_large():
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame(rng.randn(50, 30)).corr()
+    result = pg.plot_heatmap_dendrogram(df, show=False)
+    assert all(len(ax.texts) == 0 for ax in result.axes)
+
+
+# pg._aggregate_by_linkage
+
+def test_aggregate_by_linkage():
+    df = pd.DataFrame([[0.0, 1.0], [0.1, 1.1], [5.0, 6.0], [5.2, 6.2]],
+                      index=["a", "b", "c", "d"])
+    Z = sch.linkage(df, method="average")
+    result = pg._aggregate_by_linkage(df, Z, 2)
+    assert list(result.index) == ["a (+1)", "c (+1)"]
+    assert np.allclose(result.to_numpy(), [[0.05, 1.05], [5.1, 6.1]])
+
+
+# pg.plot_dendrogram
+
+def test_plot_dendrogram_empty_df(sample_empty_df):
+    expect = False
+    result = pg.plot_dendrogram(sample_empty_df)
+    assert result == expect
+
+
+def test_plot_dendrogram_headless(sample_corr_df, tmp_path):
+    out = str(tmp_path / "dendrogram.png")
+    plt.close("all")
+    result = pg.plot_dendrogram(sample_corr_df, cut_off=1.5, save=out,
+                                show=False)
+    assert isinstance(result, Figure)
+    assert plt.get_fignums() == []
+    assert os.path.getsize(out) > 0
+
+
+def test_plot_dendrogram_hiercluster(sample_corr_df):
+    cl = pc.hierarchical_clustering(sample_corr_df)
+    result = pg.plot_dendrogram(cl, labels=list(sample_corr_df.columns),
+                                show=False)
+    labels = [el.get_text() for el in result.axes[0].get_yticklabels()]
+    assert sorted(labels) == sorted(sample_corr_df.columns)
+
+
+def test_plot_dendrogram_truncate(sample_corr_df):
+    cl = pc.hierarchical_clustering(sample_corr_df)
+    result = pg.plot_dendrogram(sample_corr_df, linkage=cl.linkage,
+                                truncate_mode="lastp", p=2, show=False)
+    assert len(result.axes[0].get_yticklabels()) == 2
+
+
+def test_plot_dendrogram_error():
+    with pytest.raises(ValueError):
+        pg.plot_dendrogram(None, show=False)
+
+
+# pg.save_dendrogram
+
+def test_dendrogram_segments():
+    Z = sch.linkage(np.random.RandomState(0).rand(20, 3), method="ward")
+    segments, order = pg._dendrogram_segments(Z)
+    expect = sch.dendrogram(Z, no_plot=True)
+    assert list(order) == expect["leaves"]
+    result = {tuple(np.round(np.concatenate(el.T), 6)) for el in segments}
+    expect = {tuple(np.round(np.concatenate(el), 6))
+              for el in zip(expect["icoord"], expect["dcoord"])}
+    assert result == expect
+
+
+def test_save_dendrogram_svg(sample_corr_df, tmp_path):
+    out = str(tmp_path / "dendrogram.svg")
+    cl = pc.hierarchical_clustering(sample_corr_df)
+    result = pg.save_dendrogram(cl, out, labels=list(sample_corr_df.columns))
+    assert result == out
+    root = ElementTree.parse(out).getroot()
+    ns = "{http://www.w3.org/2000/svg}"
+    assert len(root.findall(".//{}path".format(ns))) == 4
+    assert len(root.findall(".//{}text".format(ns))) == 6
+
+
+def test_save_dendrogram_png(sample_corr_df, tmp_path):
+    out = str(tmp_path / "dendrogram.png")
+    plt.close("all")
+    cl = pc.hierarchical_clustering(sample_corr_df)
+    result = pg.save_dendrogram(cl.linkage, out)
+    assert result == out
+    assert plt.get_fignums() == []
+    assert os.path.getsize(out) > 0
+
+
 # pg.flatten_image
 
 def test_flatten_image(sample_image_array):
@@ -45,6 +169,70 @@ def test_flatten_image_scale(sample_image_array):
     assert_array_almost_equal(result, expect)
 
 
+def test_flatten_image_view(sample_image_array):
+    result = pg.flatten_image(sample_image_array)
+    assert np.shares_memory(result, sample_image_array)
+
+
+def test_flatten_image_grayscale_out():
+    img = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    out = np.empty((12, 1), dtype=np.float32)
+    result = pg.flatten_image(img, scale=True, out=out)
+    assert result is out
+    assert_array_almost_equal(result, np.arange(12).reshape(12, 1) / 255)
+
+
+# pg.flatten_images
+
+def test_flatten_images():
+    imgs = np.arange(2 * 3 * 2 * 4, dtype=np.uint8).reshape(2, 3, 2, 4)
+    result = pg.flatten_images(imgs)
+    assert result.shape == (2, 24)
+    assert np.shares_memory(result, imgs)
+    assert_array_almost_equal(result[1], imgs[1].ravel())
+
+
+def test_flatten_images_scale():
+    imgs = np.full((3, 2, 2), 51, dtype=np.uint8)
+    result = pg.flatten_images(imgs, scale=True)
+    assert result.dtype == np.float32
+    assert_array_almost_equal(result, np.full((3, 4), 0.2))
+
+
+def test_flatten_images_out():
+    imgs = np.full((3, 2, 2, 5), 255, dtype=np.uint8)
+    out = np.zeros((3, 20), dtype=np.float32)
+    result = pg.flatten_images(imgs, scale=True, out=out)
+    assert result is out
+    assert_array_almost_equal(out, np.ones((3, 20)))
+
+
+def test_flatten_images_out_error():
+    imgs = np.zeros((3, 2, 2), dtype=np.uint8)
+    with pytest.raises(ValueError):
+        pg.flatten_images(imgs, scale=True, out=np.zeros((3, 3)))
+
+
+# pg.iter_flatten_images
+
+def test_iter_flatten_images(tmp_path):
+    imgs = np.random.RandomState(0).randint(0, 256, (10, 4, 4, 3),
+                                            dtype=np.uint8)
+    path = str(tmp_path / "imgs.npy")
+    np.save(path, imgs)
+    result = [batch.copy() for batch
+              in pg.iter_flatten_images(path, batch_size=4, scale=True)]
+    assert [el.shape[0] for el in result] == [4, 4, 2]
+    assert_array_almost_equal(np.concatenate(result),
+                              imgs.reshape(10, -1) / 255)
+
+
+def test_iter_flatten_images_array():
+    imgs = np.zeros((5, 2, 2), dtype=np.uint8)
+    result = list(pg.iter_flatten_images(imgs, batch_size=2))
+    assert all(np.shares_memory(el, imgs) for el in result)
+
+
 # pg.plot_confusion_matrix
 
 def test_plot_confusion_matrix_empty_cm():
@@ -52,3 +240,101 @@ def test_plot_confusion_matrix_empty_cm():
     expect = False
     result = pg.plot_confusion_matrix(cm, ["0", "1"])
     assert result == expect
+
+
+def test_plot_confusion_matrix_headless(tmp_path):
+    cm = np.array([[5, 1], [2, 7]])
+    out = str(tmp_path / "cm.png")
+    plt.close("all")
+    result = pg.plot_confusion_matrix(cm, ["0", "1"], save=out, show=False)
+    assert isinstance(result, Figure)
+    assert len(result.axes[0].collections[0].get_paths()) == 4
+    assert plt.get_fignums() == []
+    assert os.path.getsize(out) > 0
+
+
+def test_plot_confusion_matrix_large(tmp_path):
+    cm = np.zeros((100, 100), dtype=int)
+    cm[np.arange(100), np.arange(100)] = 10
+    cm[0, 1] = 3
+    result = pg.plot_confusion_matrix(cm, [str(i) for i in range(100)],
+                                      show=False)
+    assert len(result.axes[0].collections[0].get_paths()) == 101
+
+
+def test_plot_confusion_matrix_skip_annotations():
+    cm = np.ones((60, 60), dtype=int)
+    result = pg.plot_confusion_matrix(cm, [str(i) for i in range(60)],
+                                      show=False)
+    assert len(result.axes[0].collections) == 0
+
+
+def test_plot_confusion_matrix_sparse():
+    cm = sps.csr_matrix(np.array([[5, 0], [2, 7]]))
+    result = pg.plot_confusion_matrix(cm, ["0", "1"], normalize=True,
+                                      show=False)
+    assert len(result.axes[0].collections[0].get_paths()) == 3
+    assert "Accuracy=0.8571" in result.axes[0].get_xlabel()
+
+
+# pg.confusion_matrix
+
+def test_confusion_matrix():
+    expect = np.array([[1, 1, 0], [0, 2, 0], [1, 0, 1]])
+    result = pg.confusion_matrix(np.array([0, 0, 1, 1, 2, 2]),
+                                 np.array([0, 1, 1, 1, 0, 2]))
+    assert np.array_equal(result, expect)
+
+
+def test_confusion_matrix_n_classes_sparse():
+    expect = np.array([[1, 1, 0, 0], [0, 2, 0, 0], [1, 0, 1, 0],
+                       [0, 0, 0, 0]])
+    result = pg.confusion_matrix([0, 0, 1, 1, 2, 2], [0, 1, 1, 1, 0, 2],
+                                 n_classes=4, sparse=True)
+    assert sps.issparse(result)
+    assert np.array_equal(result.toarray(), expect)
+
+
+def test_confusion_matrix_string_labels():
+    expect = np.array([[1, 1], [0, 1]])
+    result = pg.confusion_matrix(["cat", "cat", "dog"],
+                                 ["cat", "dog", "dog"])
+    assert np.array_equal(result, expect)
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_confusion_matrix_error(sparse):
+    with pytest.raises(ValueError):
+        pg.confusion_matrix([0], [2], n_classes=2, sparse=sparse)
+    with pytest.raises(ValueError):
+        pg.confusion_matrix([2], [0], n_classes=2, sparse=sparse)
+    with pytest.raises(ValueError):
+        pg.confusion_matrix([-1, 0], [0, 1], sparse=sparse)
+
+
+# pg.render_plots
+
+def test_render_plots(sample_corr_df, tmp_path):
+    out_1 = str(tmp_path / "dendrogram.png")
+    out_2 = str(tmp_path / "cm.png")
+    expect = [out_1, out_2]
+    result = pg.render_plots([
+        (pg.plot_dendrogram, {"df": sample_corr_df, "save": out_1}),
+        (pg.plot_confusion_matrix, {"cm": np.array([[5, 1], [2, 7]]),
+                                    "class_names": ["0", "1"],
+                                    "save": out_2})
+    ], cores=2)
+    assert result == expect
+    assert os.path.getsize(out_1) > 0
+    assert os.path.getsize(out_2) > 0
+
+
+def test_render_plots_show(sample_corr_df, tmp_path):
+    out = str(tmp_path / "dendrogram.png")
+    expect = [out]
+    result = pg.render_plots([(pg.plot_dendrogram, {"df": sample_corr_df,
+                                                    "save": out,
+                                                    "show": True})],
+                             cores=1)
+    assert result == expect
+    assert os.path.getsize(out) > 0
@@ -1,8 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 # Created by Roberto Preste
+import io
 import os
+import json
+import itertools
 import pytest
+import numpy as np
+import pandas as pd
 import prestools.misc as pm
 
 DATADIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
@@ -54,6 +59,67 @@ def test_flatten_multiple_types_drop_null():
     assert result == expect
 
 
+def test_flatten_max_depth():
+    expect = [0, 2, [3, [4]], 5]
+    result = pm.flatten([0, [2, [3, [4]]], 5], max_depth=1)
+    assert result == expect
+
+
+def test_flatten_max_depth_zero():
+    expect = [0, [2, [3, [4]]], None]
+    result = pm.flatten([0, [2, [3, [4]]], None], max_depth=0)
+    assert result == expect
+
+
+def test_flatten_deep_nesting():
+    nested = []
+    for i in range(10000):
+        nested = [nested, i]
+    expect = list(range(10000))
+    result = pm.flatten(nested)
+    assert result == expect
+
+
+def test_flatten_numpy():
+    expect = [0, 1, 2, 3, 4, 5, 6]
+    result = pm.flatten([0, np.arange(1, 7).reshape(2, 3)])
+    assert result == expect
+
+
+def test_flatten_numpy_max_depth():
+    result = pm.flatten([0, np.arange(1, 7).reshape(2, 3)], max_depth=1)
+    assert result[0] == 0
+    assert np.array_equal(result[1], [1, 2, 3])
+    assert np.array_equal(result[2], [4, 5, 6])
+
+
+def test_flatten_numpy_object_drop_null():
+    expect = [1, "a", 2, 3]
+    result = pm.flatten(np.array([1, None, "a", [2, None, 3]],
+                                 dtype=object), drop_null=True)
+    assert result == expect
+
+
+def test_flatten_dataframe():
+    expect = [1, 3, 2, 4]
+    result = pm.flatten(pd.DataFrame({"a": [1, 2], "b": [3, 4]}))
+    assert result == expect
+
+
+# pm.iflatten()
+
+def test_iflatten_lazy():
+    expect = [0, 1, 2, 3, 4]
+    result = pm.iflatten(([i] for i in itertools.count()))
+    assert list(itertools.islice(result, 5)) == expect
+
+
+def test_iflatten_drop_null():
+    expect = [0, 2, 3, 8]
+    result = pm.iflatten([0, [[2, 3], None, 8, [[None]]]], drop_null=True)
+    assert list(result) == expect
+
+
 # pm.invert_dict()
 
 def test_invert_dict_single_key_single_val():
@@ -86,6 +152,78 @@ def test_invert_dict_multiple_key_multiple_val_sort_keys():
     assert result == expect
 
 
+def test_invert_dict_collision_last():
+    expect = {"A": 2, "E": 1, "G": 2}
+    result = pm.invert_dict({1: ["A", "E"], 2: ["A", "G"]})
+    assert result == expect
+
+
+def test_invert_dict_collision_first():
+    expect = {"A": 1, "E": 1, "G": 2}
+    result = pm.invert_dict({1: ["A", "E"], 2: ["A", "G"]},
+                            collision="first")
+    assert result == expect
+
+
+def test_invert_dict_collision_list():
+    expect = {"A": [1, 2], "E": [1], "G": [2]}
+    result = pm.invert_dict({1: ["A", "E"], 2: ["A", "G"]},
+                            collision="list")
+    assert result == expect
+
+
+def test_invert_dict_collision_error():
+    with pytest.raises(ValueError):
+        pm.invert_dict({1: ["A"]}, collision="all")
+
+
+# pm.invert_pairs()
+
+def test_invert_pairs():
+    expect = {"t1": "g1", "t2": "g1", "t3": "g2"}
+    result = pm.invert_pairs(iter([("g1", "t1"), ("g1", "t2"), ("g2", "t3")]))
+    assert result == expect
+
+
+def test_invert_pairs_list_sort_keys():
+    expect = {"t1": ["g1"], "t2": ["g2", "g1"], "t3": ["g2"]}
+    result = pm.invert_pairs([("g2", "t3"), ("g2", "t2"), ("g1", "t1"),
+                              ("g1", "t2")], sort_keys=True,
+                             collision="list")
+    assert result == expect
+    assert list(result) == ["t1", "t2", "t3"]
+
+
+# pm.invert_array_mapping()
+
+def test_invert_array_mapping():
+    keys = np.array([0, 0, 1, 2, 2, 2])
+    values = np.array([10, 11, 10, 12, 11, 10])
+    uniq, indptr, grouped = pm.invert_array_mapping(keys, values)
+    assert np.array_equal(uniq, [10, 11, 12])
+    assert np.array_equal(indptr, [0, 3, 5, 6])
+    assert np.array_equal(grouped, [0, 1, 2, 0, 2, 2])
+    assert np.array_equal(grouped[indptr[:-1]], [0, 0, 2])
+    assert np.array_equal(grouped[indptr[1:] - 1], [2, 2, 2])
+
+
+def test_invert_array_mapping_same_as_dict():
+    rng = np.random.RandomState(0)
+    keys = rng.randint(0, 50, size=500)
+    values = rng.randint(0, 100, size=500)
+    expect = pm.invert_pairs(zip(keys.tolist(), values.tolist()),
+                             collision="list")
+    uniq, indptr, grouped = pm.invert_array_mapping(keys, values)
+    result = {int(v): grouped[indptr[i]:indptr[i + 1]].tolist()
+              for i, v in enumerate(uniq)}
+    assert result == expect
+
+
+def test_invert_array_mapping_error():
+    with pytest.raises(ValueError):
+        pm.invert_array_mapping(np.arange(3), np.arange(4))
+
+
 # pm.prime_factors()
 
 def test_prime_factors_one():
@@ -118,6 +256,41 @@ def test_prime_factors_large():
     assert result == expect
 
 
+def test_prime_factors_prime():
+    expect = [2305843009213693951]
+    result = pm.prime_factors(2 ** 61 - 1)
+    assert result == expect
+
+
+def test_prime_factors_semiprime():
+    expect = [4294967279, 4294967291]
+    result = pm.prime_factors(4294967279 * 4294967291)
+    assert result == expect
+
+
+def test_prime_factors_square_large():
+    expect = [1000000007, 1000000007]
+    result = pm.prime_factors(1000000007 ** 2)
+    assert result == expect
+
+
+# pm.prime_factors_batch
+
+def test_prime_factors_batch():
+    expect = [[], [], [3, 3], [5, 17, 23, 461], [11, 9539, 894119],
+              [2147483629, 2147483647]]
+    result = pm.prime_factors_batch(np.array([0, 1, 9, 901255, 93819012551,
+                                              2147483629 * 2147483647]))
+    assert result == expect
+
+
+def test_prime_factors_batch_same_as_single():
+    numbers = np.random.RandomState(0).randint(1, 10 ** 12, size=200)
+    expect = [pm.prime_factors(int(n)) for n in numbers]
+    result = pm.prime_factors_batch(numbers)
+    assert result == expect
+
+
 # pm.filter_type
 
 def test_filter_type_int():
@@ -141,6 +314,65 @@ def test_filter_type_list():
     assert result == expect
 
 
+# pm.partition_by_type
+
+def test_partition_by_type():
+    expect = {int: [1, 3], str: ["a", "b"]}
+    result = pm.partition_by_type([1, "a", 2.0, True, [1], None, "b", 3],
+                                  [int, str])
+    assert result == expect
+
+
+def test_partition_by_type_missing():
+    expect = {int: [], list: [[1], [2, "a"]]}
+    result = pm.partition_by_type(["a", [1], [2, "a"]], [int, list])
+    assert result == expect
+
+
+def test_partition_by_type_subclasses():
+    expect = {int: [1, True, 3], str: ["a", "b"], object: [2.0, None]}
+    result = pm.partition_by_type([1, "a", 2.0, True, None, "b", 3],
+                                  [int, str, object], subclasses=True)
+    assert result == expect
+
+
+def test_partition_by_type_subclasses_closest():
+    expect = {int: [1, 3], bool: [True]}
+    result = pm.partition_by_type([1, True, 3], [int, bool], subclasses=True)
+    assert result == expect
+
+
+def test_partition_by_type_numpy_object():
+    values = [1, "a", 2.0, True, [1], None, "b", 3]
+    expect = pm.partition_by_type(values, [int, str, object],
+                                  subclasses=True)
+    result = pm.partition_by_type(np.array(values, dtype=object),
+                                  [int, str, object], subclasses=True)
+    assert result == expect
+
+
+def test_partition_by_type_pandas():
+    expect = {int: [1, 3], str: ["a", "b"]}
+    result = pm.partition_by_type(pd.Series([1, "a", 2.0, "b", 3]),
+                                  [int, str])
+    assert result == expect
+
+
+def test_partition_by_type_numpy_numeric():
+    expect = {np.int64: [0, 1, 2], int: []}
+    result = pm.partition_by_type(np.arange(3, dtype=np.int64),
+                                  [np.int64, int])
+    assert result == expect
+
+
+# pm.ipartition_by_type
+
+def test_ipartition_by_type():
+    expect = [(int, 1), (str, "a"), (int, 3)]
+    result = pm.ipartition_by_type(iter([1, "a", 2.0, 3]), [int, str])
+    assert list(result) == expect
+
+
 # pm.wordcount
 
 def test_wordcount():
@@ -193,6 +425,55 @@ def test_wordcount_specific_word_ignore_case_false():
     assert result == expect
 
 
+# pm.wordcount_file
+
+@pytest.fixture
+def sample_text_file(tmp_path):
+    path = tmp_path / "text.txt"
+    path.write_text("word test, wordcount WORD\nlongerword; word.\n" * 50)
+    return str(path)
+
+
+def test_wordcount_file(sample_text_file):
+    expect = {"word": 100, "test": 50, "wordcount": 50, "WORD": 50,
+              "longerword": 50}
+    result = pm.wordcount_file(sample_text_file)
+    assert result == expect
+
+
+def test_wordcount_file_small_chunks(sample_text_file):
+    expect = pm.wordcount_file(sample_text_file)
+    for chunk_size in (1, 3, 7, 64):
+        result = pm.wordcount_file(sample_text_file, chunk_size=chunk_size)
+        assert result == expect
+
+
+def test_wordcount_file_specific_word_ignore_case(sample_text_file):
+    expect = 150
+    result = pm.wordcount_file(sample_text_file, "word", ignore_case=True)
+    assert result == expect
+
+
+def test_wordcount_file_stream():
+    expect = {"word": 2, "test": 1}
+    result = pm.wordcount_file(io.StringIO("word test word"), chunk_size=2)
+    assert result == expect
+
+
+def test_wordcount_file_cores(sample_text_file):
+    expect = pm.wordcount_file(sample_text_file)
+    result = pm.wordcount_file(sample_text_file, chunk_size=16, cores=2)
+    assert result == expect
+
+
+# pm.top_words
+
+def test_top_words():
+    expect = [("word", 3), ("test", 2)]
+    result = pm.top_words({"test": 2, "word": 3, "wordcount": 1}, k=2)
+    assert result == expect
+
+
 # pm.equal_files
 
 def test_equal_files():
@@ -226,3 +507,84 @@ def test_benchmark():
     assert result[0] == "t_sum"
     assert isinstance(result[1], float)
     assert result[2] == 6
+
+
+def test_benchmark_keeps_name():
+    @pm.benchmark
+    def t_sum():
+        return sum([1, 2, 3])
+
+    assert t_sum.__name__ == "t_sum"
+
+
+# pm.run_benchmark
+
+def test_run_benchmark():
+    result = pm.run_benchmark(sum, args=([1, 2, 3], ), repeat=7, warmup=2)
+    assert result.name == "sum"
+    assert result.runs == 7
+    assert all(isinstance(el, int) for el in result.timings)
+    assert result.min <= result.median
+    assert result.iqr >= 0
+    assert result.peak_memory is None
+
+
+def test_run_benchmark_memory():
+    result = pm.run_benchmark(lambda n: [0] * n, args=(100000, ),
+                              repeat=2, memory=True, name="alloc")
+    assert result.name == "alloc"
+    assert result.peak_memory >= 100000 * 8
+
+
+def test_run_benchmark_error():
+    with pytest.raises(ValueError):
+        pm.run_benchmark(sum, args=([1, 2, 3], ), repeat=0)
+
+
+# pm.record_benchmark
+
+def test_record_benchmark():
+    pm.clear_benchmarks()
+
+    @pm.record_benchmark
+    def t_sum(values):
+        return sum(values)
+
+    @pm.record_benchmark(name="custom")
+    def t_max(values):
+        return max(values)
+
+    assert t_sum([1, 2, 3]) == 6
+    assert t_sum([1, 2]) == 3
+    assert t_max([1, 2]) == 2
+    result = pm.get_benchmarks()
+    assert result["test_record_benchmark.<locals>.t_sum"].runs == 2
+    assert result["custom"].runs == 1
+    pm.clear_benchmarks()
+    assert pm.get_benchmarks() == {}
+
+
+# pm.export_benchmarks
+
+def test_export_benchmarks(tmp_path):
+    out = str(tmp_path / "bench.json")
+    res = pm.run_benchmark(sum, args=([1, 2, 3], ), repeat=3)
+    pm.export_benchmarks(out, [res], metadata={"machine": "test"})
+    with open(out) as f:
+        result = json.load(f)
+    assert result["metadata"] == {"machine": "test"}
+    assert result["benchmarks"][0]["name"] == "sum"
+    assert result["benchmarks"][0]["runs"] == 3
+    assert len(result["benchmarks"][0]["timings_ns"]) == 3
+
+
+# pm.apply_parallel
+
+def _double(df):
+    return df * 2
+
+
+def test_apply_parallel():
+    df = pd.DataFrame({"a": range(10), "b": range(10, 20)})
+    result = pm.apply_parallel(df, _double, cores=3)
+    pd.testing.assert_frame_equal(result, df * 2)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Created by Roberto Preste
+import os
+import sys
+import json
+import pstats
+import subprocess
+import pytest
+from click.testing import CliRunner
+from prestools import cli
+import prestools.bioinf as pb
+import prestools.misc as pm
+import prestools.profiling as pp
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    pp.reset()
+    yield
+    pp.disable()
+    pp.reset()
+
+
+# pp.enable() / pp.disable()
+
+def test_enable_disable():
+    original = pb.p_distance
+    pp.enable()
+    assert pp.is_enabled()
+    assert pb.p_distance is not original
+    pp.disable()
+    assert not pp.is_enabled()
+    assert pb.p_distance is original
+
+
+def test_private_functions_not_instrumented():
+    pp.enable()
+    assert not hasattr(pm._peak_memory, "__wrapped__")
+    assert hasattr(pm.flatten, "__wrapped__")
+
+
+# pp.instrument()
+
+def test_instrument_stats():
+    with pp.instrument():
+        pb.p_distance("CAGATA", "CACATA")
+        pb.p_distance("CAGATACC", "CACATACC")
+    result = pp.get_stats()
+    assert result["prestools.bioinf.p_distance"]["calls"] == 2
+    assert result["prestools.bioinf.p_distance"]["total_input_size"] == 14
+    assert result["prestools.bioinf.p_distance"]["max_input_size"] == 8
+    assert result["prestools.bioinf.hamming_distance"]["calls"] == 2
+    p_dist = result["prestools.bioinf.p_distance"]
+    assert p_dist["own_time"] <= p_dist["total_time"]
+
+
+def test_instrument_modules():
+    with pp.instrument(modules=["prestools.misc"]):
+        pm.flatten([1, [2, 3]])
+        pb.p_distance("CAGATA", "CACATA")
+    result = pp.get_stats()
+    assert "prestools.misc.flatten" in result
+    assert all(name.startswith("prestools.misc.") for name in result)
+
+
+def test_instrument_disabled():
+    pb.p_distance("CAGATA", "CACATA")
+    assert pp.get_stats() == {}
+
+
+# pp.export()
+
+def test_export_json(tmp_path):
+    out = str(tmp_path / "stats.json")
+    with pp.instrument(output=out):
+        pm.wordcount("word test word")
+    with open(out) as f:
+        result = json.load(f)
+    assert result["prestools.misc.wordcount"]["calls"] == 1
+
+
+def test_export_pstats(tmp_path):
+    out = str(tmp_path / "stats.prof")
+    with pp.instrument(output=out):
+        pb.p_distance("CAGATA", "CACATA")
+    result = pstats.Stats(out)
+    names = {key[2]: val for key, val in result.stats.items()}
+    assert names["p_distance"][1] == 1
+    assert names["hamming_distance"][1] == 1
+    assert len(names["hamming_distance"][4]) == 1
+
+
+def test_enable_from_env(tmp_path):
+    out = str(tmp_path / "stats.json")
+    env = dict(os.environ, PRESTOOLS_PROFILE=out)
+    subprocess.run([sys.executable, "-c",
+                    "import prestools.misc as pm; pm.flatten([1, [2]])"],
+                   env=env, check=True)
+    with open(out) as f:
+        result = json.load(f)
+    assert result["prestools.misc.flatten"]["calls"] == 1
+
+
+# prestools --profile
+
+def test_cli_profile(tmp_path):
+    out = str(tmp_path / "stats.json")
+    runner = CliRunner()
+    result = runner.invoke(cli.main, ["--profile", out, "bioinf",
+                                      "p-distance", "CAGATA", "CACATA"])
+    assert result.exit_code == 0
+    assert not pp.is_enabled()
+    with open(out) as f:
+        stats = json.load(f)
+    assert stats["prestools.bioinf.p_distance"]["calls"] == 1